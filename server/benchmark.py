@@ -0,0 +1,439 @@
+"""
+End-to-end throughput and latency benchmark of the search server.
+
+For every combination of corpus size, search algorithm, reread_on_query
+setting and SSL setting, a synthetic corpus is generated (and kept for
+later runs), server.py is started in a subprocess with a matching
+configuration, and a number of concurrent clients send queries over
+persistent connections. The achieved queries per second and the p50,
+p95 and p99 latencies of every run are written to a CSV file and, when
+matplotlib is available, plotted against the corpus size.
+
+Usage:
+    python benchmark.py --sizes 10000 100000 --algorithms naive_search
+    python benchmark.py --sizes 10000 --requests 200 --compare-rabin-karp
+"""
+
+import argparse
+import configparser
+import csv
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import time
+from itertools import product
+
+import client
+from client import percentile
+from search_algorithms import ALGORITHMS
+
+# Directory holding server.py and the certificate it loads
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+
+CSV_FIELDS = (
+    "lines", "algorithm", "reread_on_query", "ssl", "concurrency",
+    "requests", "errors", "seconds", "qps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def random_line(generator: random.Random) -> str:
+    length = generator.randint(8, 40)
+    return "".join(generator.choices(string.ascii_letters + " ", k=length))
+
+
+def generate_corpus(path, lines: int, seed: int = 0) -> None:
+    """
+    Write a corpus of random lines.
+
+    Parameters:
+    - path: The path of the file to write.
+    - lines: The number of lines.
+    - seed: Seed of the random generator, so corpora are reproducible.
+    """
+    generator = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as file:
+        for _ in range(lines):
+            file.write(random_line(generator).strip() + "\n")
+
+
+def corpus_path(directory, lines: int) -> str:
+    """
+    Return the path of the corpus of a given size, generating it if needed.
+
+    Parameters:
+    - directory: The directory the corpora are kept in.
+    - lines: The number of lines.
+
+    Returns:
+    - The path of the corpus file.
+    """
+    path = os.path.join(directory, f"corpus-{lines}.txt")
+    if not os.path.exists(path):
+        generate_corpus(path + ".tmp", lines)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def make_queries(path, count: int, hit_ratio: float, seed: int = 1) -> list:
+    """
+    Pick a mix of queries that exist in the corpus and queries that do not.
+
+    Parameters:
+    - path: The path of the corpus.
+    - count: The number of distinct queries.
+    - hit_ratio: The fraction of queries taken from the corpus.
+    - seed: Seed of the random generator.
+
+    Returns:
+    - The list of queries.
+    """
+    generator = random.Random(seed)
+    hits = round(count * hit_ratio)
+    # Reservoir sampling keeps memory bounded on large corpora
+    sample = []
+    with open(path, "r", encoding="utf-8") as file:
+        for number, line in enumerate(file):
+            if number < hits:
+                sample.append(line.strip())
+            else:
+                slot = generator.randint(0, number)
+                if slot < hits:
+                    sample[slot] = line.strip()
+    # Digits never occur in generated corpora, so these always miss
+    misses = [f"{random_line(generator).strip()}{number}"
+              for number in range(count - len(sample))]
+    queries = sample + misses
+    generator.shuffle(queries)
+    return queries
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def write_config(path, corpus, port: int, algorithm: str,
+                 reread_on_query: bool, use_ssl: bool) -> None:
+    """
+    Write the server configuration of one benchmark run.
+
+    Parameters:
+    - path: The path of the configuration file.
+    - corpus: The path of the corpus to serve.
+    - port: The port to listen on.
+    - algorithm: The search algorithm.
+    - reread_on_query: The reread_on_query setting.
+    - use_ssl: Whether SSL is enabled.
+    """
+    config = configparser.ConfigParser()
+    config["server"] = {
+        "host": "127.0.0.1",
+        "port": str(port),
+        "linuxpath": os.path.abspath(corpus),
+        "search_algorithms": algorithm,
+        "reread_on_query": str(reread_on_query),
+        "ssl_enabled": str(use_ssl),
+        "query_log": "False",
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        config.write(file)
+
+
+def start_server(config_path, port: int, use_ssl: bool,
+                 timeout: float = 600.0) -> subprocess.Popen:
+    """
+    Start server.py and wait until it answers a query.
+
+    The first query also builds the index, so it is not measured.
+
+    Parameters:
+    - config_path: The configuration file to start the server with.
+    - port: The port the server listens on.
+    - use_ssl: Whether the server expects SSL connections.
+    - timeout: Seconds to wait for the server to become ready.
+
+    Returns:
+    - The server process.
+
+    Raises:
+    - RuntimeError: If the server exits or is not ready in time.
+    """
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SERVER_DIR, "server.py")],
+        cwd=SERVER_DIR,
+        env={**os.environ, "CONFIG_FILE_PATH": os.path.abspath(config_path)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"Server exited with code {process.returncode}")
+        try:
+            with client.open_connection(
+                    "127.0.0.1", port, use_ssl, timeout) as conn:
+                client.ask(conn, "warm up")
+            return process
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_load(port: int, queries: list, concurrency: int, requests: int,
+             use_ssl: bool) -> dict:
+    """
+    Send queries from concurrent persistent connections and time them.
+
+    Parameters:
+    - port: The port the server listens on.
+    - queries: The queries to cycle through.
+    - concurrency: The number of concurrent connections.
+    - requests: The total number of queries to send.
+    - use_ssl: Whether to connect with SSL.
+
+    Returns:
+    - A dictionary with the number of requests and errors, the elapsed
+    seconds, the queries per second and the p50, p95 and p99 latencies
+    in milliseconds.
+    """
+    result = client.run_load(
+        queries, concurrency=concurrency, requests=requests,
+        host="127.0.0.1", port=port, use_ssl=use_ssl)
+    latencies = result["latencies"]
+    return {
+        "requests": result["requests"],
+        "errors": result["errors"],
+        "seconds": round(result["seconds"], 3),
+        "qps": round(result["qps"], 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def run_benchmark(sizes, algorithms, reread_settings, ssl_settings,
+                  concurrency: int, requests: int, hit_ratio: float,
+                  output_dir) -> list:
+    """
+    Run every combination of the given settings and collect the results.
+
+    Parameters:
+    - sizes: The corpus sizes in lines.
+    - algorithms: The search algorithms.
+    - reread_settings: The reread_on_query settings to try.
+    - ssl_settings: The SSL settings to try.
+    - concurrency: The number of concurrent connections.
+    - requests: The number of queries per run.
+    - hit_ratio: The fraction of queries that exist in the corpus.
+    - output_dir: The directory for corpora, configuration and results.
+
+    Returns:
+    - A list of result rows, one dictionary per run with CSV_FIELDS keys.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    config_path = os.path.join(output_dir, "benchmark.ini")
+    rows = []
+    for lines in sizes:
+        corpus = corpus_path(output_dir, lines)
+        queries = make_queries(corpus, min(1000, requests), hit_ratio)
+        for algorithm, reread, use_ssl in product(
+                algorithms, reread_settings, ssl_settings):
+            port = free_port()
+            write_config(config_path, corpus, port, algorithm, reread,
+                         use_ssl)
+            row = {"lines": lines, "algorithm": algorithm,
+                   "reread_on_query": reread, "ssl": use_ssl,
+                   "concurrency": concurrency}
+            try:
+                process = start_server(config_path, port, use_ssl)
+            except RuntimeError as e:
+                print(f"Skipping {row}: {e}", file=sys.stderr)
+                continue
+            try:
+                row.update(run_load(
+                    port, queries, concurrency, requests, use_ssl))
+            finally:
+                stop_server(process)
+            print(", ".join(f"{key}={row[key]}" for key in CSV_FIELDS))
+            rows.append(row)
+    return rows
+
+
+def compare_rabin_karp(lines: list, patterns: list) -> dict:
+    """
+    Time a batch of substring queries with rabin_karp_search, one scan
+    per pattern, and with a single multi-pattern rolling-hash scanner,
+    one pass per pattern length for the whole batch.
+
+    Parameters:
+    - lines: The lines to search.
+    - patterns: The substrings to look for.
+
+    Returns:
+    - A dictionary with the seconds each engine took, the speedup and
+    whether both found the same patterns.
+    """
+    from search_algorithms import rabin_karp_search
+
+    start_time = time.perf_counter()
+    per_pattern = {
+        pattern for pattern in set(patterns)
+        if rabin_karp_search.rabin_karp_search(lines, pattern)}
+    per_pattern_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    scanned = rabin_karp_search.MultiPatternScanner(patterns).scan(lines)
+    rolling_hash_seconds = time.perf_counter() - start_time
+    return {
+        "lines": len(lines),
+        "patterns": len(set(patterns)),
+        "per_pattern_seconds": per_pattern_seconds,
+        "rolling_hash_seconds": rolling_hash_seconds,
+        "speedup": per_pattern_seconds / max(rolling_hash_seconds, 1e-9),
+        "agree": per_pattern == scanned,
+    }
+
+
+def write_csv(rows: list, path) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def plot_results(rows: list, output_dir) -> list:
+    """
+    Plot QPS and p99 latency against corpus size for every algorithm.
+
+    One chart is drawn per metric, with a panel per reread_on_query and
+    SSL combination.
+
+    Parameters:
+    - rows: The result rows.
+    - output_dir: The directory to save the charts in.
+
+    Returns:
+    - The paths of the saved charts, or an empty list when matplotlib
+    is not installed.
+    """
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping charts",
+              file=sys.stderr)
+        return []
+
+    settings = sorted({(row["reread_on_query"], row["ssl"]) for row in rows})
+    algorithms = sorted({row["algorithm"] for row in rows})
+    paths = []
+    for metric, label in (("qps", "Queries per second"),
+                          ("p99_ms", "p99 latency (ms)")):
+        figure, axes = plt.subplots(
+            1, len(settings), figsize=(6 * len(settings), 4.5),
+            squeeze=False)
+        for axis, (reread, use_ssl) in zip(axes[0], settings):
+            for algorithm in algorithms:
+                points = sorted(
+                    (row["lines"], row[metric]) for row in rows
+                    if row["algorithm"] == algorithm
+                    and (row["reread_on_query"], row["ssl"])
+                    == (reread, use_ssl))
+                if points:
+                    axis.plot(*zip(*points), marker="o", label=algorithm)
+            axis.set_xscale("log")
+            axis.set_xlabel("Corpus lines")
+            axis.set_ylabel(label)
+            axis.set_title(f"reread_on_query={reread}, ssl={use_ssl}")
+            axis.grid(True, which="both", alpha=0.3)
+        axes[0][0].legend(fontsize="small")
+        figure.tight_layout()
+        path = os.path.join(output_dir, f"{metric}.png")
+        figure.savefig(path)
+        plt.close(figure)
+        paths.append(path)
+    return paths
+
+
+def main():
+    """
+    Parse the command line, run the benchmark and write the report.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the search server end to end.")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+        help="Corpus sizes in lines.")
+    parser.add_argument(
+        "--algorithms", nargs="+", default=list(ALGORITHMS),
+        choices=ALGORITHMS, help="Search algorithms to benchmark.")
+    parser.add_argument(
+        "--reread", choices=("on", "off", "both"), default="both",
+        help="reread_on_query settings to benchmark.")
+    parser.add_argument(
+        "--ssl", choices=("on", "off", "both"), default="both",
+        help="SSL settings to benchmark.")
+    parser.add_argument(
+        "--concurrency", type=int, default=8,
+        help="Number of concurrent connections.")
+    parser.add_argument(
+        "--requests", type=int, default=2000,
+        help="Number of queries per run.")
+    parser.add_argument(
+        "--hit-ratio", type=float, default=0.5,
+        help="Fraction of queries that exist in the corpus.")
+    parser.add_argument(
+        "--output", default="benchmark-results",
+        help="Directory for corpora, results and charts.")
+    parser.add_argument(
+        "--compare-rabin-karp", action="store_true",
+        help="Instead of the server benchmark, compare one Rabin-Karp "
+        "scan per pattern with one scan for all --requests patterns.")
+    args = parser.parse_args()
+
+    if args.compare_rabin_karp:
+        os.makedirs(args.output, exist_ok=True)
+        for size in args.sizes:
+            path = corpus_path(args.output, size)
+            with open(path, "r", encoding="utf-8") as file:
+                lines = file.read().splitlines()
+            result = compare_rabin_karp(
+                lines, make_queries(path, args.requests, args.hit_ratio))
+            print("{lines} lines, {patterns} patterns: per pattern "
+                  "{per_pattern_seconds:.3f}s, batched "
+                  "{rolling_hash_seconds:.3f}s ({speedup:.1f}x), "
+                  "results agree: {agree}".format(**result))
+        return
+
+    def settings(choice):
+        return {"on": [True], "off": [False], "both": [False, True]}[choice]
+
+    rows = run_benchmark(
+        args.sizes, args.algorithms, settings(args.reread),
+        settings(args.ssl), args.concurrency, args.requests,
+        args.hit_ratio, args.output)
+    results = os.path.join(args.output, "results.csv")
+    write_csv(rows, results)
+    print(f"Results written to {results}")
+    for path in plot_results(rows, args.output):
+        print(f"Chart written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Bloom filter placed in front of a searcher to answer misses cheaply.
+
+A Bloom filter never reports a line it was built from as absent, so a
+query it rejects is a definite miss and is answered without consulting
+the searcher, which for a memory-mapped corpus or a scanning algorithm
+means without touching the file. A query it accepts is passed on to the
+searcher; when that finds nothing the filter produced a false positive.
+The expected false-positive rate is chosen when the filter is sized.
+"""
+
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+    """
+    Probabilistic set of strings with no false negatives.
+
+    Parameters:
+    - capacity: Number of strings the filter is sized for.
+    - false_positive_rate: Expected fraction of absent strings reported
+    as possibly present once capacity strings have been added.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(
+                "Bloom filter false positive rate must be between 0 and 1")
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        # Number of strings added so far, counting repeats
+        self.count = 0
+        self.bit_count = max(8, math.ceil(
+            -capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(
+            1, round(self.bit_count / capacity * math.log(2)))
+        self._bits = bytearray((self.bit_count + 7) // 8)
+        self.hits = 0
+        self.misses = 0
+        self.false_positives = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_lines(cls, lines, false_positive_rate: float) -> "BloomFilter":
+        """
+        Build a filter holding every line of a collection.
+
+        Parameters:
+        - lines: A sized iterable of stripped lines.
+        - false_positive_rate: The expected false-positive rate.
+
+        Returns:
+        - The populated filter.
+        """
+        bloom = cls(len(lines), false_positive_rate)
+        for line in lines:
+            bloom.add(line)
+        return bloom
+
+    def _positions(self, search_string: str):
+        # Double hashing: two independent 64-bit halves of one digest
+        # generate all hash_count bit positions
+        digest = hashlib.blake2b(
+            search_string.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for number in range(self.hash_count):
+            yield (first + number * second) % self.bit_count
+
+    def add(self, search_string: str) -> None:
+        for position in self._positions(search_string):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def extended(self, lines: list, all_lines) -> "BloomFilter":
+        """
+        Add lines appended to the corpus the filter was built from.
+
+        The lines are added in place while the filter has room for them.
+        Past its capacity the false-positive rate would grow, so a filter
+        sized for twice the lines is built instead and takes over the
+        counters of this one.
+
+        Parameters:
+        - lines: The appended lines.
+        - all_lines: A callable returning every line of the corpus as a
+        sized iterable, called only when the filter has to grow.
+
+        Returns:
+        - This filter, or the larger filter replacing it.
+        """
+        if self.count + len(lines) <= self.capacity:
+            for line in lines:
+                self.add(line)
+            return self
+        all_lines = all_lines()
+        bloom = BloomFilter(2 * len(all_lines), self.false_positive_rate)
+        for line in all_lines:
+            bloom.add(line)
+        with self._lock:
+            bloom.hits = self.hits
+            bloom.misses = self.misses
+            bloom.false_positives = self.false_positives
+        return bloom
+
+    def __contains__(self, search_string: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(search_string))
+
+    def might_contain(self, search_string: str) -> bool:
+        """
+        Check the filter for a string and count the outcome.
+
+        Parameters:
+        - search_string: The string to look up.
+
+        Returns:
+        - False if the string is definitely absent, True if it may be
+        present.
+        """
+        present = search_string in self
+        with self._lock:
+            if present:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return present
+
+    def record_false_positive(self) -> None:
+        """
+        Count a string the filter let through that was not found.
+        """
+        with self._lock:
+            self.false_positives += 1
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the filter counters.
+
+        Returns:
+        - A dictionary with the filter size and hash count, and the
+        hits, misses and false positives counted so far.
+        """
+        with self._lock:
+            return {
+                "bit_count": self.bit_count,
+                "hash_count": self.hash_count,
+                "hits": self.hits,
+                "misses": self.misses,
+                "false_positives": self.false_positives,
+            }
+
+
+class FilteredSearcher:
+    """
+    Searcher that consults a Bloom filter before the wrapped searcher.
+
+    Parameters:
+    - bloom: The filter built from the same lines as the searcher.
+    - searcher: The searcher answering queries the filter lets through.
+    """
+
+    def __init__(self, bloom: BloomFilter, searcher):
+        self.bloom = bloom
+        self.searcher = searcher
+
+    def contains(self, search_string: str) -> bool:
+        if not self.bloom.might_contain(search_string):
+            return False
+        if self.searcher.contains(search_string):
+            return True
+        self.bloom.record_false_positive()
+        return False
+
+    def contains_many(self, search_strings: list) -> list:
+        candidates = [
+            number for number, search_string in enumerate(search_strings)
+            if self.bloom.might_contain(search_string)]
+        queries = [search_strings[number] for number in candidates]
+        if hasattr(self.searcher, "contains_many"):
+            hits = self.searcher.contains_many(queries)
+        else:
+            hits = [self.searcher.contains(query) for query in queries]
+
+        found = [False] * len(search_strings)
+        for number, hit in zip(candidates, hits):
+            if hit:
+                found[number] = True
+            else:
+                self.bloom.record_false_positive()
+        return found
@@ -7,9 +7,12 @@ is in a plain text, representing a single line string,
 contained in a file
 """
 
+import math
 import socket
 import ssl
 import sys
+import threading
+import time
 import argparse
 import configparser
 
@@ -21,6 +24,24 @@ config.read("config.ini")
 HOST = config.get("server", "host", fallback="0.0.0.0")
 PORT = config.getint("server", "port", fallback=44445)
 USE_SSL = config.getboolean("server", "use_ssl", fallback=True)
+# Whether the server reads a leading mode word as the query mode
+QUERY_MODES_ENABLED = config.getboolean(
+    "server", "query_modes", fallback=False)
+
+# Answers to a successful query
+ANSWERS = ("STRING EXISTS", "STRING NOT FOUND")
+
+# Modes a single query can be sent in
+QUERY_MODES = ("EXACT", "PREFIX", "SUBSTRING", "REGEX")
+
+# First words the server may read as something other than the start of
+# an exact query. Frame headers start with a NUL byte, so queries such as
+# "BATCH 2" need no escaping.
+RESERVED_WORDS = QUERY_MODES
+
+# Upper bounds, in milliseconds, of the load report latency histogram
+HISTOGRAM_BOUNDS_MS = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, math.inf)
 
 
 def send_query(query):
@@ -60,6 +81,527 @@ def send_query(query):
         print(f"Error: {e}")
 
 
+def format_query(search_string: str, mode: str = "EXACT") -> str:
+    """
+    Build the request line of a single query in a given mode.
+
+    Unless query_modes is set, the server takes every query as exact,
+    so the query is sent as it is and only EXACT can be used.
+
+    Parameters:
+    - search_string: The string to search for.
+    - mode: EXACT to match whole lines, PREFIX to match the start of a
+    line, SUBSTRING to match anywhere in a line or REGEX to search each
+    line for a regular expression.
+
+    Returns:
+    - The query without its newline. Exact queries are sent as they are
+    unless query_modes is set and their first word is a mode, in which
+    case they are prefixed with "EXACT ".
+
+    Raises:
+    - ValueError: If the mode is not recognized, or is not EXACT and
+    query_modes is not set.
+    """
+    if mode not in QUERY_MODES:
+        raise ValueError(f"Unknown query mode '{mode}'")
+    if not QUERY_MODES_ENABLED:
+        if mode != "EXACT":
+            raise ValueError(
+                f"Query mode '{mode}' needs query_modes to be set")
+        return search_string
+    if (mode == "EXACT"
+            and search_string.partition(" ")[0] not in RESERVED_WORDS):
+        return search_string
+    return f"{mode} {search_string}"
+
+
+def send_batch(queries, substring=False):
+    """
+    Send several search queries to the server in a single batch frame.
+
+    Parameters:
+    - queries: The search strings to be sent to the server.
+    - substring: Whether to look for the strings anywhere in a line, in a
+    single pass over the file, instead of as whole lines.
+
+    Returns:
+    - A list with one boolean per query, True if the string exists.
+
+    Raises:
+    - ValueError: If a query contains a newline.
+    - ConnectionError: If the server answers with an error.
+    """
+    if any("\n" in query for query in queries):
+        raise ValueError("Batch queries cannot contain newlines")
+    header = "SCAN" if substring else "BATCH"
+    frame = f"\0{header} {len(queries)}\n" + "".join(
+        f"{query}\n" for query in queries)
+
+    with socket.create_connection((HOST, PORT)) as sock:
+        if USE_SSL:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            conn = context.wrap_socket(sock, server_hostname=HOST)
+        else:
+            conn = sock
+        with conn:
+            conn.sendall(frame.encode())
+            response = b""
+            while not response.endswith(b"\n"):
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+
+    flags = response.decode().rstrip("\n")
+    if len(flags) != len(queries) or flags.strip("01"):
+        raise ConnectionError(flags or "No response from server")
+    return [flag == "1" for flag in flags]
+
+
+def open_connection(host=None, port=None, use_ssl=None, timeout=30.0):
+    """
+    Connect to the server, wrapping the socket in SSL when enabled.
+
+    Parameters:
+    - host: The server host, HOST by default.
+    - port: The server port, PORT by default.
+    - use_ssl: Whether to use SSL, USE_SSL by default.
+    - timeout: Socket timeout in seconds.
+
+    Returns:
+    - The connected socket.
+    """
+    host = HOST if host is None else host
+    port = PORT if port is None else port
+    use_ssl = USE_SSL if use_ssl is None else use_ssl
+    sock = socket.create_connection((host, port), timeout=timeout)
+    if not use_ssl:
+        return sock
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context.wrap_socket(sock, server_hostname=host)
+
+
+def ask(conn, query: str, buffer: bytes = b"", persistent=True) -> tuple:
+    """
+    Send one query and read its answer.
+
+    Parameters:
+    - conn: The connected socket.
+    - query: The query to send.
+    - buffer: Bytes received after the previous answer.
+    - persistent: Whether to terminate the query with a newline so the
+    server keeps the connection open for the next one.
+
+    Returns:
+    - A tuple of (answer without its newline, remaining buffer).
+
+    Raises:
+    - ConnectionError: If the server closes the connection first.
+    """
+    conn.sendall(query.encode("utf-8") + (b"\n" if persistent else b""))
+    return read_answer(conn, buffer)
+
+
+def read_answer(conn, buffer: bytes = b"") -> tuple:
+    """
+    Read one answer line from the server.
+
+    Parameters:
+    - conn: The connected socket.
+    - buffer: Bytes already received and not yet consumed.
+
+    Returns:
+    - A tuple of (answer without its newline, remaining buffer).
+
+    Raises:
+    - ConnectionError: If the server closes the connection first.
+    """
+    while b"\n" not in buffer:
+        chunk = conn.recv(4096)
+        if not chunk:
+            raise ConnectionError("Connection closed by server")
+        buffer += chunk
+    answer, _, buffer = buffer.partition(b"\n")
+    return answer.decode("utf-8"), buffer
+
+
+class Client:
+    """
+    Reusable client that keeps connections to the server open.
+
+    Queries are sent over persistent connections taken from a
+    thread-safe pool, so a lookup costs one round trip instead of a TCP
+    and TLS handshake. With SSL, one SSLContext is shared by every
+    connection and new connections resume the last TLS session.
+
+    Parameters:
+    - host: The server host, HOST by default.
+    - port: The server port, PORT by default.
+    - use_ssl: Whether to use SSL, USE_SSL by default.
+    - timeout: Socket timeout in seconds for connecting and each answer.
+    - retries: How many times a failed query is retried on a new
+    connection. A pooled connection that was reset or closed before any
+    of the answer arrived is not counted: the server has most likely
+    closed every idle connection, so the pool is emptied and the query
+    is sent again at once on a new connection. Timeouts and other
+    failures are counted and leave the other pooled connections open.
+    - retry_delay: Seconds to wait before retrying after a counted
+    failure.
+    - pool_size: Maximum number of idle connections kept open.
+    """
+
+    def __init__(self, host=None, port=None, use_ssl=None, timeout=5.0,
+                 retries=2, retry_delay=0.05, pool_size=8):
+        self.host = HOST if host is None else host
+        self.port = PORT if port is None else port
+        self.use_ssl = USE_SSL if use_ssl is None else use_ssl
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.pool_size = pool_size
+        self.connections_opened = 0
+        self.sessions_resumed = 0
+        self._context = None
+        if self.use_ssl:
+            self._context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            self._context.check_hostname = False
+            self._context.verify_mode = ssl.CERT_NONE
+        self._session = None
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout)
+        if self._context is not None:
+            try:
+                sock = self._context.wrap_socket(
+                    sock, server_hostname=self.host, session=self._session)
+            except (OSError, ValueError):
+                sock.close()
+                raise
+        with self._lock:
+            self.connections_opened += 1
+            if getattr(sock, "session_reused", False):
+                self.sessions_resumed += 1
+        return sock
+
+    def _acquire(self) -> tuple:
+        # Return a connection and whether it came from the pool
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn) -> None:
+        if self._context is not None and conn.session is not None:
+            # TLS 1.3 tickets arrive after the handshake, so the session
+            # is only worth keeping once an answer has been read
+            self._session = conn.session
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _exchange(self, payload: bytes) -> str:
+        """
+        Send a request on a pooled connection and read its answer line.
+
+        Parameters:
+        - payload: The newline-terminated request.
+
+        Returns:
+        - The answer without its newline.
+
+        Raises:
+        - OSError: If every attempt failed.
+        """
+        attempt = 0
+        while True:
+            conn = None
+            stale = False
+            try:
+                conn, pooled = self._acquire()
+                try:
+                    conn.sendall(payload)
+                    received = conn.recv(4096)
+                except (ConnectionError, ssl.SSLEOFError):
+                    stale = pooled
+                    raise
+                if not received:
+                    stale = pooled
+                    raise ConnectionError("Connection closed by server")
+                answer, rest = read_answer(conn, received)
+            except OSError:
+                if conn is not None:
+                    conn.close()
+                if stale:
+                    # Closed by a server restart or idle timeout, like
+                    # the rest of the pool
+                    self.close()
+                    continue
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                time.sleep(self.retry_delay)
+                continue
+            if rest or (answer not in ANSWERS and not answer.isdigit()):
+                # Errors may be followed by the server closing the socket
+                conn.close()
+            else:
+                self._release(conn)
+            return answer
+
+    def query(self, search_string: str, mode: str = "EXACT") -> str:
+        """
+        Send a search query and return the server's answer.
+
+        Parameters:
+        - search_string: The string to search for.
+        - mode: The query mode, EXACT, PREFIX, SUBSTRING or REGEX.
+
+        Returns:
+        - The answer, such as "STRING EXISTS" or an error message.
+        """
+        if "\n" in search_string:
+            raise ValueError("Queries cannot contain newlines")
+        request = format_query(search_string, mode)
+        return self._exchange(request.encode("utf-8") + b"\n")
+
+    def contains(self, search_string: str, mode: str = "EXACT") -> bool:
+        """
+        Check whether a string exists on the server.
+
+        Parameters:
+        - search_string: The string to search for.
+        - mode: The query mode, EXACT, PREFIX, SUBSTRING or REGEX.
+
+        Returns:
+        - True if the string exists, False otherwise.
+
+        Raises:
+        - ConnectionError: If the server answers with an error.
+        """
+        answer = self.query(search_string, mode)
+        if answer not in ANSWERS:
+            raise ConnectionError(answer)
+        return answer == "STRING EXISTS"
+
+    def batch(self, queries, substring=False) -> list:
+        """
+        Check several strings in a single batch frame.
+
+        Parameters:
+        - queries: The search strings.
+        - substring: Whether to match the strings anywhere in a line.
+
+        Returns:
+        - A list with one boolean per query, True if the string exists.
+
+        Raises:
+        - ConnectionError: If the server answers with an error.
+        """
+        if any("\n" in query for query in queries):
+            raise ValueError("Batch queries cannot contain newlines")
+        header = "SCAN" if substring else "BATCH"
+        frame = f"\0{header} {len(queries)}\n" + "".join(
+            f"{query}\n" for query in queries)
+        flags = self._exchange(frame.encode("utf-8"))
+        if len(flags) != len(queries) or flags.strip("01"):
+            raise ConnectionError(flags or "No response from server")
+        return [flag == "1" for flag in flags]
+
+    def close(self) -> None:
+        """
+        Close every idle connection in the pool.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Return a percentile of sorted values using the nearest-rank method.
+
+    Parameters:
+    - values: The values, sorted in ascending order.
+    - fraction: The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+    - The percentile, or 0.0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def run_load(queries, concurrency=1, requests=None, duration=None,
+             qps=None, reuse=True, host=None, port=None, use_ssl=None):
+    """
+    Send queries from concurrent connections and time every answer.
+
+    Each of the concurrency threads sends one query at a time, cycling
+    through the queries, until the request budget is spent or the
+    duration has passed. With a qps target the threads pace themselves
+    to that combined rate, and latency is measured from the time a query
+    was due rather than sent, so a slow server is not hidden by the
+    client backing off.
+
+    Parameters:
+    - queries: The search strings to send.
+    - concurrency: The number of concurrent connections.
+    - requests: The total number of queries to send.
+    - duration: The number of seconds to keep sending, used instead of
+    requests. Without either, 1000 queries are sent.
+    - qps: The combined target rate in queries per second, or None to
+    send as fast as the server answers.
+    - reuse: Whether to keep each connection open for many queries
+    instead of connecting once per query.
+    - host: The server host, HOST by default.
+    - port: The server port, PORT by default.
+    - use_ssl: Whether to use SSL, USE_SSL by default.
+
+    Returns:
+    - A dictionary with the number of requests sent, errors and errors
+    by kind, the elapsed seconds, the achieved queries per second and
+    the sorted latencies of successful queries in seconds.
+    """
+    if not queries:
+        raise ValueError("At least one query is required")
+    if requests is None and duration is None:
+        requests = 1000
+    interval = concurrency / qps if qps else 0.0
+    lock = threading.Lock()
+    latencies = []
+    errors = {}
+    sent = [0]
+    start_time = time.perf_counter()
+    deadline = None if duration is None else start_time + duration
+
+    def claim():
+        # Reserve the next query, or return None once the run is over
+        with lock:
+            if requests is not None and sent[0] >= requests:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            sent[0] += 1
+            return sent[0] - 1
+
+    def worker(number):
+        conn, buffer = None, b""
+        due = start_time + interval * number / concurrency
+        measured, failed = [], {}
+        while True:
+            sequence = claim()
+            if sequence is None:
+                break
+            if interval:
+                time.sleep(max(0.0, due - time.perf_counter()))
+                query_start, due = due, due + interval
+            else:
+                query_start = time.perf_counter()
+            try:
+                if conn is None:
+                    conn, buffer = open_connection(host, port, use_ssl), b""
+                answer, buffer = ask(
+                    conn, queries[sequence % len(queries)], buffer, reuse)
+                if answer not in ANSWERS:
+                    failed[answer] = failed.get(answer, 0) + 1
+                else:
+                    measured.append(time.perf_counter() - query_start)
+                # The server may close the connection after an error
+                if not reuse or answer not in ANSWERS:
+                    conn.close()
+                    conn = None
+            except OSError as e:
+                kind = type(e).__name__
+                failed[kind] = failed.get(kind, 0) + 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(measured)
+            for kind, count in failed.items():
+                errors[kind] = errors.get(kind, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(number,))
+               for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests": sent[0],
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "seconds": seconds,
+        "qps": len(latencies) / seconds if seconds else 0.0,
+        "latencies": latencies,
+    }
+
+
+def format_load_report(result: dict) -> str:
+    """
+    Render the result of run_load as a human-readable report.
+
+    Parameters:
+    - result: The dictionary returned by run_load.
+
+    Returns:
+    - The report, with throughput, errors, percentiles and a latency
+    histogram.
+    """
+    latencies = result["latencies"]
+    lines = [
+        f"Requests: {result['requests']} in {result['seconds']:.2f} s",
+        f"Throughput: {result['qps']:.1f} queries/s",
+        f"Errors: {result['errors']}",
+    ]
+    for kind, count in sorted(result["error_kinds"].items()):
+        lines.append(f"  {kind}: {count}")
+    if latencies:
+        lines.append("Latency (ms): " + ", ".join(
+            f"{name} {percentile(latencies, fraction) * 1000:.3f}"
+            for name, fraction in (
+                ("p50", 0.50), ("p90", 0.90), ("p99", 0.99),
+                ("max", 1.0))))
+
+        counts = [0] * len(HISTOGRAM_BOUNDS_MS)
+        bucket = 0
+        for latency in latencies:
+            while latency * 1000 > HISTOGRAM_BOUNDS_MS[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+        widest = max(counts)
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, counts):
+            if count:
+                label = "inf" if bound == math.inf else f"{bound:g}"
+                bar = "#" * max(1, round(40 * count / widest))
+                lines.append(f"  <= {label:>6} ms {count:>8} {bar}")
+    return "\n".join(lines)
+
+
 def main():
     """
     Main function to parse command-line arguments and send the search query.
@@ -70,9 +612,69 @@ def main():
         description="Client script for searching a string on the server."
     )
     parser.add_argument(
-        "search_string", type=str, help="String to search for.")
+        "search_string", type=str, nargs="?", help="String to search for.")
+    parser.add_argument(
+        "--batch-file", type=str,
+        help="File with one search string per line, sent as one batch.")
+    parser.add_argument(
+        "--substring", action="store_true",
+        help="With --batch-file, match the strings anywhere in a line.")
+    parser.add_argument(
+        "--mode", choices=QUERY_MODES, default="EXACT",
+        help="Match the search string as a whole line, a line prefix, a "
+        "substring of a line or a regular expression.")
+    load = parser.add_argument_group(
+        "load mode", "Send queries concurrently and report throughput.")
+    load.add_argument(
+        "--load", action="store_true", help="Run in load mode.")
+    load.add_argument(
+        "--concurrency", type=int, default=10,
+        help="Number of concurrent connections.")
+    limit = load.add_mutually_exclusive_group()
+    limit.add_argument(
+        "--requests", type=int, help="Total number of queries to send.")
+    limit.add_argument(
+        "--duration", type=float, help="Seconds to keep sending queries.")
+    load.add_argument(
+        "--qps", type=float, help="Target combined queries per second.")
+    load.add_argument(
+        "--query-file", type=str,
+        help="File with one search string per line to cycle through.")
+    load.add_argument(
+        "--no-reuse", action="store_true",
+        help="Open a new connection for every query.")
     args = parser.parse_args()
-    send_query(args.search_string)
+
+    if args.load:
+        if args.query_file:
+            with open(args.query_file, "r", encoding="utf-8") as file:
+                queries = [line.rstrip("\r\n") for line in file]
+        elif args.search_string is not None:
+            queries = [args.search_string]
+        else:
+            parser.error("load mode needs a search string or --query-file")
+        result = run_load(
+            queries, concurrency=args.concurrency, requests=args.requests,
+            duration=args.duration, qps=args.qps, reuse=not args.no_reuse)
+        print(format_load_report(result))
+    elif args.batch_file:
+        try:
+            with open(args.batch_file, "r", encoding="utf-8") as file:
+                queries = [line.rstrip("\r\n") for line in file]
+            results = send_batch(queries, substring=args.substring)
+            for query, found in zip(queries, results):
+                print(f"{query}: "
+                      f"{'STRING EXISTS' if found else 'STRING NOT FOUND'}")
+        except Exception as e:
+            print(f"Error: {e}")
+    elif args.search_string is not None:
+        try:
+            query = format_query(args.search_string, args.mode)
+        except ValueError as e:
+            parser.error(str(e))
+        send_query(query)
+    else:
+        parser.error("a search string or --batch-file is required")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+"""
+Versioned in-memory index of the lines contained in a corpus file.
+
+The index keeps every line of the file, stripped of surrounding
+whitespace, in a hash set so an exact-match lookup is a single
+constant-time probe instead of a scan over the whole file. Each index
+is tagged with the (inode, size, mtime_ns) version of the file it was
+built from and is only rebuilt when that version changes.
+
+Corpora are usually append-only, so the index also remembers the byte
+offset up to which the file has been indexed. When the file has only
+grown, just the new tail is read and added; a full rebuild happens only
+when the file was truncated, rewritten or replaced by a new inode.
+"""
+
+import os
+import threading
+
+# Number of bytes before the indexed offset that must be unchanged for
+# the file to be treated as appended to rather than rewritten
+TAIL_GUARD_SIZE = 64
+
+# Number of appends whose lines are remembered for appended_since
+MAX_APPENDS_KEPT = 16
+
+
+def file_version(path) -> tuple:
+    """
+    Return the version tuple used to detect changes to a file.
+
+    Parameters:
+    - path: The path of the file.
+
+    Returns:
+    - A tuple of (inode, size, mtime_ns).
+    """
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class CorpusIndex:
+    """
+    Exact-match index over the stripped lines of a single file.
+
+    Parameters:
+    - path: The path of the file to index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = None
+        self.lines = set()
+        # Byte offset just past the last complete line that was indexed
+        self.offset = 0
+        # The last line when the file does not end with a newline; it is
+        # kept apart because a writer may still be appending to it
+        self.tail = None
+        self._guard = b""
+        # (version before, version after, lines added) of each append
+        # since the last rebuild, the most recent last
+        self._appends = []
+        self._lock = threading.Lock()
+
+    def __contains__(self, search_string: str) -> bool:
+        return search_string in self.lines or search_string == self.tail
+
+    def __len__(self) -> int:
+        return len(self.lines) + (
+            self.tail is not None and self.tail not in self.lines)
+
+    def __iter__(self):
+        yield from self.lines
+        if self.tail is not None and self.tail not in self.lines:
+            yield self.tail
+
+    def contains(self, search_string: str) -> bool:
+        return search_string in self
+
+    def snapshot(self) -> tuple:
+        """
+        Return a consistent copy of the indexed lines.
+
+        Returns:
+        - A tuple of (version, lines) where lines is a list of the
+        distinct stripped lines of that version.
+        """
+        with self._lock:
+            return self.version, list(self)
+
+    def appended_since(self, version: tuple):
+        """
+        Return the lines added to the index since an earlier version.
+
+        Parameters:
+        - version: A version of this index, e.g. one returned by
+        snapshot().
+
+        Returns:
+        - A tuple of (version, lines) where lines is a list of the
+        distinct stripped lines of that version that the earlier one did
+        not have, or None if they are not known: the index was rebuilt
+        since, the earlier version ended with an unterminated line that
+        may since have grown, or too many appends have happened.
+        """
+        with self._lock:
+            if version == self.version and self.tail is None:
+                return self.version, []
+            for start, (before, _, _, had_tail) in enumerate(self._appends):
+                if before == version and not had_tail:
+                    break
+            else:
+                return None
+            lines = [line for _, _, added, _ in self._appends[start:]
+                     for line in added]
+            if self.tail is not None and self.tail not in self.lines:
+                lines.append(self.tail)
+            return self.version, lines
+
+    def refresh(self, check_version: bool = True) -> "CorpusIndex":
+        """
+        Make sure the index reflects the current contents of the file.
+
+        Parameters:
+        - check_version: Whether to compare the file version against the
+        indexed one. When False, an index that has already been built is
+        used as-is and the file is not touched.
+
+        Returns:
+        - The index itself, so calls can be chained.
+        """
+        if self.version is not None and not check_version:
+            return self
+        if (self.version is not None
+                and file_version(self.path) == self.version):
+            return self
+
+        with self._lock:
+            version = file_version(self.path)
+            if version != self.version:
+                if not self._append(version):
+                    self._rebuild(version)
+        return self
+
+    def _rebuild(self, version: tuple) -> None:
+        # The version is taken before reading, so a write that races with
+        # the rebuild is picked up by the next refresh. The new set is
+        # swapped in whole so concurrent lookups never see a partial index.
+        with open(self.path, "rb") as file:
+            lines: set = set()
+            offset, tail, guard = self._read_lines(file, lines, 0)
+        self.lines = lines
+        self.offset, self.tail, self._guard = offset, tail, guard
+        self.version = version
+        self._appends = []
+
+    def _append(self, version: tuple) -> bool:
+        """
+        Index only the part of the file written since the last refresh.
+
+        Parameters:
+        - version: The current version of the file.
+
+        Returns:
+        - True if the file was appended to and its tail has been indexed,
+        False if a full rebuild is required.
+        """
+        if (self.version is None
+                or version[0] != self.version[0]
+                or version[1] <= self.version[1]
+                or version[1] < self.offset):
+            return False
+
+        with open(self.path, "rb") as file:
+            file.seek(self.offset - len(self._guard))
+            if file.read(len(self._guard)) != self._guard:
+                return False
+            added: set = set()
+            offset, tail, guard = self._read_lines(
+                file, added, self.offset)
+        added.difference_update(self.lines)
+        self.lines |= added
+        self._appends.append(
+            (self.version, version, list(added), self.tail is not None))
+        del self._appends[:-MAX_APPENDS_KEPT]
+        self.offset, self.tail, self._guard = offset, tail, guard
+        self.version = version
+        return True
+
+    @staticmethod
+    def _read_lines(file, lines: set, offset: int) -> tuple:
+        """
+        Add the stripped lines read from file to lines.
+
+        Parameters:
+        - file: A binary file object positioned at offset.
+        - lines: The set to add complete lines to.
+        - offset: The byte offset the file is positioned at.
+
+        Returns:
+        - A tuple of (offset, tail, guard) after the last complete line.
+        """
+        tail = None
+        for raw in file:
+            if raw.endswith(b"\n"):
+                lines.add(raw.decode("utf-8").strip())
+                offset += len(raw)
+            else:
+                tail = raw.decode("utf-8").strip()
+
+        guard_size = min(offset, TAIL_GUARD_SIZE)
+        file.seek(offset - guard_size)
+        return offset, tail, file.read(guard_size)
@@ -0,0 +1,189 @@
+"""
+Memory-mapped corpus that answers exact-line queries on the raw bytes.
+
+Instead of decoding the file and keeping one string per line, the file
+is mapped read-only and a query is answered by finding its encoded bytes
+and checking that only whitespace separates the hit from the newlines
+around it. Per-query allocation stays constant and the page cache, which
+is shared with every other process mapping the file, is the only memory
+cost.
+
+Writers should append to the corpus or replace it atomically; truncating
+a file in place while it is mapped can fault readers that are scanning it.
+"""
+
+import mmap
+import re
+import threading
+
+from corpus_index import MAX_APPENDS_KEPT, TAIL_GUARD_SIZE, file_version
+
+# Encoded characters removed by str.strip(), which the lines of the
+# in-memory index are stripped with, apart from the newline separator.
+# No character past U+3000 is whitespace.
+LINE_WHITESPACE = re.compile(b"(?:%s)*" % b"|".join(
+    re.escape(chr(code).encode("utf-8")) for code in range(0x3001)
+    if chr(code).isspace() and code != 0x0A))
+
+# A line made of nothing but whitespace
+BLANK_LINE = re.compile(b"(?m)^%s$" % LINE_WHITESPACE.pattern)
+
+
+class MappedCorpus:
+    """
+    Exact-match lookups over a memory-mapped file.
+
+    Parameters:
+    - path: The path of the file to map.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = None
+        self._map = None
+        # (version before, offset of the first line not complete in that
+        # version, whether that version ended in a line without a newline)
+        # of each append since the file was last rewritten
+        self._appends = []
+        # Size of the mapping and a copy of its last bytes, which must
+        # be unchanged for the file to be treated as appended to
+        self._size = 0
+        self._guard = b""
+        self._lock = threading.Lock()
+
+    def contains(self, search_string: str) -> bool:
+        return search_string in self
+
+    def __contains__(self, search_string: str) -> bool:
+        mapping = self._map
+        if mapping is None:
+            return False
+        # A stripped line never has surrounding whitespace or a newline
+        if search_string != search_string.strip() or "\n" in search_string:
+            return False
+        if not search_string:
+            match = BLANK_LINE.search(mapping)
+            # The empty match after a trailing newline is not a line
+            return match is not None and match.start() < len(mapping)
+
+        needle = search_string.encode("utf-8")
+        start = mapping.find(needle)
+        while start != -1:
+            end = start + len(needle)
+            line_start = mapping.rfind(b"\n", 0, start) + 1
+            line_end = mapping.find(b"\n", end)
+            if line_end == -1:
+                line_end = len(mapping)
+            if (LINE_WHITESPACE.fullmatch(mapping, line_start, start)
+                    and LINE_WHITESPACE.fullmatch(mapping, end, line_end)):
+                return True
+            # No other hit on this line can span the whole line either
+            start = mapping.find(needle, line_end + 1)
+        return False
+
+    def __len__(self) -> int:
+        mapping = self._map
+        if mapping is None:
+            return 0
+        count = 0
+        start = mapping.find(b"\n")
+        while start != -1:
+            count += 1
+            start = mapping.find(b"\n", start + 1)
+        return count + (mapping[-1] != 0x0A)
+
+    def __iter__(self):
+        # Stream the stripped lines without copying the whole file
+        mapping = self._map
+        if mapping is None:
+            return
+        start = 0
+        while start < len(mapping):
+            end = mapping.find(b"\n", start)
+            if end == -1:
+                end = len(mapping)
+            yield mapping[start:end].decode("utf-8").strip()
+            start = end + 1
+
+    def appended_since(self, version: tuple, whole_lines: bool = False):
+        """
+        Return the lines appended to the file since an earlier version.
+
+        Parameters:
+        - version: A version of this corpus.
+        - whole_lines: Whether to give up, like CorpusIndex does, when the
+        earlier version ended in a line without a newline, since its
+        stripped text may not be a line of the file any more.
+
+        Returns:
+        - A tuple of (version, lines) where lines is a list of the
+        stripped lines written since the earlier version, including the
+        line it ended in if that had no newline yet, or None if they are
+        not known because the file was rewritten since or, with
+        whole_lines, that line may have grown.
+        """
+        with self._lock:
+            mapping, current = self._map, self.version
+            if version == current:
+                return current, []
+            for before, start, had_tail in self._appends:
+                if before == version:
+                    break
+            else:
+                return None
+        if had_tail and whole_lines:
+            return None
+        lines = mapping[start:].split(b"\n")
+        if not lines[-1]:
+            lines.pop()
+        return current, [line.decode("utf-8").strip() for line in lines]
+
+    def refresh(self, check_version: bool = True) -> "MappedCorpus":
+        """
+        Make sure the mapping covers the current contents of the file.
+
+        Parameters:
+        - check_version: Whether to compare the file version against the
+        mapped one. When False, an existing mapping is used as-is.
+
+        Returns:
+        - The corpus itself, so calls can be chained.
+        """
+        if self.version is not None and not check_version:
+            return self
+        if (self.version is not None
+                and file_version(self.path) == self.version):
+            return self
+
+        with self._lock:
+            version = file_version(self.path)
+            if version != self.version:
+                self._remap(version)
+        return self
+
+    def _remap(self, version: tuple) -> None:
+        # The previous mapping is not closed here because other threads
+        # may still be scanning it; it is released once unreferenced.
+        with open(self.path, "rb") as file:
+            if version[1] == 0:
+                mapping = None  # Empty files cannot be mapped
+            else:
+                mapping = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(mapping) if mapping is not None else 0
+        if (self.version is not None and mapping is not None
+                and version[0] == self.version[0]
+                and self._size < size
+                and mapping[self._size - len(self._guard):self._size]
+                == self._guard):
+            start = mapping.rfind(b"\n", 0, self._size) + 1
+            self._appends.append((self.version, start, start < self._size))
+            del self._appends[:-MAX_APPENDS_KEPT]
+        else:
+            self._appends = []
+        self._size = size
+        self._guard = (
+            mapping[max(size - TAIL_GUARD_SIZE, 0):size]
+            if mapping is not None else b"")
+        self._map = mapping
+        self.version = version
@@ -0,0 +1,264 @@
+"""
+In-process metrics registry exported in the Prometheus text format.
+
+Counters and latency histograms are updated in place by the code paths
+they measure; values owned by other objects, such as cache or worker
+pool counters, are read by collector callbacks only when the metrics are
+scraped. start_metrics_server serves the registry over HTTP on its own
+port so scraping never competes with the search protocol.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds, of the default latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(labels: dict) -> str:
+    """
+    Render a label set in the exposition format.
+
+    Parameters:
+    - labels: Mapping of label names to values.
+
+    Returns:
+    - The rendered label set, or an empty string if there are no labels.
+    """
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\")
+                         .replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonically increasing value per label set.
+
+    Parameters:
+    - name: The metric name.
+    - documentation: The help text.
+    - labelnames: Names of the labels every update must provide.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Counter):
+    """
+    Distribution of observed values in cumulative buckets per label set.
+
+    Parameters:
+    - name: The metric name.
+    - documentation: The help text.
+    - labelnames: Names of the labels every observation must provide.
+    - buckets: Sorted upper bounds of the buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts, then the sum and count of all values
+                state = self._values[key] = [0] * (len(self.buckets) + 3)
+            state[position] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the time spent in a with block, in seconds.
+
+        Parameters:
+        - labels: The label values of the observation.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return 0 if state is None else state[-1]
+
+    def samples(self):
+        with self._lock:
+            values = [
+                (key, list(state)) for key, state in self._values.items()]
+        bounds = self.buckets + (float("inf"),)
+        for key, state in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       {**labels, "le": format_value(bound)}, cumulative)
+            yield f"{self.name}_sum", labels, state[-2]
+            yield f"{self.name}_count", labels, state[-1]
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics and collector callbacks rendered together.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(),
+                  buckets=DEFAULT_BUCKETS):
+        return self._register(
+            Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        """
+        Register a callback that reports values owned by other objects.
+
+        The callback is called on every scrape and returns a list of
+        (name, kind, documentation, samples) tuples, where kind is
+        "counter" or "gauge" and samples is a list of (labels, value).
+
+        Parameters:
+        - function: The callback.
+
+        Returns:
+        - The callback, so this can be used as a decorator.
+        """
+        with self._lock:
+            self._collectors.append(function)
+        return function
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+        - The exposition text.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        output = []
+        for metric in metrics:
+            output.append(f"# HELP {metric.name} {metric.documentation}")
+            output.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                output.append(
+                    f"{name}{format_labels(labels)} {format_value(value)}")
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                output.append(f"# HELP {name} {documentation}")
+                output.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    output.append(
+                        f"{name}{format_labels(labels)} "
+                        f"{format_value(value)}")
+        return "\n".join(output) + "\n"
+
+
+# Registry used by the server
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(registry: MetricsRegistry, host: str, port: int):
+    """
+    Serve the registry over HTTP from a background thread.
+
+    Parameters:
+    - registry: The registry to expose.
+    - host: The address to bind, normally a local one.
+    - port: The port to listen on.
+
+    Returns:
+    - The running ThreadingHTTPServer; call shutdown() to stop it.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are too frequent to be worth logging
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(
+        target=httpd.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    return httpd
@@ -0,0 +1,315 @@
+"""
+Indexes answering prefix and substring queries over the stripped lines
+of a corpus.
+
+Exact queries are answered by the hash set of the corpus index. A prefix
+query is a binary search in the sorted lines: the first line not below
+the prefix is the only one that needs to be checked. A substring query
+looks up the posting lists of the trigrams of the query and only checks
+the lines present in all of them. A regular expression query does the
+same with the trigrams of the literal strings every match must contain,
+then runs the expression on the remaining lines only. No kind of query
+scans the whole corpus unless it is too short, or too unspecific, to
+narrow the candidates.
+
+Posting lists are kept as the gaps between ascending line numbers, each
+encoded as a base-128 varint, so most entries take a single byte.
+"""
+
+import bisect
+import copy
+import re
+
+# Length of the n-grams indexed for substring queries
+GRAM_SIZE = 3
+
+# A posting list this many times longer than the candidates left is not
+# decoded; checking the candidates directly is cheaper
+INTERSECT_RATIO = 8
+
+# Quantifier that can repeat the previous atom zero times
+OPTIONAL_REPEAT = re.compile(r"\{(\d*)(?:,\d*)?\}")
+
+# Arguments following the letter of a numeric or named escape, and the
+# digits of an octal escape or a group reference after its first one
+ESCAPE_ARGUMENTS = {
+    "x": re.compile(r"[0-9a-fA-F]{0,2}"),
+    "u": re.compile(r"[0-9a-fA-F]{0,4}"),
+    "U": re.compile(r"[0-9a-fA-F]{0,8}"),
+    "N": re.compile(r"(?:\{[^}]*\})?"),
+    "0": re.compile(r"[0-9]{0,2}"),
+}
+
+
+class PrefixIndex:
+    """
+    Sorted distinct lines answering whether any line starts with a prefix.
+
+    Parameters:
+    - lines: The stripped lines of the corpus.
+    """
+
+    def __init__(self, lines):
+        self.lines = sorted(set(lines))
+
+    def contains(self, prefix: str) -> bool:
+        position = bisect.bisect_left(self.lines, prefix)
+        return (position < len(self.lines)
+                and self.lines[position].startswith(prefix))
+
+    def extend(self, lines) -> "PrefixIndex":
+        # Merge the sorted new lines into a copy, slice by slice, so
+        # lookups in progress keep the old list
+        merged = []
+        start = 0
+        for line in sorted(set(lines)):
+            end = bisect.bisect_left(self.lines, line, start)
+            merged += self.lines[start:end]
+            if end == len(self.lines) or self.lines[end] != line:
+                merged.append(line)
+            start = end
+        merged += self.lines[start:]
+        index = copy.copy(self)
+        index.lines = merged
+        return index
+
+
+def grams(text: str) -> set:
+    return {text[i:i + GRAM_SIZE]
+            for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def encode_postings(numbers, previous: int = 0) -> bytes:
+    """
+    Delta-encode ascending line numbers.
+
+    Parameters:
+    - numbers: The line numbers, in ascending order.
+    - previous: The last number of the list the encoded numbers are
+    appended to, or 0 for a new list.
+
+    Returns:
+    - The gaps between consecutive numbers as base-128 varints, the low
+    seven bits first and the high bit set on all but the last byte.
+    """
+    output = bytearray()
+    for number in numbers:
+        gap = number - previous
+        previous = number
+        while gap >= 0x80:
+            output.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        output.append(gap)
+    return bytes(output)
+
+
+def decode_postings(data: bytes) -> list:
+    numbers = []
+    previous = 0
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            previous += value
+            numbers.append(previous)
+            value = 0
+            shift = 0
+    return numbers
+
+
+def required_literals(pattern: str) -> list:
+    """
+    Extract literal strings that every match of a regular expression
+    contains.
+
+    The extraction is conservative: alternations, groups, classes and
+    escapes other than escaped punctuation end a literal, along with the
+    hex digits, name or octal digits of the escape, and a character that
+    may be repeated zero times is dropped from it.
+
+    Parameters:
+    - pattern: The regular expression.
+
+    Returns:
+    - The literal strings, possibly none; a match may contain others.
+    """
+    flags = re.compile(pattern).flags
+    if flags & (re.IGNORECASE | re.VERBOSE):
+        return []
+
+    literals = []
+    run: list = []
+    # Whether the last character of run is the atom just parsed
+    last_literal = False
+    depth = 0
+    position = 0
+
+    def end_run():
+        if run:
+            literals.append("".join(run))
+            run.clear()
+
+    while position < len(pattern):
+        char = pattern[position]
+        position += 1
+        literal = None
+        if char == "\\":
+            escaped = pattern[position:position + 1]
+            position += 1
+            if escaped and not escaped.isalnum():
+                literal = escaped
+            else:
+                argument = ESCAPE_ARGUMENTS.get(
+                    "0" if escaped.isdigit() else escaped)
+                skipped = argument and argument.match(pattern, position)
+                if skipped:
+                    position = skipped.end()
+        elif char == "[":
+            # Skip the class; a leading ] or ^] is part of it
+            if pattern.startswith("^", position):
+                position += 1
+            if pattern.startswith("]", position):
+                position += 1
+            while position < len(pattern) and pattern[position] != "]":
+                position += 1 + (pattern[position] == "\\")
+            position += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|":
+            if depth == 0:
+                return []
+        elif char in "*?":
+            if last_literal:
+                run.pop()
+        elif char == "{":
+            repeat = OPTIONAL_REPEAT.match(pattern, position - 1)
+            if repeat is None:
+                literal = char
+            else:
+                position = repeat.end()
+                if last_literal and not int(repeat.group(1) or 0):
+                    run.pop()
+        elif char not in ".^$+":
+            literal = char
+
+        if literal is not None and depth == 0:
+            run.append(literal)
+            last_literal = True
+        else:
+            # A repeated atom may be followed by anything, so "+" ends
+            # the literal after the atom it repeats
+            end_run()
+            last_literal = False
+    end_run()
+    return literals
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigrams to the lines containing them.
+
+    Parameters:
+    - lines: The stripped lines of the corpus.
+    """
+
+    def __init__(self, lines):
+        self.lines = []
+        # Each trigram maps to (number of lines, last line number,
+        # encoded line numbers)
+        self.postings = {}
+        self.extend(lines)
+
+    def extend(self, lines) -> "TrigramIndex":
+        """
+        Add lines to the index.
+
+        A line the index already holds may be added again; it is then
+        checked twice, which does not change any answer.
+
+        Parameters:
+        - lines: The stripped lines to add.
+
+        Returns:
+        - The index itself.
+        """
+        first = len(self.lines)
+        # The lines go in before any posting refers to them, so lookups
+        # in progress never read past the end of the list
+        self.lines.extend(dict.fromkeys(lines))
+        postings: dict = {}
+        for number in range(first, len(self.lines)):
+            for gram in grams(self.lines[number]):
+                postings.setdefault(gram, []).append(number)
+        for gram, numbers in postings.items():
+            count, last, data = self.postings.get(gram, (0, 0, b""))
+            self.postings[gram] = (
+                count + len(numbers), numbers[-1],
+                data + encode_postings(numbers, last))
+        return self
+
+    def candidates(self, query_grams):
+        """
+        Return the numbers of the lines that may contain some trigrams.
+
+        Parameters:
+        - query_grams: The trigrams every wanted line must contain.
+
+        Returns:
+        - The sorted numbers of the lines in the posting lists that were
+        intersected, a superset of the lines holding every trigram, or
+        None if there are no trigrams to narrow the lines down with.
+        """
+        if not query_grams:
+            return None
+        postings = sorted(
+            (self.postings.get(gram, (0, 0, b"")) for gram in query_grams),
+            key=lambda posting: posting[0])
+        # Intersect from the shortest posting list up
+        candidates = None
+        for count, _, data in postings:
+            if candidates is not None and (
+                    not candidates
+                    or count > len(candidates) * INTERSECT_RATIO):
+                break
+            numbers = decode_postings(data)
+            if candidates is None:
+                candidates = set(numbers)
+            else:
+                candidates.intersection_update(numbers)
+        return sorted(candidates)
+
+    def contains(self, query: str) -> bool:
+        if "\n" in query:
+            return False
+        numbers = self.candidates(grams(query))
+        if numbers is None:
+            return any(query in line for line in self.lines)
+        return any(query in self.lines[number] for number in numbers)
+
+    def contains_regex(self, pattern: str) -> bool:
+        """
+        Check whether a regular expression matches in any line.
+
+        Parameters:
+        - pattern: The regular expression, searched for in each line.
+
+        Returns:
+        - True if some line contains a match, False otherwise.
+
+        Raises:
+        - re.error: If the pattern is not a valid regular expression.
+        """
+        expression = re.compile(pattern)
+        query_grams = set()
+        for literal in required_literals(pattern):
+            query_grams |= grams(literal)
+        numbers = self.candidates(query_grams)
+        if numbers is None:
+            return any(expression.search(line) for line in self.lines)
+        return any(
+            expression.search(self.lines[number]) for number in numbers)
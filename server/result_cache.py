@@ -0,0 +1,88 @@
+"""
+Bounded least-recently-used cache of query results.
+
+Callers key each result by the query together with the version of the
+corpus it was computed from. When the file changes its version changes,
+so entries of the old version can no longer be looked up and simply age
+out of the cache; an answer computed before a change is never returned
+after it.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Thread-safe LRU mapping of keys to results with hit counters.
+
+    Parameters:
+    - max_size: Maximum number of entries kept.
+    """
+
+    def __init__(self, max_size: int):
+        if max_size < 1:
+            raise ValueError("Result cache size must be at least 1")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached result for a key and mark it recently used.
+
+        Parameters:
+        - key: A hashable key.
+
+        Returns:
+        - The cached result, or None if the key is not cached.
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result) -> None:
+        """
+        Cache a result, evicting the least recently used entry if full.
+
+        Parameters:
+        - key: A hashable key.
+        - result: The result to cache; None cannot be cached.
+        """
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the cache counters.
+
+        Returns:
+        - A dictionary with the current and maximum size, the hits and
+        misses counted so far and the hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
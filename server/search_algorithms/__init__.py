@@ -0,0 +1,51 @@
+"""
+Registry of the search algorithms the server can be configured with.
+
+Every algorithm module provides the original function taking
+(data, target), plus prepare(lines, source=None), which does the
+per-corpus preprocessing once and returns a searcher whose
+contains(target) reports whether target is one of the stripped lines.
+source is the path of the corpus file, for algorithms that persist
+their preprocessing next to it. A searcher may also provide
+contains_many(targets), returning one boolean per target, to resolve a
+whole batch in one pass, and extend(lines), adding lines appended to
+the corpus without preparing it again. extend returns the searcher for
+the longer corpus: either itself, updated so that lookups in progress
+stay correct, or a new searcher. Algorithms that compile the target into
+search tables keep the compiled patterns in an LRU cache of
+PATTERN_CACHE_SIZE entries, so repeated queries skip the compilation.
+"""
+
+import importlib
+
+# Compiled patterns kept per algorithm, shared by every thread
+PATTERN_CACHE_SIZE = 1024
+
+ALGORITHMS = (
+    "naive_search",
+    "binary_search",
+    "kmp_search",
+    "rabin_karp_search",
+    "boyer_moore_search",
+    "aho_corasick_search",
+    "regex_search",
+    "numpy_search",
+)
+
+
+def load_algorithm(name: str):
+    """
+    Import the module of a search algorithm.
+
+    Parameters:
+    - name: The name of the algorithm, as used in config.ini.
+
+    Returns:
+    - The algorithm module.
+
+    Raises:
+    - ImportError: If the algorithm is not recognized.
+    """
+    if name not in ALGORITHMS:
+        raise ImportError(f"Search algorithm '{name}' is not recognized.")
+    return importlib.import_module(f".{name}", __name__)
@@ -15,6 +15,16 @@ Parameters:
 
 Returns:
 - True if the target string is found in the data, False otherwise.
+
+prepare(lines) returns an AhoCorasickSearcher whose automaton is built
+once from the stripped lines, so a lookup only walks the target's path
+through the trie instead of rebuilding the automaton for every query.
+
+MultiPatternScanner inverts this for multi-pattern work: a batch of
+queries, or a standing watch-list, is compiled into one automaton and
+the corpus is streamed through it once, reporting which patterns occur
+either as whole lines or as substrings. Checking K strings then costs
+one pass over the corpus instead of K.
 """
 
 import ahocorasick
@@ -38,3 +48,78 @@ def aho_corasick_search(data: list, target: str) -> bool:
 
     # Target string not found
     return False
+
+
+class AhoCorasickSearcher:
+    def __init__(self, lines):
+        # Exact lookups only need the trie, so make_automaton() is skipped
+        self.automaton = ahocorasick.Automaton()
+        self.has_blank_line = False
+        self.extend(lines)
+
+    def extend(self, lines) -> "AhoCorasickSearcher":
+        for line in lines:
+            line = line.strip()
+            if line:
+                self.automaton.add_word(line, line)
+            else:
+                # The automaton does not store empty keys
+                self.has_blank_line = True
+        return self
+
+    def contains(self, target: str) -> bool:
+        if not target:
+            return self.has_blank_line
+        return self.automaton.exists(target)
+
+
+def prepare(lines, source=None) -> AhoCorasickSearcher:
+    return AhoCorasickSearcher(lines)
+
+
+class MultiPatternScanner:
+    def __init__(self, patterns):
+        self.patterns = frozenset(patterns)
+        self.automaton = ahocorasick.Automaton()
+        for pattern in self.patterns:
+            if pattern:
+                self.automaton.add_word(pattern, pattern)
+        if len(self.automaton):
+            self.automaton.make_automaton()
+
+    def scan(self, lines, whole_line: bool = False) -> set:
+        # An empty pattern is a substring of any line, but only matches a
+        # blank line as a whole line
+        matched = set()
+        remaining = len(self.patterns)
+        empty_pending = "" in self.patterns
+        for line in lines:
+            if not remaining:
+                # Every pattern has been seen; the rest cannot add more
+                break
+            line = line.strip()
+            if empty_pending and (line == "" or not whole_line):
+                matched.add("")
+                empty_pending = False
+                remaining -= 1
+            if not line or not len(self.automaton):
+                continue
+            if whole_line:
+                pattern = self.automaton.get(line, None)
+                if pattern is not None and pattern not in matched:
+                    matched.add(pattern)
+                    remaining -= 1
+            else:
+                for _, pattern in self.automaton.iter(line):
+                    if pattern not in matched:
+                        matched.add(pattern)
+                        remaining -= 1
+        return matched
+
+    def scan_file(self, path, whole_line: bool = False) -> set:
+        with open(path, "r", encoding="utf-8") as file:
+            return self.scan(file, whole_line)
+
+
+def multi_pattern_search(data, targets, whole_line: bool = False) -> set:
+    return MultiPatternScanner(targets).scan(data, whole_line)
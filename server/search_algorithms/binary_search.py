@@ -16,9 +16,23 @@ Parameters:
 
 Returns:
 - True if the target element is found in the data, False otherwise.
+
+prepare(lines, source) returns a BinarySearcher holding the distinct
+stripped lines in sorted order, so every lookup is a bisection over data
+that is actually sorted. When the path of the source file is given, the
+sorted lines are persisted to a sidecar file next to it and reloaded on
+the next start for as long as the source's size and mtime still match,
+which skips the sort. Lines appended to the source are merged into a
+copy of the sorted lines by extend(lines) without sorting them again.
 """
 
 import bisect
+import copy
+import logging
+import os
+
+SIDECAR_SUFFIX = ".sorted"
+SIDECAR_MAGIC = "binary_search-sidecar-v1"
 
 
 def binary_search(data, target) -> bool:
@@ -32,3 +46,80 @@ def binary_search(data, target) -> bool:
 
     # Target element not found
     return False
+
+
+def sidecar_path(source) -> str:
+    return os.fspath(source) + SIDECAR_SUFFIX
+
+
+def load_sidecar(source):
+    # Returns the sorted lines, or None when the sidecar is missing or no
+    # longer matches the source file
+    try:
+        stat = os.stat(source)
+        with open(sidecar_path(source), "r", encoding="utf-8",
+                  newline="\n") as file:
+            header = file.readline().split()
+            if header[:1] != [SIDECAR_MAGIC] or len(header) != 4:
+                return None
+            size, mtime_ns, count = (int(value) for value in header[1:])
+            if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                return None
+            lines = file.read().split("\n")[:-1]
+    except (OSError, ValueError):
+        return None
+    return lines if len(lines) == count else None
+
+
+def save_sidecar(source, lines) -> None:
+    stat = os.stat(source)
+    path = sidecar_path(source)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as file:
+            file.write(f"{SIDECAR_MAGIC} {stat.st_size} "
+                       f"{stat.st_mtime_ns} {len(lines)}\n")
+            for line in lines:
+                file.write(line + "\n")
+        # Readers only ever see a complete sidecar
+        os.replace(temp_path, path)
+    except OSError as e:
+        logging.warning("Could not write sorted index '%s': %s", path, e)
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+class BinarySearcher:
+    def __init__(self, lines, source=None):
+        sorted_lines = load_sidecar(source) if source is not None else None
+        if sorted_lines is None:
+            sorted_lines = sorted({line.strip() for line in lines})
+            if source is not None:
+                save_sidecar(source, sorted_lines)
+        self.lines = sorted_lines
+
+    def contains(self, target: str) -> bool:
+        index = bisect.bisect_left(self.lines, target)
+        return index < len(self.lines) and self.lines[index] == target
+
+    def extend(self, lines) -> "BinarySearcher":
+        # Merge the sorted new lines into a copy, slice by slice, so
+        # lookups in progress keep the old list
+        merged = []
+        start = 0
+        for line in sorted({line.strip() for line in lines}):
+            end = bisect.bisect_left(self.lines, line, start)
+            merged += self.lines[start:end]
+            if end == len(self.lines) or self.lines[end] != line:
+                merged.append(line)
+            start = end
+        merged += self.lines[start:]
+        searcher = copy.copy(self)
+        searcher.lines = merged
+        return searcher
+
+
+def prepare(lines, source=None) -> BinarySearcher:
+    return BinarySearcher(lines, source)
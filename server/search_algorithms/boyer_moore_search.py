@@ -11,61 +11,106 @@ Parameters:
 
 Returns:
 - True if the target string is found within the text, False otherwise.
+
+prepare(lines) returns a BoyerMooreSearcher that joins the stripped lines
+into one newline-separated buffer. An exact line lookup is then a single
+Boyer-Moore scan for the target surrounded by newlines.
+
+compile_pattern(pattern) builds both tables once and returns a
+CompiledPattern whose search(text) reuses them; compiled patterns are
+kept in a bounded LRU cache shared across threads. The bad character
+table is a dict, so any Unicode character can occur in the pattern or
+the text.
 """
 
+from functools import lru_cache
 
-def boyer_moore_search(data, target) -> bool:
-    m = len(target)
+from . import PATTERN_CACHE_SIZE
+
+
+def bad_character_table(pattern):
+    # Last index of every character of the pattern; others are -1
+    bad_char = {}
+    for i in range(len(pattern)):
+        bad_char[pattern[i]] = i
+    return bad_char
 
-    # Preprocessing
-    bad_char = [-1] * 256
-    for i in range(m):
-        bad_char[ord(target[i])] = i
-
-    def good_suffix_table(pattern):
-        m = len(pattern)
-        good_suffix = [0] * m
-        last_prefix_position = m
-        for i in range(m - 1, -1, -1):
-            if is_prefix(pattern, i + 1):
-                last_prefix_position = i + 1
-            good_suffix[m - 1 - i] = last_prefix_position + (m - 1 - i)
-        for i in range(m - 1):
-            slen = suffix_length(pattern, i)
-            good_suffix[slen] = m - 1 - i + slen
-        return good_suffix
-
-    def is_prefix(pattern, p):
-        m = len(pattern)
-        for i in range(p, m):
-            if pattern[i] != pattern[i - p]:
-                return False
-        return True
-
-    def suffix_length(pattern, p):
-        m = len(pattern)
-        length = 0
-        for i in range(p, -1, -1):
-            if pattern[i] == pattern[m - 1 - p + i]:
-                length += 1
-            else:
-                break
-        return length
-
-    good_suffix = good_suffix_table(target)
-
-    for line in data:
-        line = line.strip()
-        n = len(line)
-        if n < m:
-            continue
-        s = 0
-        while s <= n - m:
-            j = m - 1
-            while j >= 0 and target[j] == line[s + j]:
-                j -= 1
-            if j < 0:
-                return True
-            else:
-                s += max(1, j - bad_char[ord(line[s + j])], good_suffix[j])
+
+def good_suffix_table(pattern):
+    # shift[j + 1] is the shift after a mismatch at pattern[j], built
+    # from the borders of every suffix of the pattern
+    m = len(pattern)
+    shift = [0] * (m + 1)
+    border = [0] * (m + 1)
+    i = m
+    j = m + 1
+    border[i] = j
+    while i > 0:
+        while j <= m and pattern[i - 1] != pattern[j - 1]:
+            if shift[j] == 0:
+                shift[j] = j - i
+            j = border[j]
+        i -= 1
+        j -= 1
+        border[i] = j
+    j = border[0]
+    for i in range(m + 1):
+        if shift[i] == 0:
+            shift[i] = j
+        if i == j:
+            j = border[j]
+    return shift
+
+
+def boyer_moore_find(line, target, bad_char, good_suffix) -> bool:
+    m = len(target)
+    n = len(line)
+    if n < m:
+        return False
+    s = 0
+    while s <= n - m:
+        j = m - 1
+        while j >= 0 and target[j] == line[s + j]:
+            j -= 1
+        if j < 0:
+            return True
+        else:
+            s += max(good_suffix[j + 1], j - bad_char.get(line[s + j], -1))
     return False
+
+
+class CompiledPattern:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.bad_char = bad_character_table(pattern)
+        self.good_suffix = good_suffix_table(pattern)
+
+    def search(self, text) -> bool:
+        return boyer_moore_find(
+            text, self.pattern, self.bad_char, self.good_suffix)
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern) -> CompiledPattern:
+    return CompiledPattern(pattern)
+
+
+def boyer_moore_search(data, target) -> bool:
+    # One scan over the joined lines; a stripped line has no newline
+    if not data or "\n" in target:
+        return False
+    text = "\n".join(line.strip() for line in data)
+    return compile_pattern(target).search(text)
+
+
+class BoyerMooreSearcher:
+    def __init__(self, lines):
+        lines = [line.strip() for line in lines]
+        self.text = "\n" + "\n".join(lines) + "\n" if lines else ""
+
+    def contains(self, target: str) -> bool:
+        return compile_pattern("\n" + target + "\n").search(self.text)
+
+
+def prepare(lines, source=None) -> BoyerMooreSearcher:
+    return BoyerMooreSearcher(lines)
@@ -10,16 +10,53 @@ Parameters:
 
 Returns:
 - True if the target string is found within the text, False otherwise.
+
+prepare(lines) returns a KMPSearcher that joins the stripped lines into one
+newline-separated buffer. An exact line lookup is then a single KMP scan
+for the target surrounded by newlines.
+
+compile_pattern(pattern) builds the LPS table once and returns a
+CompiledPattern whose search(text) reuses it; compiled patterns are kept
+in a bounded LRU cache shared across threads.
 """
 
+from functools import lru_cache
 
-def kmp_search(data: list, target: str) -> bool:
-    def KMPSearch(pat, txt):
+from . import PATTERN_CACHE_SIZE
+
+
+def computeLPSArray(pat, M, lps):
+    length = 0
+    lps[0] = 0
+    i = 1
+    while i < M:
+        if pat[i] == pat[length]:
+            length += 1
+            lps[i] = length
+            i += 1
+        else:
+            if length != 0:
+                length = lps[length - 1]
+            else:
+                lps[i] = 0
+                i += 1
+
+
+class CompiledPattern:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.lps = [0] * len(pattern)
+        if pattern:
+            computeLPSArray(pattern, len(pattern), self.lps)
+
+    def search(self, txt) -> bool:
+        pat = self.pattern
+        lps = self.lps
         M = len(pat)
         N = len(txt)
-        lps = [0] * M
+        if M == 0:
+            return True
         j = 0
-        computeLPSArray(pat, M, lps)
         i = 0
         while i < N:
             if pat[j] == txt[i]:
@@ -34,23 +71,32 @@ def kmp_search(data: list, target: str) -> bool:
                     i += 1
         return False
 
-    def computeLPSArray(pat, M, lps):
-        length = 0
-        lps[0] = 0
-        i = 1
-        while i < M:
-            if pat[i] == pat[length]:
-                length += 1
-                lps[i] = length
-                i += 1
-            else:
-                if length != 0:
-                    length = lps[length - 1]
-                else:
-                    lps[i] = 0
-                    i += 1
 
-    for line in data:
-        if KMPSearch(target, line.strip()):
-            return True
-    return False
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern) -> CompiledPattern:
+    return CompiledPattern(pattern)
+
+
+def KMPSearch(pat, txt):
+    return compile_pattern(pat).search(txt)
+
+
+def kmp_search(data: list, target: str) -> bool:
+    # One scan over the joined lines; a stripped line has no newline
+    if not data or "\n" in target:
+        return False
+    text = "\n".join(line.strip() for line in data)
+    return compile_pattern(target).search(text)
+
+
+class KMPSearcher:
+    def __init__(self, lines):
+        lines = [line.strip() for line in lines]
+        self.text = "\n" + "\n".join(lines) + "\n" if lines else ""
+
+    def contains(self, target: str) -> bool:
+        return compile_pattern("\n" + target + "\n").search(self.text)
+
+
+def prepare(lines, source=None) -> KMPSearcher:
+    return KMPSearcher(lines)
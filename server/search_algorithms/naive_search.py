@@ -9,6 +9,9 @@ Parameters:
 
 Returns:
 - True if the target string is found within the text, False otherwise.
+
+prepare(lines) returns a NaiveSearcher that keeps the stripped lines so
+repeated lookups against the same corpus skip the per-line strip().
 """
 
 
@@ -17,3 +20,22 @@ def naive_search(data: list, target: str) -> bool:
         if line.strip() == target:
             return True
     return False
+
+
+class NaiveSearcher:
+    def __init__(self, lines):
+        self.lines = [line.strip() for line in lines]
+
+    def contains(self, target: str) -> bool:
+        for line in self.lines:
+            if line == target:
+                return True
+        return False
+
+    def extend(self, lines) -> "NaiveSearcher":
+        self.lines.extend(line.strip() for line in lines)
+        return self
+
+
+def prepare(lines, source=None) -> NaiveSearcher:
+    return NaiveSearcher(lines)
@@ -0,0 +1,156 @@
+"""
+This function checks whether the target string (pattern) is one of the
+lines of text using NumPy: every line is reduced to a 64-bit fingerprint
+in vectorized form and the fingerprint of the target is looked up in
+the sorted fingerprints with a binary search.
+
+Parameters:
+- data: A list of strings representing the lines of text to search within.
+- target: The target string (pattern) to search for within the text.
+
+Returns:
+- True if the target string is found within the text, False otherwise.
+
+prepare(lines) returns a NumpySearcher holding the stripped lines as one
+contiguous UTF-8 buffer with NumPy arrays of line offsets and sorted
+fingerprints. Its contains_many(targets) fingerprints a whole batch of
+queries the same way and resolves them with a single np.searchsorted
+call; candidates whose fingerprint matches are then compared byte for
+byte, so fingerprint collisions never produce a false match.
+
+Fingerprints are polynomial hashes modulo 2**64. With the inverse of the
+odd multiplier, prefix sums over the whole buffer give the hash of every
+line at once, without a Python loop over the lines.
+"""
+
+import numpy as np
+
+# Odd multiplier of the polynomial hash, and its inverse modulo 2**64
+MULTIPLIER = 0x9E3779B97F4A7C15
+INVERSE = pow(MULTIPLIER, -1, 2 ** 64)
+
+NEWLINE = ord("\n")
+
+# Bytes fingerprinted at a time, bounding the temporary arrays
+CHUNK_SIZE = 1 << 22
+
+
+def powers(base: int, count: int) -> np.ndarray:
+    # base**0 .. base**(count - 1) modulo 2**64; uint64 products wrap
+    values = np.full(count, base, dtype=np.uint64)
+    if count:
+        values[0] = 1
+    return np.cumprod(values, dtype=np.uint64)
+
+
+def chunk_fingerprints(buffer: np.ndarray) -> tuple:
+    ends = np.flatnonzero(buffer == NEWLINE)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+
+    values = buffer.astype(np.uint64)
+    # prefix[k] = sum of values[i] * INVERSE**i for i < k
+    prefix = np.zeros(len(buffer) + 1, dtype=np.uint64)
+    np.cumsum(values * powers(INVERSE, len(buffer)), dtype=np.uint64,
+              out=prefix[1:])
+    # Scaling by MULTIPLIER**end turns each range sum into the polynomial
+    # hash of the line; the length is mixed in to separate empty lines
+    scale = powers(MULTIPLIER, len(buffer) + 1)[ends]
+    lengths = (ends - starts).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        hashes = (prefix[ends] - prefix[starts]) * scale
+        fingerprints = hashes * np.uint64(MULTIPLIER) + lengths
+    return starts, ends, fingerprints
+
+
+def line_fingerprints(buffer: np.ndarray) -> tuple:
+    """
+    Split a newline-terminated buffer into lines and fingerprint them.
+
+    The buffer is processed in chunks of whole lines so the temporary
+    arrays stay bounded however large the corpus is.
+
+    Parameters:
+    - buffer: A uint8 array of lines, each terminated by a newline.
+
+    Returns:
+    - A tuple of (starts, ends, fingerprints) arrays, one entry per line.
+    """
+    parts = []
+    begin = 0
+    while begin < len(buffer):
+        limit = min(begin + CHUNK_SIZE, len(buffer))
+        newlines = np.flatnonzero(buffer[begin:limit] == NEWLINE)
+        if len(newlines):
+            end = begin + int(newlines[-1]) + 1
+        else:
+            # A line longer than a chunk is fingerprinted on its own
+            end = limit + int(
+                np.flatnonzero(buffer[limit:] == NEWLINE)[0]) + 1
+        starts, ends, fingerprints = chunk_fingerprints(buffer[begin:end])
+        parts.append((starts + begin, ends + begin, fingerprints))
+        begin = end
+    if not parts:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=np.uint64))
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def encode_lines(lines) -> np.ndarray:
+    data = "".join(f"{line}\n" for line in lines).encode("utf-8")
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def numpy_search(data: list, target: str) -> bool:
+    return prepare(data).contains(target)
+
+
+class NumpySearcher:
+    def __init__(self, lines):
+        self.buffer = encode_lines(line.strip() for line in lines)
+        self._bytes = self.buffer.tobytes()
+        starts, ends, fingerprints = line_fingerprints(self.buffer)
+        order = np.argsort(fingerprints, kind="stable")
+        self.fingerprints = fingerprints[order]
+        self.starts = starts[order]
+        self.ends = ends[order]
+
+    def contains(self, target: str) -> bool:
+        return self.contains_many([target])[0]
+
+    def contains_many(self, targets) -> list:
+        targets = list(targets)
+        found = [False] * len(targets)
+        # Lines never contain a newline, and one would split the query
+        searchable = [number for number, target in enumerate(targets)
+                      if "\n" not in target]
+        if not searchable or not len(self.fingerprints):
+            return found
+
+        query_buffer = encode_lines(targets[number] for number in searchable)
+        query_starts, query_ends, query_fingerprints = line_fingerprints(
+            query_buffer)
+        positions = np.searchsorted(self.fingerprints, query_fingerprints)
+        query_bytes = query_buffer.tobytes()
+
+        count = len(self.fingerprints)
+        for number, position, fingerprint, start, end in zip(
+                searchable, positions.tolist(), query_fingerprints.tolist(),
+                query_starts.tolist(), query_ends.tolist()):
+            needle = query_bytes[start:end]
+            # Check every line sharing the fingerprint to rule out
+            # collisions
+            while (position < count
+                   and int(self.fingerprints[position]) == fingerprint):
+                line_start = int(self.starts[position])
+                line_end = int(self.ends[position])
+                if self._bytes[line_start:line_end] == needle:
+                    found[number] = True
+                    break
+                position += 1
+        return found
+
+
+def prepare(lines, source=None) -> NumpySearcher:
+    return NumpySearcher(lines)
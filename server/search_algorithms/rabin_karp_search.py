@@ -1,5 +1,5 @@
 """
-This function implements the Rabin-Karp string search algorithm,
+This module implements the Rabin-Karp string search algorithm,
 which uses hashing to find an exact match of the target string
 (pattern) within a larger string (text).
 
@@ -9,53 +9,175 @@ Parameters:
 
 Returns:
 - True if the target string is found within the text, False otherwise.
+
+prepare(lines) returns a RabinKarpSearcher that joins the stripped lines
+into one newline-separated UTF-8 buffer. An exact line lookup is a scan
+for the target surrounded by newlines, and contains_many(targets) looks
+for a whole batch in the same scan.
+
+Every scan, including rabin_karp_search, uses RollingHashMatcher. Its
+hash is taken modulo 2**64, so windows almost never collide with a
+pattern prefix they differ from. Patterns are grouped by
+length into power-of-two classes, and one rolling pass over the buffer
+per class tests every pattern of the class at once: windows of the
+class's power-of-two length are hashed, and the patterns whose prefix of
+that length hashes the same are checked in full. MultiPatternScanner
+applies it to substring queries over blocks of whole lines.
 """
 
+from itertools import chain
+
+# Odd multiplier of the 64-bit rolling hash
+BASE = 0x100000001B3
+MASK = (1 << 64) - 1
+
+# Approximate number of characters scanned per block of lines
+BLOCK_SIZE = 1 << 20
+
+
+def window_hash(data: bytes) -> int:
+    value = 0
+    for byte in data:
+        value = (value * BASE + byte) & MASK
+    return value
+
+
+class RollingHashMatcher:
+    def __init__(self, patterns):
+        # Patterns are grouped by the largest power of two not above their
+        # length, and indexed by the hash of a prefix of that many bytes
+        self.buckets = {}
+        for pattern in set(patterns):
+            if pattern:
+                window = 1 << (len(pattern).bit_length() - 1)
+                bucket = self.buckets.setdefault(window, {})
+                bucket.setdefault(
+                    window_hash(pattern[:window]), []).append(pattern)
+
+    def __len__(self) -> int:
+        return sum(len(patterns) for bucket in self.buckets.values()
+                   for patterns in bucket.values())
+
+    def scan(self, text: bytes) -> set:
+        # Patterns found are returned once and no longer looked for
+        found = set()
+        for window in list(self.buckets):
+            bucket = self.buckets[window]
+            found |= scan_bucket(text, window, bucket)
+            if not bucket:
+                del self.buckets[window]
+        return found
+
+
+def scan_bucket(text: bytes, window: int, bucket: dict) -> set:
+    found: set = set()
+    if len(text) < window:
+        return found
+    # Weight of the byte leaving the window
+    high = pow(BASE, window - 1, MASK + 1)
+    value = window_hash(text[:window])
+    # The text is read through a view instead of being copied, and the
+    # padding byte only feeds the hash past the last window
+    rolling = zip(text, chain(memoryview(text)[window:], (0,)))
+    for position, (outgoing, incoming) in enumerate(rolling):
+        candidates = bucket.get(value)
+        if candidates is not None:
+            # A prefix hash hit is verified against the whole pattern
+            for pattern in [pattern for pattern in candidates
+                            if text.startswith(pattern, position)]:
+                found.add(pattern)
+                candidates.remove(pattern)
+            if not candidates:
+                del bucket[value]
+                if not bucket:
+                    break
+        value = ((value - outgoing * high) * BASE + incoming) & MASK
+    return found
 
-def rabin_karp_search(data: list, target: str) -> bool:
-    d = 256  # Number of characters in the input alphabet
-    q = 101  # A prime number for hashing
-    M = len(target)
-    h = 1  # The value of h would be "pow(d, M-1)%q"
 
-    # Precompute h = pow(d, M-1) % q
-    for i in range(M - 1):
-        h = (h * d) % q
+class RabinKarpSearcher:
+    def __init__(self, lines):
+        lines = [line.strip() for line in lines]
+        text = "\n" + "\n".join(lines) + "\n" if lines else ""
+        self.text = text.encode("utf-8")
 
-    p = 0  # Hash value for the target pattern
-    t = 0  # Hash value for the text
+    def contains(self, target: str) -> bool:
+        return self.contains_many([target])[0]
 
-    # Precompute the hash value of the pattern and the first window of text
-    for i in range(M):
-        p = (d * p + ord(target[i])) % q
+    def contains_many(self, targets) -> list:
+        targets = list(targets)
+        # A newline inside a target would let it span two lines
+        framed = {
+            f"\n{target}\n".encode("utf-8"): target
+            for target in targets if "\n" not in target}
+        found = {
+            framed[pattern]
+            for pattern in RollingHashMatcher(framed).scan(self.text)}
+        return [target in found for target in targets]
 
-    for line in data:
+
+def prepare(lines, source=None) -> RabinKarpSearcher:
+    return RabinKarpSearcher(lines)
+
+
+def line_blocks(lines):
+    # Stripped lines grouped into blocks of about BLOCK_SIZE characters
+    block = []
+    size = 0
+    for line in lines:
         line = line.strip()
-        n = len(line)
-        if n < M:
-            continue
-
-        # Precompute the hash value of the first window of text
-        t = 0
-        for i in range(M):
-            t = (d * t + ord(line[i])) % q
-
-        # Slide the pattern over text one by one
-        for i in range(n - M + 1):
-            # Check the hash values of the current window of text and pattern
-            if p == t:
-                match = True
-                for j in range(M):
-                    if line[i + j] != target[j]:
-                        match = False
-                        break
-                if match:
-                    return True
-
-            # Calculate hash value for the next window of text
-            if i < n - M:
-                t = (d * (t - ord(line[i]) * h) + ord(line[i + M])) % q
-                if t < 0:
-                    t += q
-
-    return False
+        block.append(line)
+        size += len(line) + 1
+        if size >= BLOCK_SIZE:
+            yield block
+            block = []
+            size = 0
+    if block:
+        yield block
+
+
+class MultiPatternScanner:
+    def __init__(self, patterns):
+        self.patterns = frozenset(patterns)
+
+    def scan(self, lines, whole_line: bool = False) -> set:
+        # A stripped line has no newline, so such patterns never match.
+        # Whole lines are matched with the newlines around them; an
+        # empty pattern is then a blank line, and otherwise a substring
+        # of any line.
+        encoded = {}
+        for pattern in self.patterns:
+            if "\n" in pattern or not (pattern or whole_line):
+                continue
+            key = pattern.encode("utf-8")
+            encoded[b"\n" + key + b"\n" if whole_line else key] = pattern
+        matcher = RollingHashMatcher(encoded)
+        empty_pending = "" in self.patterns and not whole_line
+
+        matched = set()
+        for block in line_blocks(lines):
+            if empty_pending:
+                matched.add("")
+                empty_pending = False
+            text = "\n".join(block)
+            if whole_line:
+                text = f"\n{text}\n"
+            matched.update(
+                encoded[pattern]
+                for pattern in matcher.scan(text.encode("utf-8")))
+            if not len(matcher):
+                # Every pattern has been seen; the rest cannot add more
+                break
+        return matched
+
+    def scan_file(self, path, whole_line: bool = False) -> set:
+        with open(path, "r", encoding="utf-8") as file:
+            return self.scan(file, whole_line)
+
+
+def multi_pattern_search(data, targets, whole_line: bool = False) -> set:
+    return MultiPatternScanner(targets).scan(data, whole_line)
+
+
+def rabin_karp_search(data: list, target: str) -> bool:
+    return bool(multi_pattern_search(data, [target]))
@@ -9,17 +9,44 @@ Parameters:
 
 Returns:
 - True if the target string is found within the text, False otherwise.
+
+prepare(lines) returns a RegexSearcher that joins the stripped lines into
+one newline-separated buffer, so a lookup is a single multiline regex
+search instead of one match call per line. compile_pattern(target)
+keeps the compiled expressions in a bounded LRU cache shared across
+threads, so a repeated target is not compiled again.
 """
 
 import re
+from functools import lru_cache
+
+from . import PATTERN_CACHE_SIZE
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(target: str) -> re.Pattern:
+    # In multiline mode ^ and $ match at the newlines between lines
+    return re.compile(rf"^{re.escape(target)}$", re.MULTILINE)
 
 
 def regex_search(data: list, target: str) -> bool:
-    # Compile a regular expression pattern that matches the exact target string
-    pattern = re.compile(rf"^{re.escape(target)}$")
-
-    for line in data:
-        # Check if the pattern matches the stripped line
-        if pattern.match(line.strip()):
-            return True
-    return False
+    # One search over the joined lines; a stripped line has no newline
+    if not data or "\n" in target:
+        return False
+    text = "\n".join(line.strip() for line in data)
+    return compile_pattern(target).search(text) is not None
+
+
+class RegexSearcher:
+    def __init__(self, lines):
+        lines = [line.strip() for line in lines]
+        self.text = "\n".join(lines) if lines else None
+
+    def contains(self, target: str) -> bool:
+        if self.text is None or "\n" in target:
+            return False
+        return compile_pattern(target).search(self.text) is not None
+
+
+def prepare(lines, source=None) -> RegexSearcher:
+    return RegexSearcher(lines)
@@ -4,17 +4,40 @@ Server module to handle client connections and search queries.
 This server listens for incoming client connections, receives search queries,
 and searches for the specified string in a file. It supports SSL for secure
 connections and can dynamically import search algorithms.
+
+Connections are served either by a pool of worker threads or, with
+engine = asyncio, by a single asyncio event loop. With processes > 1 the
+server preforks that many workers which share one read-only line index.
 """
 
+import asyncio
+import glob
 import socket
 import sys
 import threading
 import time
 import ssl
 import os
+import re
 import configparser
 import logging
 import importlib
+import multiprocessing
+import signal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multiprocessing.connection import wait
+from typing import Dict, Optional, Union
+
+from bloom_filter import BloomFilter, FilteredSearcher
+from corpus_index import CorpusIndex, file_version
+from mapped_corpus import MappedCorpus
+from metrics import REGISTRY, start_metrics_server
+from query_index import PrefixIndex, TrigramIndex
+from result_cache import ResultCache
+from search_algorithms import load_algorithm
+from shared_index import (
+    SharedLineIndex, create_shared_index, load_index, save_index)
+from worker_pool import IdleConnections, WorkerPool
 
 # Configure logging
 logging.basicConfig(
@@ -45,141 +68,1491 @@ HOST = config.get("server", "host", fallback="0.0.0.0")
 PORT = config.getint("server", "port", fallback=44445)
 REREAD_ON_QUERY = config.getboolean("server",
                                     "reread_on_query", fallback=False)
+PROCESSES = config.getint("server", "processes", fallback=1)
+USE_MMAP = config.getboolean("server", "use_mmap", fallback=False)
+INDEX_FILE = config.getboolean("server", "index_file", fallback=False)
+BLOOM_FILTER = config.getboolean("server", "bloom_filter", fallback=False)
+BLOOM_FALSE_POSITIVE_RATE = config.getfloat(
+    "server", "bloom_false_positive_rate", fallback=0.01)
+if not 0 < BLOOM_FALSE_POSITIVE_RATE < 1:
+    raise ValueError("Bloom filter false positive rate must be in (0, 1).")
 SSL_ENABLED = config.getboolean("server", "ssl_enabled", fallback=False)
+ENGINE = config.get("server", "engine", fallback="threading")
+if ENGINE not in ("threading", "asyncio"):
+    raise ValueError(f"Server engine '{ENGINE}' is not recognized.")
+ASYNC_OFFLOAD = config.getboolean("server", "async_offload", fallback=False)
+WORKER_THREADS = config.getint("server", "worker_threads", fallback=32)
+MAX_QUEUE_DEPTH = config.getint("server", "max_queue_depth", fallback=256)
+IDLE_TIMEOUT = config.getfloat("server", "idle_timeout", fallback=30.0)
+SHARD_THREADS = config.getint("server", "shard_threads", fallback=8)
+RESULT_CACHE_SIZE = config.getint("server", "result_cache_size", fallback=0)
+METRICS_HOST = config.get("server", "metrics_host", fallback="127.0.0.1")
+METRICS_PORT = config.getint("server", "metrics_port", fallback=0)
+QUERY_LOG = config.getboolean("server", "query_log", fallback=True)
+QUERY_MODES_ENABLED = config.getboolean(
+    "server", "query_modes", fallback=False)
+# REGEX queries run without a time limit, and a short expression such as
+# (a+)+$ can backtrack for a time exponential in the length of a line;
+# only enable them when every client is trusted. max_regex_length bounds
+# the size of the expressions, not how long they run.
+REGEX_QUERIES = config.getboolean("server", "regex_queries", fallback=False)
+MAX_REGEX_LENGTH = config.getint("server", "max_regex_length", fallback=256)
+SSL_SESSION_TICKETS = config.getint(
+    "server", "ssl_session_tickets", fallback=2)
+SSL_CIPHERS = config.get("server", "ssl_ciphers", fallback="")
+SSL_ECDH_CURVE = config.get("server", "ssl_ecdh_curve", fallback="")
+HANDSHAKE_TIMEOUT = config.getfloat(
+    "server", "handshake_timeout", fallback=10.0)
 CERTFILE = config.get("server", "certfile", fallback="cert.pem")
 KEYFILE = config.get("server", "keyfile", fallback="key.pem")
 SEARCH_ALGORITHM = config.get("server",
                               "search_algorithms", fallback="binary_search")
-# Explicitly import search algorithm
-if SEARCH_ALGORITHM == "binary_search":
-    from search_algorithms.binary_search import (
-        binary_search as search_function
-    )
-elif SEARCH_ALGORITHM == "aho_corasick_search":
-    from search_algorithms.aho_corasick_search import (
-        aho_corasick_search as search_function
-    )
-elif SEARCH_ALGORITHM == "kmp_search":
-    from search_algorithms.kmp_search import (
-        kmp_search as search_function
-    )
-elif SEARCH_ALGORITHM == "boyer_moore_search":
-    from search_algorithms.boyer_moore_search import (
-        boyer_moore_search as search_function
-    )
-elif SEARCH_ALGORITHM == "naive_search":
-    from search_algorithms.naive_search import (
-        naive_search as search_function
-    )
-elif SEARCH_ALGORITHM == "rabin_karp_search":
-    from search_algorithms.rabin_karp_search import (
-        rabin_karp_search as search_function
-    )
-elif SEARCH_ALGORITHM == "regex_search":
-    from search_algorithms.regex_search import (
-        regex_search as search_function
-    )
-else:
-    raise ImportError(
-        f"Search algorithm '{SEARCH_ALGORITHM}' is not recognized.")
-
-
-# Fetch file path from config
+# Import the configured search algorithm
+SEARCH_MODULE = load_algorithm(SEARCH_ALGORITHM)
+# Substring scans use the configured algorithm's MultiPatternScanner when
+# it has one, and Aho-Corasick otherwise
+SCAN_ALGORITHM = (
+    SEARCH_ALGORITHM if hasattr(SEARCH_MODULE, "MultiPatternScanner")
+    else "aho_corasick_search")
+
+
+# Fetch file path from config; a comma-separated list of files or glob
+# patterns splits the corpus into shards that are searched in parallel
 file_path = config.get("server", "linuxpath")
 if not file_path:
     raise ValueError("File path not found in configuration file")
 
-# Global cache for file lines when not re-reading on each query
-FILE_LINES_CACHE = None
+# Exact-match indexes keyed by file path, built once per file version.
+# With use_mmap the file is memory-mapped and searched in place instead.
+CORPUS_INDEXES: Dict[str, Union[CorpusIndex, MappedCorpus]] = {}
+CORPUS_INDEXES_LOCK = threading.Lock()
+
+# Read-only indexes keyed by file path: built in shared memory for
+# prefork workers, or mapped from the .idx file next to the corpus
+SHARED_INDEXES: Dict[str, SharedLineIndex] = {}
+
+# Prepared searchers keyed by file path, as (index version, searcher).
+# A searcher is prepared under the lock of its path only, so preparing
+# one file does not hold up lookups in the others.
+SEARCHERS: Dict[str, tuple] = {}
+SEARCHERS_LOCK = threading.Lock()
+SEARCHER_LOCKS: Dict[str, threading.Lock] = {}
+
+# Prefix and trigram indexes keyed by (file path, index class), as
+# (corpus index version, index); built on the first query that needs one
+# under the lock of its key only
+MODE_INDEXES: Dict[tuple, tuple] = {}
+MODE_INDEXES_LOCK = threading.Lock()
+MODE_INDEX_LOCKS: Dict[tuple, threading.Lock] = {}
+
+# Index class and lookup method answering each non-exact query mode;
+# substring and regular expression queries share the trigram index
+MODE_LOOKUPS = {
+    "PREFIX": (PrefixIndex, "contains"),
+    "SUBSTRING": (TrigramIndex, "contains"),
+    "REGEX": (TrigramIndex, "contains_regex"),
+}
+
+# Lookup results keyed by (mode, query, corpus path, corpus version)
+RESULT_CACHE = (
+    ResultCache(RESULT_CACHE_SIZE) if RESULT_CACHE_SIZE > 0 else None)
+
+# Metrics exported on metrics_port
+REQUESTS = REGISTRY.counter(
+    "search_requests_total", "Search requests answered.", ("kind",))
+ERRORS = REGISTRY.counter(
+    "search_errors_total", "Searches that failed, by error.", ("error",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "search_request_seconds", "Time taken to answer a search request.",
+    ("kind", "algorithm"))
+PHASE_SECONDS = REGISTRY.histogram(
+    "search_phase_seconds",
+    "Time spent refreshing indexes, preparing searchers and looking up.",
+    ("phase", "algorithm"))
+TLS_HANDSHAKES = REGISTRY.counter(
+    "tls_handshakes_total",
+    "TLS handshakes by result: full, resumed or failed.", ("result",))
+TLS_HANDSHAKE_SECONDS = REGISTRY.histogram(
+    "tls_handshake_seconds", "Time taken by successful TLS handshakes.",
+    ("result",))
+
+
+# Shard files of each configured path, as last expanded
+SHARDS: Dict[str, list] = {}
+SHARDS_LOCK = threading.Lock()
+
+# Thread pool that fans queries out across shards
+SHARD_EXECUTOR = None
+
+# Last combined shard version of each configured path, shared by the
+# result cache keys of that version
+CORPUS_VERSIONS: Dict[str, tuple] = {}
+
+
+def shard_paths(path) -> list:
+    """
+    Expand a configured corpus path into the list of its shard files.
+
+    Parameters:
+    - path: A single file, or a comma-separated list of files and glob
+    patterns.
+
+    Returns:
+    - The shard paths in order. Patterns are expanded and sorted; plain
+    paths are kept even if missing, so the search reports the error.
+
+    Raises:
+    - FileNotFoundError: If the path names no files at all.
+    """
+    paths = []
+    for pattern in os.fspath(path).split(","):
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if any(char in pattern for char in "*?["):
+            paths.extend(sorted(glob.glob(pattern)))
+        else:
+            paths.append(pattern)
+    if not paths:
+        raise FileNotFoundError(f"No corpus files match '{path}'")
+    # The same file may be named twice; search it only once
+    return list(dict.fromkeys(paths))
+
+
+def get_shards(path, reread_on_query: bool) -> list:
+    """
+    Return the shard files of the specified corpus path.
+
+    With reread_on_query the path is expanded again on every query, so
+    files matching a glob can be added and removed while the server runs.
+    The indexes of shards that went away are dropped; each remaining
+    shard is reindexed on its own when its file changes.
+
+    Parameters:
+    - path: The configured corpus path.
+    - reread_on_query: Boolean indicating whether to expand the path
+    again instead of reusing the previous expansion.
+
+    Returns:
+    - The list of shard paths.
+    """
+    key = os.fspath(path)
+    shards = SHARDS.get(key)
+    if shards is not None and not reread_on_query:
+        return shards
+    shards = shard_paths(key)
+    with SHARDS_LOCK:
+        removed = set(SHARDS.get(key, ())) - set(shards)
+        SHARDS[key] = shards
+    for shard in removed:
+        forget_shard(shard)
+    return shards
+
+
+def forget_shard(path) -> None:
+    """
+    Drop every index and searcher kept for a shard.
+
+    Parameters:
+    - path: The path of the shard file.
+    """
+    with CORPUS_INDEXES_LOCK:
+        CORPUS_INDEXES.pop(path, None)
+    with SEARCHERS_LOCK:
+        SEARCHERS.pop(path, None)
+    with MODE_INDEXES_LOCK:
+        for index_class, _ in MODE_LOOKUPS.values():
+            MODE_INDEXES.pop((path, index_class), None)
+    SHARED_INDEXES.pop(path, None)
+    logging.info("Shard removed: '%s'", path)
+
+
+def get_shard_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread pool used to search shards in parallel.
+
+    Returns:
+    - The ThreadPoolExecutor, created on first use.
+    """
+    global SHARD_EXECUTOR
+    with SHARDS_LOCK:
+        if SHARD_EXECUTOR is None:
+            SHARD_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(SHARD_THREADS, 1),
+                thread_name_prefix="shard")
+    return SHARD_EXECUTOR
+
+
+def search_shard(shard, search_strings: list, reread_on_query: bool,
+                 mode: str = "EXACT", index=None) -> list:
+    """
+    Look up several strings in a single shard.
+
+    Parameters:
+    - shard: The path of the shard file.
+    - search_strings: The strings to search for.
+    - reread_on_query: Boolean indicating whether to check the shard
+    for changes first.
+    - mode: The query mode, EXACT, PREFIX, SUBSTRING or REGEX.
+    - index: The corpus index of the shard, already refreshed, or None
+    to fetch it.
+
+    Returns:
+    - A list with one boolean per search string.
+    """
+    if mode != "EXACT":
+        mode_index = get_mode_index(shard, mode, reread_on_query, index)
+        lookup = getattr(mode_index, MODE_LOOKUPS[mode][1])
+        with PHASE_SECONDS.time(phase="lookup", algorithm=mode.lower()):
+            return [lookup(search_string) for search_string in search_strings]
+
+    searcher = get_searcher(shard, reread_on_query, index)
+    with PHASE_SECONDS.time(phase="lookup", algorithm=SEARCH_ALGORITHM):
+        # Searchers that can resolve a whole batch at once do so
+        if hasattr(searcher, "contains_many"):
+            return searcher.contains_many(search_strings)
+        return [searcher.contains(search_string)
+                for search_string in search_strings]
+
+
+def search_shards(search_strings: list, path, reread_on_query: bool,
+                  mode: str = "EXACT", indexes=None) -> list:
+    """
+    Look up several strings across every shard of a corpus path.
+
+    The shards are searched in parallel and the search stops as soon as
+    every string has been found; shards still waiting for a thread are
+    not searched at all.
+
+    Parameters:
+    - search_strings: The strings to search for.
+    - path: The configured corpus path.
+    - reread_on_query: Boolean indicating whether to check the shards
+    for changes first.
+    - mode: The query mode, EXACT, PREFIX, SUBSTRING or REGEX.
+    - indexes: A dictionary of the shard paths to their refreshed corpus
+    indexes, as returned by shard_indexes, or None to expand the path
+    and fetch each index from the thread searching it.
+
+    Returns:
+    - A list with one boolean per search string, True if some shard
+    contains it.
+    """
+    if indexes is None:
+        indexes = dict.fromkeys(get_shards(path, reread_on_query))
+    shards = list(indexes.items())
+    if len(shards) == 1:
+        shard, index = shards[0]
+        return search_shard(
+            shard, search_strings, reread_on_query, mode, index)
+
+    found = [False] * len(search_strings)
+    futures = [
+        get_shard_executor().submit(
+            search_shard, shard, search_strings, reread_on_query, mode,
+            index)
+        for shard, index in shards
+    ]
+    try:
+        for future in as_completed(futures):
+            found = [
+                earlier or hit
+                for earlier, hit in zip(found, future.result())
+            ]
+            if all(found):
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+    return found
+
+
+def shard_indexes(path, reread_on_query: bool, algorithm: str) -> dict:
+    """
+    Return the corpus index of every shard of a corpus path.
+
+    Parameters:
+    - path: The configured corpus path.
+    - reread_on_query: Boolean indicating whether to check the shards
+    for changes first.
+    - algorithm: The algorithm label the index phase is timed under.
+
+    Returns:
+    - A dictionary of the shard paths, in order, to their indexes.
+    """
+    shards = get_shards(path, reread_on_query)
+    with PHASE_SECONDS.time(phase="index", algorithm=algorithm):
+        return {
+            shard: get_corpus_index(shard, reread_on_query)
+            for shard in shards
+        }
+
+
+def corpus_version(path, indexes: dict) -> tuple:
+    """
+    Return the combined version of the shard indexes of a corpus path.
+
+    Parameters:
+    - path: The configured corpus path.
+    - indexes: The shard indexes, as returned by shard_indexes.
+
+    Returns:
+    - A tuple with the (inode, size, mtime_ns) version of each shard
+    index, which changes whenever any shard is changed, added or removed.
+    While it does not change, the same tuple is returned every time.
+    """
+    version = tuple(index.version for index in indexes.values())
+    key = os.fspath(path)
+    previous = CORPUS_VERSIONS.get(key)
+    if previous == version:
+        return previous
+    CORPUS_VERSIONS[key] = version
+    return version
+
+
+def cached_search_shards(
+        search_strings: list, path, reread_on_query: bool,
+        mode: str = "EXACT") -> list:
+    """
+    Look up several strings, answering repeated ones from the cache.
+
+    Results are cached under the version of the corpus they were looked
+    up in, so a file change makes every earlier result unreachable and
+    reread_on_query never serves an answer from before the change. The
+    shards are expanded and checked for changes once, and the same
+    indexes are searched for the strings the cache does not hold.
+
+    Parameters:
+    - search_strings: The strings to search for.
+    - path: The configured corpus path.
+    - reread_on_query: Boolean indicating whether to check the shards
+    for changes first.
+    - mode: The query mode, EXACT, PREFIX, SUBSTRING or REGEX.
+
+    Returns:
+    - A list with one boolean per search string.
+    """
+    if RESULT_CACHE is None:
+        return search_shards(search_strings, path, reread_on_query, mode)
+
+    algorithm = SEARCH_ALGORITHM if mode == "EXACT" else mode.lower()
+    indexes = shard_indexes(path, reread_on_query, algorithm)
+    version = corpus_version(path, indexes)
+    keys = [(mode, search_string, os.fspath(path), version)
+            for search_string in search_strings]
+    found = [RESULT_CACHE.get(key) for key in keys]
+    missing = [number for number, hit in enumerate(found) if hit is None]
+    if missing:
+        results = search_shards(
+            [search_strings[number] for number in missing],
+            path, reread_on_query, mode, indexes)
+        for number, result in zip(missing, results):
+            found[number] = result
+            RESULT_CACHE.put(keys[number], result)
+    return found
+
+
+def get_corpus_index(path, reread_on_query: bool):
+    """
+    Return the index for the specified file, building it if needed.
+
+    Parameters:
+    - path: The path of the file to index.
+    - reread_on_query: Boolean indicating whether to check the file
+    for changes before the index is used.
+
+    Returns:
+    - The shared or mapped index opened at startup while it still
+    matches the file, otherwise the up-to-date CorpusIndex, or
+    MappedCorpus when use_mmap is set.
+    """
+    key = os.fspath(path)
+    shared = SHARED_INDEXES.get(key)
+    if shared is not None and (
+            not reread_on_query or shared.version == file_version(key)):
+        return shared
+    with CORPUS_INDEXES_LOCK:
+        index = CORPUS_INDEXES.get(key)
+        if index is None:
+            if USE_MMAP:
+                index = MappedCorpus(key)
+            else:
+                index = CorpusIndex(key)
+            CORPUS_INDEXES[key] = index
+    return index.refresh(check_version=reread_on_query)
+
+
+def get_searcher(path, reread_on_query: bool, index=None):
+    """
+    Return the searcher that answers lookups for the specified file.
+
+    For an in-memory index this is the configured algorithm's searcher,
+    prepared once per index version. After an append, a searcher that
+    provides extend(lines) only takes the appended lines. The previous
+    searcher keeps answering while the new one is prepared and is then
+    swapped for it. Memory-mapped and shared indexes, including mapped
+    index files, answer exact lookups themselves. With bloom_filter set,
+    the searcher of any index is put behind a Bloom filter so that
+    definite misses never reach it; appended lines are added to the
+    filter instead of building it again.
+
+    Parameters:
+    - path: The path of the file to search in.
+    - reread_on_query: Boolean indicating whether to check the file
+    for changes before the searcher is used.
+    - index: The corpus index of the file, already refreshed, or None to
+    fetch it.
+
+    Returns:
+    - An object with a contains(search_string) method.
+    """
+    if index is None:
+        with PHASE_SECONDS.time(phase="index", algorithm=SEARCH_ALGORITHM):
+            index = get_corpus_index(path, reread_on_query)
+    if not isinstance(index, CorpusIndex) and not BLOOM_FILTER:
+        return index
+
+    with SEARCHERS_LOCK:
+        entry = SEARCHERS.get(index.path)
+        if entry is not None and entry[0] == index.version:
+            return entry[1]
+        lock = SEARCHER_LOCKS.setdefault(index.path, threading.Lock())
+
+    with lock:
+        # Another thread may have prepared it while this one waited
+        with SEARCHERS_LOCK:
+            entry = SEARCHERS.get(index.path)
+        if entry is None or entry[0] != index.version:
+            with PHASE_SECONDS.time(
+                    phase="prepare", algorithm=SEARCH_ALGORITHM):
+                entry = prepare_searcher(index, entry)
+            with SEARCHERS_LOCK:
+                SEARCHERS[index.path] = entry
+    return entry[1]
+
+
+def get_mode_index(path, mode: str, reread_on_query: bool, index=None):
+    """
+    Return the index answering non-exact queries of a mode for a file.
+
+    The index is built from the stripped lines of the file on the first
+    query that needs it, streamed from the mapping or the shared index
+    when the corpus index does not keep them. When the file has only
+    grown since, the appended lines are added to the index instead of
+    building it again. Other files and modes are not held up meanwhile.
+
+    Parameters:
+    - path: The path of the file to search in.
+    - mode: The query mode, PREFIX, SUBSTRING or REGEX.
+    - reread_on_query: Boolean indicating whether to check the file
+    for changes before the index is used.
+    - index: The corpus index of the file, already refreshed, or None to
+    fetch it.
+
+    Returns:
+    - A PrefixIndex or a TrigramIndex.
+    """
+    algorithm = mode.lower()
+    if index is None:
+        with PHASE_SECONDS.time(phase="index", algorithm=algorithm):
+            index = get_corpus_index(path, reread_on_query)
+    index_class = MODE_LOOKUPS[mode][0]
+    key = (os.fspath(path), index_class)
+    with MODE_INDEXES_LOCK:
+        entry = MODE_INDEXES.get(key)
+        if entry is not None and entry[0] == index.version:
+            return entry[1]
+        lock = MODE_INDEX_LOCKS.setdefault(key, threading.Lock())
+
+    with lock:
+        # Another thread may have built it while this one waited
+        with MODE_INDEXES_LOCK:
+            entry = MODE_INDEXES.get(key)
+        if entry is None or entry[0] != index.version:
+            with PHASE_SECONDS.time(phase="prepare", algorithm=algorithm):
+                entry = prepare_mode_index(index, index_class, entry)
+            with MODE_INDEXES_LOCK:
+                MODE_INDEXES[key] = entry
+    return entry[1]
+
+
+def prepare_mode_index(index, index_class, previous=None) -> tuple:
+    """
+    Build the prefix or trigram index for the current version of an index.
+
+    Parameters:
+    - index: A CorpusIndex, MappedCorpus or SharedLineIndex.
+    - index_class: PrefixIndex or TrigramIndex.
+    - previous: The (index version, prefix or trigram index) built for
+    an earlier version of the index, or None.
+
+    Returns:
+    - A tuple of (index version, prefix or trigram index).
+    """
+    if previous is not None and hasattr(index, "appended_since"):
+        if isinstance(index, MappedCorpus):
+            # The old text of a line that has grown would stay indexed
+            appended = index.appended_since(previous[0], whole_lines=True)
+        else:
+            appended = index.appended_since(previous[0])
+        if appended is not None:
+            version, lines = appended
+            return version, previous[1].extend(lines)
+
+    if isinstance(index, CorpusIndex):
+        version, lines = index.snapshot()
+    else:
+        # The version is read before the mapping, which is never older
+        version = index.version
+        lines = index
+    return version, index_class(lines)
+
+
+def prepare_searcher(index, previous=None) -> tuple:
+    """
+    Prepare the searcher for the current version of an index.
+
+    Parameters:
+    - index: A CorpusIndex, MappedCorpus or SharedLineIndex.
+    - previous: The (index version, searcher) prepared for an earlier
+    version of the index, or None.
+
+    Returns:
+    - A tuple of (index version, searcher).
+    """
+    if previous is not None and hasattr(index, "appended_since"):
+        entry = extend_searcher(index, *previous)
+        if entry is not None:
+            return entry
+
+    if isinstance(index, CorpusIndex):
+        version, lines = index.snapshot()
+        # Only let the algorithm persist its preprocessing next to the
+        # file while the lines still match what is on disk
+        source = None
+        if file_version(index.path) == version:
+            source = index.path
+        searcher = SEARCH_MODULE.prepare(lines, source=source)
+    else:
+        # The version is read before the mapping, which is never older.
+        # Shared indexes never change version.
+        version = index.version
+        lines = searcher = index
+    if BLOOM_FILTER:
+        searcher = FilteredSearcher(
+            BloomFilter.from_lines(lines, BLOOM_FALSE_POSITIVE_RATE),
+            searcher)
+    return version, searcher
+
+
+def index_lines(index):
+    """
+    Return the distinct stripped lines of an index.
+
+    Parameters:
+    - index: A CorpusIndex, MappedCorpus or SharedLineIndex.
+
+    Returns:
+    - A sized iterable of the lines; shared and mapped indexes read
+    their lines from the shared buffer or the mapping.
+    """
+    if isinstance(index, CorpusIndex):
+        return index.snapshot()[1]
+    return index
+
+
+def extend_searcher(index, version: tuple, searcher):
+    """
+    Add the lines appended to an index since a searcher was prepared.
+
+    Parameters:
+    - index: The CorpusIndex or MappedCorpus the searcher was prepared
+    from.
+    - version: The version of the index the searcher was prepared for.
+    - searcher: The searcher, possibly behind a Bloom filter.
+
+    Returns:
+    - A tuple of (index version, searcher), or None if the searcher
+    cannot be extended or the appended lines are not known.
+    """
+    filtered = isinstance(searcher, FilteredSearcher)
+    inner = searcher.searcher if filtered else searcher
+    # An index answering lookups itself is always up to date
+    extend_inner = inner is not index
+    if extend_inner and not hasattr(inner, "extend"):
+        return None
+    appended = index.appended_since(version)
+    if appended is None:
+        return None
+    version, lines = appended
+    if extend_inner:
+        inner = inner.extend(lines)
+    if filtered:
+        bloom = searcher.bloom.extended(lines, lambda: index_lines(index))
+        inner = FilteredSearcher(bloom, inner)
+    return version, inner
+
+
+def bloom_filter_stats() -> dict:
+    """
+    Return the counters of the Bloom filters currently in use.
+
+    Returns:
+    - A dictionary mapping each file path to its filter's stats.
+    """
+    with SEARCHERS_LOCK:
+        entries = list(SEARCHERS.items())
+    return {
+        path: searcher.bloom.stats()
+        for path, (version, searcher) in entries
+        if isinstance(searcher, FilteredSearcher)
+    }
+
+
+# Responses to REGEX queries the configuration does not allow
+REGEX_DISABLED_RESPONSE = "Error: Regular expression queries are disabled.\n"
+REGEX_TOO_LONG_RESPONSE = "Error: Regular expression too long.\n"
 
 
 def search_string_in_file(
-    search_string: str, path: str, reread_on_query: bool
+    search_string: str, path: str, reread_on_query: bool,
+    mode: str = "EXACT"
 ) -> str:
     """
     Search for a string in the specified file.
 
+    The lookup is dispatched to the configured algorithm's searcher,
+    which is prepared from an in-memory index of the stripped lines of
+    the file. With reread_on_query the index is only rebuilt when the
+    file's (inode, size, mtime_ns) version has changed. A path naming
+    several shard files is searched in parallel up to the first hit.
+    With result_cache_size set, repeated queries against an unchanged
+    corpus are answered from the result cache. In PREFIX and SUBSTRING
+    mode the string is looked for at the start or anywhere in a line,
+    using a sorted array or a trigram index of the lines instead. In
+    REGEX mode it is a regular expression searched for in each line,
+    run only on the lines the trigram index cannot rule out and with no
+    time limit; such queries are refused unless regex_queries is set,
+    which is only safe with trusted clients, and expressions longer than
+    max_regex_length are refused.
+
     Parameters:
     - search_string: The string to search for.
-    - path: The path of the file to search in.
+    - path: The path of the file to search in, or a comma-separated list
+    of files and glob patterns.
     - reread_on_query: Boolean indicating whether to
     reread the file on each query.
+    - mode: The query mode, EXACT, PREFIX, SUBSTRING or REGEX.
 
     Returns:
     - A string indicating whether the search string was found or not,
     or an error message if the file is not found.
     """
-    global FILE_LINES_CACHE
-    start_time = time.time()
+    if mode == "REGEX":
+        if not REGEX_QUERIES:
+            return REGEX_DISABLED_RESPONSE
+        if len(search_string) > MAX_REGEX_LENGTH:
+            return REGEX_TOO_LONG_RESPONSE
+    try:
+        found, = cached_search_shards(
+            [search_string], path, reread_on_query, mode)
+        if found:
+            return "STRING EXISTS\n"
+        return "STRING NOT FOUND\n"
+    except Exception as e:
+        return search_error_response(e, path)
+
+
+def search_batch_in_file(
+    search_strings: list, path: str, reread_on_query: bool
+) -> str:
+    """
+    Search for several strings in the specified file at once.
 
+    The searcher of each shard is fetched (and refreshed when
+    reread_on_query is set) once for the whole batch, then every string
+    is resolved against it.
+
+    Parameters:
+    - search_strings: The strings to search for.
+    - path: The path of the file to search in.
+    - reread_on_query: Boolean indicating whether to
+    reread the file on each query.
+
+    Returns:
+    - A line with one flag per search string, 1 if it was found and 0
+    otherwise, or an error message if the file cannot be searched.
+    """
     try:
-        if reread_on_query:
-            with open(path, "r", encoding="utf-8") as file:
-                lines = file.readlines()
-        else:
-            if FILE_LINES_CACHE is None:
-                with open(path, "r", encoding="utf-8") as file:
-                    FILE_LINES_CACHE = file.readlines()
-            lines = FILE_LINES_CACHE
-
-        for line in lines:
-            if line.strip() == search_string:
-                execution_time = (
-                    time.time() - start_time
-                ) * 1000  # Convert to milliseconds
-                logging.debug(
-                    "Execution time: %.2f ms for query: %s",
-                    execution_time, search_string
-                )
-                return "STRING EXISTS\n"
-        execution_time = (time.time() - start_time) * 1000
-        logging.debug(
-            "Execution time: %.2f ms for query: %s",
-            execution_time, search_string
+        flags = "".join(
+            "1" if found else "0"
+            for found in cached_search_shards(
+                search_strings, path, reread_on_query)
         )
-        return "STRING NOT FOUND\n"
-    except PermissionError:
+        return flags + "\n"
+    except Exception as e:
+        return search_error_response(e, path)
+
+
+def scan_batch_in_file(
+    search_strings: list, path: str, reread_on_query: bool
+) -> str:
+    """
+    Find which strings occur anywhere in the specified file.
+
+    All strings are compiled into a single multi-pattern scanner, an
+    Aho-Corasick automaton unless the configured algorithm provides its
+    own, and the lines of the file are streamed through it once, instead
+    of scanning the file once per string.
+
+    Parameters:
+    - search_strings: The strings to look for as substrings of a line.
+    - path: The path of the file to search in.
+    - reread_on_query: Boolean indicating whether to
+    reread the file on each query.
+
+    Returns:
+    - A line with one flag per search string, 1 if it occurs in some
+    line and 0 otherwise, or an error message if the file cannot be
+    searched.
+    """
+    try:
+        scanner = load_algorithm(SCAN_ALGORITHM).MultiPatternScanner(
+            search_strings)
+        matched = set()
+        for shard in get_shards(path, reread_on_query):
+            with PHASE_SECONDS.time(
+                    phase="index", algorithm=SCAN_ALGORITHM):
+                index = get_corpus_index(shard, reread_on_query)
+            with PHASE_SECONDS.time(
+                    phase="scan", algorithm=SCAN_ALGORITHM):
+                if isinstance(index, CorpusIndex):
+                    matched |= scanner.scan(index.snapshot()[1])
+                else:
+                    matched |= scanner.scan_file(shard)
+            if len(matched) == len(set(search_strings)):
+                break
+        flags = "".join(
+            "1" if search_string in matched else "0"
+            for search_string in search_strings
+        )
+        return flags + "\n"
+    except Exception as e:
+        return search_error_response(e, path)
+
+
+def search_error_response(error: Exception, path) -> str:
+    """
+    Log a failed search and build the error response for the client.
+
+    Parameters:
+    - error: The exception raised while searching.
+    - path: The path of the file that was searched.
+
+    Returns:
+    - The error message to send to the client.
+    """
+    ERRORS.inc(error=type(error).__name__)
+    if isinstance(error, PermissionError):
         logging.error("Permission denied: Cannot access file '%s'", path)
         return (
             "Error: Permission denied. You do not have permission "
             "to access the file.\n"
         )
-    except FileNotFoundError:
+    if isinstance(error, FileNotFoundError):
         logging.error("File not found: '%s'", path)
         return "Error: File not found.\n"
+    if isinstance(error, re.error):
+        logging.warning("Invalid regular expression: %s", error)
+        return f"Error: Invalid regular expression: {error}\n"
+    logging.error(
+        "An error occurred while searching the file", exc_info=error)
+    return f"Error: {error}\n"
+
+
+# Response sent to plain connections refused because the worker queue is
+# full; refused TLS connections are closed without one
+SERVER_BUSY_RESPONSE = "SERVER BUSY\n"
+
+# Worker pool shared by the accept loops, created on first use
+WORKER_POOL = None
+WORKER_POOL_LOCK = threading.Lock()
+
+# Watcher of the persistent connections waiting for their next request,
+# created on first use
+IDLE_CONNECTIONS = None
+IDLE_CONNECTIONS_LOCK = threading.Lock()
+
+
+def get_worker_pool():
+    """
+    Return the worker pool that serves accepted connections.
+
+    Returns:
+    - The WorkerPool, or None when worker_threads is 0 and every
+    connection gets its own thread.
+    """
+    global WORKER_POOL
+    if WORKER_THREADS <= 0:
+        return None
+    with WORKER_POOL_LOCK:
+        if WORKER_POOL is None:
+            WORKER_POOL = WorkerPool(
+                handle_client, WORKER_THREADS, MAX_QUEUE_DEPTH)
+    return WORKER_POOL
+
+
+def get_idle_connections():
+    """
+    Return the watcher that parks idle persistent connections.
+
+    Returns:
+    - The IdleConnections, closing connections idle for idle_timeout
+    seconds.
+    """
+    global IDLE_CONNECTIONS
+    with IDLE_CONNECTIONS_LOCK:
+        if IDLE_CONNECTIONS is None:
+            IDLE_CONNECTIONS = IdleConnections(resume_client, IDLE_TIMEOUT)
+    return IDLE_CONNECTIONS
+
+
+def resume_client(conn, addr, parser) -> None:
+    """
+    Queue a parked connection that has become readable for a worker.
+
+    A connection whose next request cannot be queued is refused like a
+    new connection would be.
+
+    Parameters:
+    - conn: The connection object.
+    - addr: The address of the client.
+    - parser: The RequestParser of the connection.
+    """
+    pool = WORKER_POOL
+    if pool is None or not pool.submit(
+            conn, addr,
+            lambda conn, addr: serve_requests(conn, addr, parser)):
+        reject_client(conn, addr)
+
+
+@REGISTRY.collector
+def collect_component_metrics() -> list:
+    """
+    Report the counters kept by the worker pool, cache and Bloom filters.
+
+    Returns:
+    - A list of (name, kind, documentation, samples) tuples.
+    """
+    families: list = []
+    if WORKER_POOL is not None:
+        stats = WORKER_POOL.stats()
+        families += [
+            ("worker_pool_busy", "gauge", "Workers serving a connection.",
+             [({}, stats["busy"])]),
+            ("worker_pool_queue_depth", "gauge",
+             "Connections waiting for a worker.",
+             [({}, stats["queue_depth"])]),
+            ("worker_pool_rejected_total", "counter",
+             "Connections refused because the queue was full.",
+             [({}, stats["rejected"])]),
+        ]
+    if IDLE_CONNECTIONS is not None:
+        stats = IDLE_CONNECTIONS.stats()
+        families += [
+            ("idle_connections", "gauge",
+             "Persistent connections waiting for a request.",
+             [({}, stats["parked"])]),
+            ("idle_connections_expired_total", "counter",
+             "Persistent connections closed after idle_timeout.",
+             [({}, stats["expired"])]),
+        ]
+    if RESULT_CACHE is not None:
+        stats = RESULT_CACHE.stats()
+        families += [
+            ("result_cache_hits_total", "counter",
+             "Lookups answered from the result cache.",
+             [({}, stats["hits"])]),
+            ("result_cache_misses_total", "counter",
+             "Lookups not found in the result cache.",
+             [({}, stats["misses"])]),
+            ("result_cache_entries", "gauge",
+             "Results held in the cache.", [({}, stats["size"])]),
+        ]
+    bloom_counters = (
+        ("hits", "Lookups the Bloom filter passed on."),
+        ("misses", "Lookups the Bloom filter answered as misses."),
+        ("false_positives", "Lookups passed on that were not found."))
+    bloom_stats = bloom_filter_stats()
+    if bloom_stats:
+        for counter, documentation in bloom_counters:
+            families.append((
+                f"bloom_filter_{counter}_total", "counter", documentation,
+                [({"path": path}, stats[counter])
+                 for path, stats in bloom_stats.items()]))
+    return families
+
+
+def configure_ssl_context(context):
+    """
+    Apply the session resumption, cipher and ECDH settings to a context.
+
+    Parameters:
+    - context: The server SSL context.
+
+    Returns:
+    - The context, so calls can be chained.
+    """
+    # Tickets let returning clients resume without a full handshake
+    context.num_tickets = SSL_SESSION_TICKETS
+    if SSL_SESSION_TICKETS == 0:
+        context.options |= ssl.OP_NO_TICKET
+    if SSL_CIPHERS:
+        context.set_ciphers(SSL_CIPHERS)
+    if SSL_ECDH_CURVE:
+        context.set_ecdh_curve(SSL_ECDH_CURVE)
+    return context
+
+
+def complete_handshake(conn, addr) -> bool:
+    """
+    Run the TLS handshake of an accepted connection and record it.
+
+    The accept loop wraps sockets without handshaking, so a slow client
+    only holds up the worker that serves it.
+
+    Parameters:
+    - conn: The SSL socket.
+    - addr: The address of the client.
+
+    Returns:
+    - True if the handshake succeeded, False otherwise.
+    """
+    conn.settimeout(HANDSHAKE_TIMEOUT)
+    start_time = time.perf_counter()
+    try:
+        conn.do_handshake()
+    except (OSError, ValueError) as e:
+        TLS_HANDSHAKES.inc(result="failed")
+        logging.warning("TLS handshake with %s failed: %s", addr, e)
+        return False
+    result = "resumed" if conn.session_reused else "full"
+    TLS_HANDSHAKES.inc(result=result)
+    TLS_HANDSHAKE_SECONDS.observe(
+        time.perf_counter() - start_time, result=result)
+    conn.settimeout(None)
+    return True
+
+
+def reject_client(conn, addr):
+    """
+    Refuse a connection that cannot be queued for a worker.
+
+    A TLS connection is closed without an answer, since writing to it
+    would run its handshake on the accept thread.
+
+    Parameters:
+    - conn: The connection object.
+    - addr: The address of the client.
+    """
+    try:
+        if not isinstance(conn, ssl.SSLSocket):
+            conn.settimeout(1)
+            conn.sendall(SERVER_BUSY_RESPONSE.encode())
     except Exception as e:
-        logging.exception("An error occurred while searching the file")
-        return f"Error: {e}\n"
+        logging.debug("Could not notify busy client %s: %s", addr, e)
+    finally:
+        conn.close()
+    logging.warning("Server busy, rejected connection from %s", addr)
+
+
+# Longest query accepted on a persistent connection, in bytes
+MAX_LINE_LENGTH = 65536
+
+# Size of the first read of a connection. A query without a newline that
+# is shorter than this is answered on its own and the connection closed;
+# a first read that holds a newline or fills this size without one starts
+# a persistent connection, and its first line is read in full.
+ONE_SHOT_QUERY_SIZE = 1024
+
+# Response sent when a persistent connection exceeds MAX_LINE_LENGTH
+LINE_TOO_LONG_RESPONSE = "Error: Query too long.\n"
+
+# A batch frame is one of these headers and a count, followed by that
+# many query lines. BATCH matches whole lines, SCAN matches substrings.
+# The leading NUL tells a header apart from a query, which never starts
+# with one since NUL padding is stripped from queries.
+BATCH_HEADER = b"\x00BATCH "
+SCAN_HEADER = b"\x00SCAN "
+MAX_BATCH_SIZE = 100000
+
+# With query_modes set, a single query may start with one of these modes
+# and a space; a query without a mode is exact. "EXACT " lets a line that
+# starts with a mode word be queried as it is. Without query_modes every
+# query is exact, mode word or not.
+QUERY_MODES = ("EXACT", "PREFIX", "SUBSTRING", "REGEX")
+
+
+def parse_query_mode(query: str) -> tuple:
+    """
+    Split the mode off a single query.
+
+    Mode words are only recognized when query_modes is set.
+
+    Parameters:
+    - query: The decoded query.
+
+    Returns:
+    - A tuple of (mode, search string).
+    """
+    mode, separator, search_string = query.partition(" ")
+    if QUERY_MODES_ENABLED and separator and mode in QUERY_MODES:
+        return mode, search_string
+    return "EXACT", query
+
+
+def decode_query(data: bytes) -> str:
+    """
+    Decode a query received from a client.
+
+    Parameters:
+    - data: The raw bytes of the query.
+
+    Returns:
+    - The query, with undecodable bytes replaced and NUL padding removed.
+    """
+    return data.decode("utf-8", errors="replace").strip("\x00")
+
+
+def observe_request(kind: str, algorithm: str, start_time: float,
+                    message: str, *args) -> None:
+    """
+    Record the latency of an answered request and optionally log it.
+
+    Parameters:
+    - kind: The kind of request, query, prefix, substring, regex,
+    batch or scan.
+    - algorithm: The algorithm that answered it.
+    - start_time: The time.perf_counter() value when it was received.
+    - message: Log message describing the request, used with query_log.
+    - args: Arguments of the log message.
+    """
+    elapsed = time.perf_counter() - start_time
+    REQUESTS.inc(kind=kind)
+    REQUEST_SECONDS.observe(elapsed, kind=kind, algorithm=algorithm)
+    if QUERY_LOG:
+        logging.debug(
+            message + ", Execution time: %.2f ms", *args, elapsed * 1000)
+
+
+def process_query(data: str, addr) -> str:
+    """
+    Answer a single search query.
+
+    Parameters:
+    - data: The search query, optionally prefixed with its mode.
+    - addr: The address of the client, used for logging.
+
+    Returns:
+    - The response to send to the client.
+    """
+    start_time = time.perf_counter()
+    mode, search_string = parse_query_mode(data)
+    result = search_string_in_file(
+        search_string, file_path, REREAD_ON_QUERY, mode)
+    # Non-exact queries are answered by their own indexes
+    kind, algorithm = "query", SEARCH_ALGORITHM
+    if mode != "EXACT":
+        kind = algorithm = mode.lower()
+    observe_request(
+        kind, algorithm, start_time,
+        "Search Query: %s, Requesting IP: %s", data, addr)
+    return result
+
+
+def process_batch(queries: list, addr) -> str:
+    """
+    Answer a batch of search queries.
+
+    Parameters:
+    - queries: The search queries.
+    - addr: The address of the client, used for logging.
+
+    Returns:
+    - The response to send to the client.
+    """
+    start_time = time.perf_counter()
+    result = search_batch_in_file(queries, file_path, REREAD_ON_QUERY)
+    observe_request(
+        "batch", SEARCH_ALGORITHM, start_time,
+        "Batch of %d queries, Requesting IP: %s", len(queries), addr)
+    return result
+
+
+def process_scan(queries: list, addr) -> str:
+    """
+    Answer a batch of substring queries with a single pass over the file.
+
+    Parameters:
+    - queries: The strings to look for.
+    - addr: The address of the client, used for logging.
+
+    Returns:
+    - The response to send to the client.
+    """
+    start_time = time.perf_counter()
+    result = scan_batch_in_file(queries, file_path, REREAD_ON_QUERY)
+    observe_request(
+        "scan", SCAN_ALGORITHM, start_time,
+        "Scan of %d queries, Requesting IP: %s", len(queries), addr)
+    return result
+
+
+# Handlers of the multi-query frames, keyed by frame header
+FRAME_HANDLERS = {
+    BATCH_HEADER: process_batch,
+    SCAN_HEADER: process_scan,
+}
+
+
+class RequestParser:
+    """
+    Split the bytes received on a persistent connection into requests and
+    answer each request once it is complete.
+
+    A request is either a single newline-terminated query, optionally
+    prefixed with a query mode, or a batch frame: a "\\0BATCH <n>" or
+    "\\0SCAN <n>" line followed by n newline-terminated queries, answered
+    with one line of n 0/1 flags. BATCH looks for whole lines and SCAN
+    for substrings of a line.
+
+    The queries read so far of a partial frame are kept between reads,
+    so each received byte is scanned once however many reads a request
+    spans.
+
+    Parameters:
+    - addr: The address of the client, used for logging.
+    """
+
+    def __init__(self, addr):
+        self.addr = addr
+        self._buffer = bytearray()
+        # Handler, expected size and queries of a partial frame
+        self._handler = None
+        self._count = 0
+        self._queries = []
+
+    def feed(self, data: bytes) -> str:
+        """
+        Add received bytes and answer the requests they complete.
+
+        Parameters:
+        - data: The bytes received.
+
+        Returns:
+        - The responses to the completed requests, in request order.
+        """
+        buffer = self._buffer
+        # The unterminated line kept from the last read has no newline
+        searched = len(buffer)
+        buffer += data
+        responses = []
+        position = 0
+        while True:
+            end = buffer.find(b"\n", max(position, searched))
+            if end == -1:
+                break
+            response = self._process_line(bytes(buffer[position:end]))
+            if response is not None:
+                responses.append(response)
+            position = end + 1
+        del buffer[:position]
+        return "".join(responses)
+
+    def finish(self) -> str:
+        """
+        Answer the request ended by an unterminated last line once the
+        client has closed its side of the connection.
+
+        Returns:
+        - The responses to the requests completed, possibly none.
+        """
+        if not self._buffer:
+            return ""
+        return self.feed(b"\n")
+
+    def line_too_long(self) -> bool:
+        """
+        Check whether the unterminated line kept is longer than
+        MAX_LINE_LENGTH.
+        """
+        return len(self._buffer) > MAX_LINE_LENGTH
+
+    def _process_line(self, line: bytes):
+        if self._handler is not None:
+            self._queries.append(decode_query(line).rstrip("\r"))
+            if len(self._queries) < self._count:
+                return None
+            return self._finish_frame()
+
+        header = next(
+            (header for header in FRAME_HANDLERS if line.startswith(header)),
+            None)
+        if header is None:
+            return process_query(
+                decode_query(line).rstrip("\r"), self.addr)
+        try:
+            count = int(line[len(header):])
+        except ValueError:
+            count = -1
+        if not 0 <= count <= MAX_BATCH_SIZE:
+            return "Error: Invalid batch size.\n"
+        self._handler, self._count = FRAME_HANDLERS[header], count
+        if count == 0:
+            return self._finish_frame()
+        return None
+
+    def _finish_frame(self) -> str:
+        handler, queries = self._handler, self._queries
+        self._handler, self._queries = None, []
+        return handler(queries, self.addr)
 
 
 def handle_client(conn, addr):
     """
     Handle the client connection and process the search query.
 
+    A client that sends a query shorter than ONE_SHOT_QUERY_SIZE without
+    a trailing newline gets one answer and the connection is closed. A
+    client that terminates its queries with newlines keeps the
+    connection open and may pipeline any number of them; they are
+    answered in order until the client closes the connection or it stays
+    idle for idle_timeout seconds. The first line of such a connection
+    may be longer than the first read, up to MAX_LINE_LENGTH.
+
     Parameters:
     - conn: The connection object.
     - addr: The address of the client.
     """
+    parser = None
     try:
-        # Decode the received data, replacing undecodable bytes
-        data = conn.recv(1024).decode("utf-8", errors="replace").strip("\x00")
+        if isinstance(conn, ssl.SSLSocket) and not complete_handshake(
+                conn, addr):
+            return
+        data = conn.recv(ONE_SHOT_QUERY_SIZE)
+        if b"\n" not in data and len(data) < ONE_SHOT_QUERY_SIZE:
+            conn.sendall(process_query(decode_query(data), addr).encode())
+            return
+        conn.settimeout(IDLE_TIMEOUT)
+        parser = RequestParser(addr)
+    except Exception as e:
+        logging.exception(
+            "An error occurred while handling client request: %s", e)
+    finally:
+        if parser is None:
+            conn.close()
+    if parser is not None:
+        serve_requests(conn, addr, parser, data)
 
-        start_time = time.time()
-        result = search_string_in_file(data, file_path, REREAD_ON_QUERY)
-        execution_time = (time.time() - start_time) * 1000
 
-        conn.sendall(result.encode())
-        logging.debug(
-            "Search Query: %s, Requesting IP: %s, Execution time: %.2f ms",
-            data,
-            addr,
-            execution_time,
-        )
+def serve_requests(conn, addr, parser, data: bytes = b"") -> None:
+    """
+    Answer the requests of a persistent connection until it goes idle.
+
+    With a worker pool, a connection that has no complete request left is
+    parked with the idle connection watcher instead of holding its
+    worker, and is queued for a worker again once the client sends more.
+    Otherwise the thread waits up to idle_timeout seconds for more.
+
+    Parameters:
+    - conn: The connection object, with idle_timeout as its timeout.
+    - addr: The address of the client.
+    - parser: The RequestParser of the connection.
+    - data: Bytes received but not yet given to the parser.
+    """
+    parked = False
+    try:
+        while True:
+            if not data:
+                data = conn.recv(65536)
+                if not data:
+                    responses = parser.finish()
+                    if responses:
+                        conn.sendall(responses.encode())
+                    return
+            responses = parser.feed(data)
+            if responses:
+                conn.sendall(responses.encode())
+            if parser.line_too_long():
+                conn.sendall(LINE_TOO_LONG_RESPONSE.encode())
+                return
+            data = b""
+            # Bytes a TLS socket has already decrypted do not make it
+            # readable, so they are read before parking it
+            if WORKER_POOL is not None and not (
+                    isinstance(conn, ssl.SSLSocket) and conn.pending()):
+                get_idle_connections().park(conn, addr, parser)
+                parked = True
+                return
+    except socket.timeout:
+        logging.debug("Closing idle connection from %s", addr)
     except Exception as e:
         logging.exception(
             "An error occurred while handling client request: %s", e)
     finally:
-        conn.close()
+        if not parked:
+            conn.close()
+
+
+async def handle_client_async(reader, writer):
+    """
+    Handle a client connection on the asyncio engine.
+
+    This serves the same protocol as handle_client. The lookups run
+    inline on the event loop, or in the default executor when
+    async_offload is set so a cold index build does not stall the loop.
+
+    Parameters:
+    - reader: The asyncio.StreamReader of the connection.
+    - writer: The asyncio.StreamWriter of the connection.
+    """
+    addr = writer.get_extra_info("peername")
+    loop = asyncio.get_running_loop()
+
+    async def run(function, *args):
+        if ASYNC_OFFLOAD:
+            return await loop.run_in_executor(None, function, *args)
+        return function(*args)
+
+    try:
+        data = await reader.read(ONE_SHOT_QUERY_SIZE)
+        if b"\n" not in data and len(data) < ONE_SHOT_QUERY_SIZE:
+            result = await run(process_query, decode_query(data), addr)
+            writer.write(result.encode())
+            await writer.drain()
+            return
+
+        parser = RequestParser(addr)
+        while True:
+            responses = await run(parser.feed, data)
+            if responses:
+                writer.write(responses.encode())
+                await writer.drain()
+            if parser.line_too_long():
+                writer.write(LINE_TOO_LONG_RESPONSE.encode())
+                await writer.drain()
+                return
+            try:
+                data = await asyncio.wait_for(
+                    reader.read(65536), IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.debug("Closing idle connection from %s", addr)
+                return
+            if not data:
+                responses = await run(parser.finish)
+                if responses:
+                    writer.write(responses.encode())
+                    await writer.drain()
+                return
+    except Exception as e:
+        logging.exception(
+            "An error occurred while handling client request: %s", e)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, ssl.SSLError):
+            pass
+
+
+class HandshakeRecordingProtocol(asyncio.StreamReaderProtocol):
+    """
+    Stream protocol of a TLS connection that records its handshake.
+
+    asyncio creates the protocol when the connection is accepted and
+    connects it once the handshake has completed, so the time in between
+    is the handshake. A handshake that fails or times out never connects
+    the protocol and is counted once the handshake timeout has passed.
+
+    Parameters:
+    - loop: The running event loop.
+    """
+
+    def __init__(self, loop):
+        super().__init__(
+            asyncio.StreamReader(loop=loop), handle_client_async, loop=loop)
+        self._accepted = time.perf_counter()
+        self._failed = loop.call_later(
+            HANDSHAKE_TIMEOUT * 1.5,
+            lambda: TLS_HANDSHAKES.inc(result="failed"))
+
+    def connection_made(self, transport):
+        self._failed.cancel()
+        ssl_object = transport.get_extra_info("ssl_object")
+        if ssl_object is not None:
+            result = "resumed" if ssl_object.session_reused else "full"
+            TLS_HANDSHAKES.inc(result=result)
+            TLS_HANDSHAKE_SECONDS.observe(
+                time.perf_counter() - self._accepted, result=result)
+        super().connection_made(transport)
+
+
+async def serve_async(server_socket, ssl_context):
+    """
+    Serve connections on an already listening socket with asyncio.
+
+    Parameters:
+    - server_socket: Listening server socket object.
+    - ssl_context: SSL context object, or None for plain connections.
+    """
+    if ssl_context is None:
+        server = await asyncio.start_server(
+            handle_client_async, sock=server_socket)
+    else:
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: HandshakeRecordingProtocol(loop), sock=server_socket,
+            ssl=ssl_context, ssl_handshake_timeout=HANDSHAKE_TIMEOUT)
+    async with server:
+        await server.serve_forever()
+
+
+def run_async_server(server_socket, ssl_context):
+    """
+    Run the asyncio engine until the server is stopped.
+
+    Parameters:
+    - server_socket: Listening server socket object.
+    - ssl_context: SSL context object, or None for plain connections.
+    """
+    asyncio.run(serve_async(server_socket, ssl_context))
+
+
+def start_accept_thread(
+        server_socket, ssl_context, mock_accept_connections=None):
+    """
+    Start the thread that serves connections with the configured engine.
+
+    Parameters:
+    - server_socket: Listening server socket object.
+    - ssl_context: SSL context object, or None for plain connections.
+    - mock_accept_connections: Mock accept_connections function for testing.
+
+    Returns:
+    - The started thread.
+    """
+    if ENGINE == "asyncio" and mock_accept_connections is None:
+        accept_thread = threading.Thread(
+            target=run_async_server,
+            args=(server_socket, ssl_context),
+        )
+    else:
+        accept_thread = threading.Thread(
+            target=accept_connections,
+            args=(server_socket, ssl_context, mock_accept_connections),
+        )
+    accept_thread.start()
+    return accept_thread
 
 
 def start_server(
@@ -202,6 +1575,7 @@ def start_server(
             )
             context.load_cert_chain(
                 certfile="server.crt", keyfile="server.key")
+            configure_ssl_context(context)
 
             server_socket = (
                 socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -215,11 +1589,8 @@ def start_server(
             logging.info(
                 "Server started on %s:%d with SSL enabled", HOST, PORT)
 
-            accept_thread = threading.Thread(
-                target=accept_connections,
-                args=(server_socket, context, mock_accept_connections),
-            )
-            accept_thread.start()
+            start_accept_thread(
+                server_socket, context, mock_accept_connections)
         else:
             server_socket = (
                 socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -232,11 +1603,7 @@ def start_server(
 
             logging.info("Server started on %s:%d without SSL", HOST, PORT)
 
-            accept_thread = threading.Thread(
-                target=accept_connections,
-                args=(server_socket, None, mock_accept_connections),
-            )
-            accept_thread.start()
+            start_accept_thread(server_socket, None, mock_accept_connections)
     except ssl.SSLError as e:
         if "wrong version number" in str(e):
             logging.error(
@@ -263,14 +1630,23 @@ def accept_connections(
     - server_socket: Server socket object.
     - ssl_context: SSL context object.
     - mock_accept_connections: Mock accept_connections function for testing.
+
+    Accepted connections are queued for the worker pool; when its queue
+    is full the client gets SERVER BUSY instead of waiting.
     """
+    pool = get_worker_pool() if mock_accept_connections is None else None
     while True:
         client_socket, address = server_socket.accept()
         if ssl_context is not None:
+            # The handshake runs on the worker, see complete_handshake
             client_socket = ssl_context.wrap_socket(
-                client_socket, server_side=True)
+                client_socket, server_side=True,
+                do_handshake_on_connect=False)
         if mock_accept_connections is not None:
             mock_accept_connections(client_socket, address)
+        elif pool is not None:
+            if not pool.submit(client_socket, address):
+                reject_client(client_socket, address)
         else:
             client_thread = threading.Thread(
                 target=handle_client, args=(client_socket, address)
@@ -278,5 +1654,163 @@ def accept_connections(
             client_thread.start()
 
 
+def open_index_file(path) -> Optional[SharedLineIndex]:
+    """
+    Map the on-disk index of the specified file, writing it if needed.
+
+    A valid index file left by a previous run is mapped as-is, so startup
+    does not read the corpus. A missing or stale one is rebuilt from the
+    corpus and saved for the next start.
+
+    Parameters:
+    - path: The path of the corpus file.
+
+    Returns:
+    - The mapped SharedLineIndex, or None if the index file could not be
+    written or no longer matches the corpus.
+    """
+    key = os.fspath(path)
+    index = load_index(key)
+    if index is None:
+        corpus = CorpusIndex(key).refresh()
+        try:
+            save_index(corpus, corpus.version, key)
+        except OSError as e:
+            logging.warning("Could not write index file for %s: %s", key, e)
+            return None
+        index = load_index(key)
+        if index is None:
+            return None
+        logging.info("Index file of %d lines written for %s", len(index), key)
+    SHARED_INDEXES[key] = index
+    return index
+
+
+def prefork_worker(ssl_context, number=0):
+    """
+    Serve connections in a forked worker process.
+
+    Each worker binds its own listening socket with SO_REUSEPORT so the
+    kernel balances incoming connections across the workers. With
+    metrics_port set, worker n exports its metrics on metrics_port + n.
+
+    Parameters:
+    - ssl_context: SSL context object, or None for plain connections.
+    - number: The worker's position, from 0 to processes - 1.
+    """
+    global SHARD_EXECUTOR, WORKER_POOL, IDLE_CONNECTIONS
+    # Threads do not survive the fork, so thread pools the parent had
+    # started are replaced by new ones on first use
+    SHARD_EXECUTOR = None
+    WORKER_POOL = None
+    IDLE_CONNECTIONS = None
+    if METRICS_PORT:
+        start_metrics_server(REGISTRY, METRICS_HOST, METRICS_PORT + number)
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server_socket.bind((HOST, PORT))
+    server_socket.listen()
+    logging.info("Worker %d listening on %s:%d", os.getpid(), HOST, PORT)
+
+    if ENGINE == "asyncio":
+        run_async_server(server_socket, ssl_context)
+    else:
+        accept_connections(server_socket, ssl_context)
+
+
+def start_prefork_server(processes):
+    """
+    Build the shared indexes, fork the workers and restart any that die.
+
+    The line index of each shard is built once in the parent and placed
+    in shared memory before forking, so every worker reads the same copy. With
+    index_file set, the mapped index file is shared the same way, and
+    with bloom_filter set so are the Bloom filters of the indexes, as are
+    the prefix and trigram indexes with query_modes set. A worker
+    whose file has changed since then falls back to its own index when
+    reread_on_query is set.
+
+    Parameters:
+    - processes: Number of worker processes to run.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise OSError("Prefork mode requires SO_REUSEPORT support")
+
+    context = None
+    if SSL_ENABLED:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile="server.crt", keyfile="server.key")
+        configure_ssl_context(context)
+
+    shared_memory_blocks = []
+    for shard in get_shards(file_path, False):
+        if INDEX_FILE:
+            open_index_file(shard)
+        elif not USE_MMAP:
+            # A memory-mapped corpus is already shared through the page
+            # cache
+            index = get_corpus_index(shard, False)
+            shared, memory = create_shared_index(
+                index, index.version, shard)
+            # Free the parent's copy before forking so workers do not
+            # inherit it
+            CORPUS_INDEXES.pop(shard, None)
+            SHARED_INDEXES[shard] = shared
+            shared_memory_blocks.append((shared, memory))
+            logging.info(
+                "Shared index of %d lines built for %s (%d bytes)",
+                len(shared), shard, memory.size)
+        if BLOOM_FILTER and shard in SHARED_INDEXES:
+            # Workers inherit the filter instead of each building one
+            get_searcher(shard, False)
+        if QUERY_MODES_ENABLED:
+            # Likewise for the prefix and trigram indexes
+            for mode in ("PREFIX", "SUBSTRING"):
+                get_mode_index(shard, mode, False)
+    logging.info("Starting %d worker processes", processes)
+
+    fork_context = multiprocessing.get_context("fork")
+
+    def spawn(number):
+        worker = fork_context.Process(
+            target=prefork_worker, args=(context, number), daemon=True)
+        worker.start()
+        return worker
+
+    # Run the cleanup below when systemd stops the service
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    workers = [spawn(number) for number in range(processes)]
+    try:
+        while True:
+            wait([worker.sentinel for worker in workers])
+            for number, worker in enumerate(workers):
+                if not worker.is_alive():
+                    logging.error(
+                        "Worker %d exited with code %s, restarting",
+                        worker.pid, worker.exitcode)
+                    # Avoid a busy loop when workers die on startup
+                    time.sleep(1)
+                    workers[number] = spawn(number)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        SHARED_INDEXES.clear()
+        SEARCHERS.clear()
+        MODE_INDEXES.clear()
+        for shared, memory in shared_memory_blocks:
+            shared.release()
+            memory.close()
+            memory.unlink()
+
+
 if __name__ == "__main__":
-    start_server()
+    if INDEX_FILE and PROCESSES <= 1:
+        for shard in get_shards(file_path, False):
+            open_index_file(shard)
+    if PROCESSES > 1:
+        start_prefork_server(PROCESSES)
+    else:
+        if METRICS_PORT:
+            start_metrics_server(REGISTRY, METRICS_HOST, METRICS_PORT)
+        start_server()
@@ -0,0 +1,272 @@
+"""
+Flat, read-only line index that can be shared between processes.
+
+The index is a single buffer holding an open-addressing hash table of
+64-bit line fingerprints followed by the stripped lines themselves.
+Lookups only read from the buffer, so one copy placed in shared memory
+(or in a memory-mapped file) serves any number of worker processes
+without each of them building its own set of Python strings.
+
+The same buffer is also the on-disk index format: save_index writes it
+next to the corpus and load_index memory-maps it back, so a restarted
+server can answer queries without reading the corpus at all.
+
+Layout, all integers little-endian:
+- Header: magic, format version, slot count, line count, data size, the
+(inode, size, mtime_ns) version of the source file and a checksum of the
+preceding header fields.
+- Slots: slot count pairs of (fingerprint, data offset + 1); an offset
+of 0 marks an empty slot.
+- Data: every line encoded as UTF-8 and terminated by a newline.
+"""
+
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import sys
+import tempfile
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional
+
+from corpus_index import file_version
+
+MAGIC = b"SLIX"
+FORMAT_VERSION = 2
+HEADER_FIELDS = struct.Struct("<4sIQQQQQQ")
+HEADER = struct.Struct(HEADER_FIELDS.format + "Q")
+SLOT = struct.Struct("<QQ")
+
+# Suffix of the index file written next to the corpus
+INDEX_SUFFIX = ".idx"
+
+# Fraction of slots in use; lower values mean shorter probe sequences
+LOAD_FACTOR = 0.7
+
+# Bytes of line data copied at a time when iterating over the lines
+ITER_BLOCK_SIZE = 1 << 20
+
+
+def fingerprint(data: bytes) -> int:
+    """
+    Return the 64-bit fingerprint of an encoded line.
+
+    The fingerprint must be identical in every process, so the
+    randomised built-in hash() cannot be used.
+
+    Parameters:
+    - data: The UTF-8 encoded line.
+
+    Returns:
+    - The fingerprint as an unsigned integer.
+    """
+    return int.from_bytes(
+        hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def build_index(lines, source_version: tuple) -> bytearray:
+    """
+    Build the buffer of an index over the given lines.
+
+    Parameters:
+    - lines: An iterable of distinct, stripped lines.
+    - source_version: The (inode, size, mtime_ns) of the source file.
+
+    Returns:
+    - A bytearray holding the complete index.
+    """
+    encoded = [line.encode("utf-8") for line in lines]
+    slot_count = int(len(encoded) / LOAD_FACTOR) + 1
+    slots = array("Q", bytes(SLOT.size * slot_count))
+
+    offset = 0
+    for line in encoded:
+        line_fingerprint = fingerprint(line)
+        slot = line_fingerprint % slot_count
+        while slots[2 * slot + 1]:
+            slot = (slot + 1) % slot_count
+        slots[2 * slot] = line_fingerprint
+        slots[2 * slot + 1] = offset + 1
+        offset += len(line) + 1
+
+    if sys.byteorder != "little":
+        slots.byteswap()
+    header = HEADER_FIELDS.pack(
+        MAGIC, FORMAT_VERSION, slot_count, len(encoded), offset,
+        *source_version)
+    buffer = bytearray(header)
+    buffer += fingerprint(header).to_bytes(8, "little")
+    buffer += slots.tobytes()
+    if encoded:
+        buffer += b"\n".join(encoded)
+        buffer += b"\n"
+    return buffer
+
+
+class SharedLineIndex:
+    """
+    Exact-match lookups over an index buffer built by build_index.
+
+    Parameters:
+    - buffer: Any object supporting the buffer protocol, such as a
+    bytearray, a SharedMemory buffer or an mmap.
+    - path: The path of the source file the index was built from.
+
+    Raises:
+    - ValueError: If the buffer is not a complete index of this format.
+    """
+
+    def __init__(self, buffer, path=None):
+        self.path = path
+        self._buffer = memoryview(buffer)
+        if len(self._buffer) < HEADER.size:
+            raise ValueError("Not a shared line index buffer")
+        (magic, version, self.slot_count, self.line_count, self.data_size,
+         *source_version, checksum) = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a shared line index buffer")
+        if checksum != fingerprint(self._buffer[:HEADER_FIELDS.size]):
+            raise ValueError("Shared line index header is corrupt")
+        self.version = tuple(source_version)
+        self._data_start = HEADER.size + SLOT.size * self.slot_count
+        if len(self._buffer) < self._data_start + self.data_size:
+            raise ValueError("Shared line index buffer is truncated")
+
+    def contains(self, search_string: str) -> bool:
+        return search_string in self
+
+    def __contains__(self, search_string: str) -> bool:
+        if "\n" in search_string:
+            return False
+        line = search_string.encode("utf-8")
+        line_fingerprint = fingerprint(line)
+        slot = line_fingerprint % self.slot_count
+        while True:
+            stored_fingerprint, stored_offset = SLOT.unpack_from(
+                self._buffer, HEADER.size + SLOT.size * slot)
+            if not stored_offset:
+                return False
+            if stored_fingerprint == line_fingerprint:
+                start = self._data_start + stored_offset - 1
+                end = start + len(line)
+                if (self._buffer[start:end] == line
+                        and self._buffer[end] == 0x0A):
+                    return True
+            slot = (slot + 1) % self.slot_count
+
+    def __len__(self) -> int:
+        return self.line_count
+
+    def __iter__(self):
+        # Stream the lines in blocks instead of copying all of them
+        position = self._data_start
+        end = position + self.data_size
+        rest = b""
+        while position < end:
+            block_end = min(position + ITER_BLOCK_SIZE, end)
+            *lines, rest = (
+                rest + self._buffer[position:block_end].tobytes()
+            ).split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8")
+            position = block_end
+
+    def release(self) -> None:
+        """
+        Release the view on the underlying buffer.
+        """
+        self._buffer.release()
+
+
+def create_shared_index(lines, source_version: tuple, path=None):
+    """
+    Build an index and place it in a new shared memory block.
+
+    Parameters:
+    - lines: An iterable of distinct, stripped lines.
+    - source_version: The (inode, size, mtime_ns) of the source file.
+    - path: The path of the source file.
+
+    Returns:
+    - A tuple of (SharedLineIndex, SharedMemory). The caller owns the
+    shared memory block and must unlink it when it is no longer needed.
+    """
+    buffer = build_index(lines, source_version)
+    memory = shared_memory.SharedMemory(create=True, size=len(buffer))
+    view = memory.buf
+    # The buffer is only None once the block has been closed
+    assert view is not None
+    view[:len(buffer)] = buffer
+    return SharedLineIndex(view, path), memory
+
+
+def index_path(path) -> str:
+    """
+    Return the path of the index file kept next to a corpus.
+
+    Parameters:
+    - path: The path of the corpus file.
+
+    Returns:
+    - The corpus path with INDEX_SUFFIX appended.
+    """
+    return os.fspath(path) + INDEX_SUFFIX
+
+
+def save_index(lines, source_version: tuple, path) -> str:
+    """
+    Write the index of a corpus to the file next to it.
+
+    The index is written to a temporary file that is then renamed over
+    the old one, so processes that have the previous index mapped keep a
+    consistent copy and readers never see a partial file. The index file
+    gets the read and write permissions of the corpus, so whoever can
+    read the corpus can map its index.
+
+    Parameters:
+    - lines: An iterable of distinct, stripped lines.
+    - source_version: The (inode, size, mtime_ns) of the corpus.
+    - path: The path of the corpus file.
+
+    Returns:
+    - The path of the index file.
+    """
+    target = index_path(path)
+    buffer = build_index(lines, source_version)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(target) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(buffer)
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temporary, stat.S_IMODE(os.stat(path).st_mode) & 0o666)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return target
+
+
+def load_index(path) -> Optional[SharedLineIndex]:
+    """
+    Memory-map the index file of a corpus if it matches the corpus.
+
+    Parameters:
+    - path: The path of the corpus file.
+
+    Returns:
+    - A SharedLineIndex over the mapped file, or None if the index file
+    is missing, corrupt or was built from another version of the corpus.
+    """
+    try:
+        with open(index_path(path), "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        index = SharedLineIndex(mapping, os.fspath(path))
+        if index.version != file_version(path):
+            index.release()
+            return None
+    except (OSError, ValueError):
+        return None
+    return index
@@ -0,0 +1,95 @@
+import configparser
+import csv
+from benchmark import (
+    compare_rabin_karp,
+    generate_corpus,
+    make_queries,
+    percentile,
+    run_benchmark,
+    write_config,
+    write_csv
+)
+
+
+def test_percentile_nearest_rank():
+    """
+    Test percentiles of sorted latencies.
+    """
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile(values, 1.0) == 100
+    assert percentile([7], 0.95) == 7
+    assert percentile([], 0.5) == 0.0
+
+
+def test_make_queries_mixes_hits_and_misses(tmp_path):
+    """
+    Test that the requested share of queries exists in the corpus.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    corpus = tmp_path / "corpus.txt"
+    generate_corpus(corpus, 500)
+    lines = set(corpus.read_text(encoding="utf-8").splitlines())
+    assert len(corpus.read_text(encoding="utf-8").splitlines()) == 500
+
+    queries = make_queries(corpus, 100, 0.3)
+    assert len(queries) == 100
+    assert sum(query in lines for query in queries) == 30
+
+
+def test_write_config(tmp_path):
+    """
+    Test the configuration written for a benchmark run.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    path = tmp_path / "benchmark.ini"
+    write_config(path, "corpus.txt", 5000, "kmp_search", True, False)
+    config = configparser.ConfigParser()
+    config.read(path)
+    assert config.getint("server", "port") == 5000
+    assert config.get("server", "search_algorithms") == "kmp_search"
+    assert config.getboolean("server", "reread_on_query")
+    assert not config.getboolean("server", "ssl_enabled")
+
+
+def test_run_benchmark_end_to_end(tmp_path):
+    """
+    Test a small benchmark run against a real server process.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    rows = run_benchmark(
+        [200], ["naive_search"], [False], [False], concurrency=2,
+        requests=40, hit_ratio=0.5, output_dir=tmp_path)
+    assert len(rows) == 1
+    assert rows[0]["errors"] == 0
+    assert rows[0]["qps"] > 0
+
+    write_csv(rows, tmp_path / "results.csv")
+    with open(tmp_path / "results.csv", encoding="utf-8") as file:
+        assert next(csv.DictReader(file))["algorithm"] == "naive_search"
+
+
+def test_compare_rabin_karp(tmp_path):
+    """
+    Test that per-pattern and batched Rabin-Karp scans find the same
+    substrings.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    corpus = tmp_path / "corpus.txt"
+    generate_corpus(corpus, 50)
+    lines = corpus.read_text(encoding="utf-8").splitlines()
+    patterns = make_queries(corpus, 20, 0.5) + [lines[0][2:6], "a", ""]
+
+    result = compare_rabin_karp(lines, patterns)
+    assert result["agree"]
+    assert result["patterns"] == len(set(patterns))
+    assert result["per_pattern_seconds"] > 0
@@ -0,0 +1,83 @@
+import pytest
+from unittest import mock
+from bloom_filter import BloomFilter, FilteredSearcher
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """
+    Test that every added line is reported as possibly present.
+    """
+    lines = [f"line {number}" for number in range(1000)] + ["", "ünïcödé"]
+    bloom = BloomFilter.from_lines(lines, 0.01)
+
+    for line in lines:
+        assert line in bloom
+    false_positives = sum(
+        f"other {number}" in bloom for number in range(10000))
+    assert false_positives < 300
+
+
+def test_bloom_filter_rejects_invalid_rate():
+    """
+    Test that a false positive rate outside (0, 1) is refused.
+    """
+    for rate in (0, 1, 1.5):
+        with pytest.raises(ValueError):
+            BloomFilter(10, rate)
+
+
+def test_filtered_searcher_counts_outcomes():
+    """
+    Test that definite misses skip the searcher and outcomes are counted.
+    """
+    bloom = BloomFilter.from_lines(["connecting", "now"], 0.01)
+    searcher = mock.Mock()
+    searcher.contains.side_effect = lambda line: line == "connecting"
+    filtered = FilteredSearcher(bloom, searcher)
+
+    assert filtered.contains("connecting")
+    assert not filtered.contains("missing")
+    searcher.contains.assert_called_once_with("connecting")
+
+    # Pretend "now" is absent to produce a false positive
+    assert not filtered.contains("now")
+    stats = bloom.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["false_positives"] == 1
+
+
+def test_filtered_searcher_batch():
+    """
+    Test that a batch only passes possible hits to the searcher.
+    """
+    bloom = BloomFilter.from_lines(["connecting", "now"], 0.01)
+    searcher = mock.Mock()
+    searcher.contains_many.side_effect = lambda lines: [
+        line == "connecting" for line in lines]
+    filtered = FilteredSearcher(bloom, searcher)
+
+    assert filtered.contains_many(["now", "missing", "connecting"]) == [
+        False, False, True]
+    searcher.contains_many.assert_called_once_with(["now", "connecting"])
+    assert bloom.stats()["false_positives"] == 1
+
+
+def test_bloom_filter_extended_in_place_until_full():
+    """
+    Test that appended lines are added in place while the filter has
+    room, and that a full filter is replaced by a larger one keeping
+    the counters.
+    """
+    bloom = BloomFilter(4, 0.01)
+    assert bloom.extended(["a", "b"], mock.Mock()) is bloom
+    assert bloom.might_contain("a")
+
+    lines = ["a", "b", "c", "d", "e"]
+    all_lines = mock.Mock(return_value=lines)
+    grown = bloom.extended(["c", "d", "e"], all_lines)
+    all_lines.assert_called_once_with()
+    assert grown is not bloom
+    assert grown.capacity == 10
+    assert all(line in grown for line in lines)
+    assert grown.stats()["hits"] == 1
@@ -3,7 +3,21 @@ import unittest
 from unittest import mock
 import ssl
 import socket
-from client import send_query, USE_SSL, HOST, PORT
+import threading
+import time
+from pathlib import Path
+from client import (
+    Client,
+    send_query,
+    send_batch,
+    main,
+    run_load,
+    format_load_report,
+    format_query,
+    USE_SSL,
+    HOST,
+    PORT
+)
 
 
 def test_send_query_ssl():
@@ -129,5 +143,375 @@ def test_send_query_ssl_error():
             with mock.patch('builtins.print') as mock_print:
                 send_query(query)
 
+
+def test_send_batch_non_ssl():
+    """
+    Test send_batch sends one frame and decodes the flags.
+    """
+    with mock.patch("client.USE_SSL", False):
+        with mock.patch(
+                "client.socket.create_connection"
+        ) as mock_create_conn:
+            mock_socket = mock_create_conn.return_value.__enter__.return_value
+            mock_socket.__enter__ = mock.Mock(return_value=mock_socket)
+            mock_socket.__exit__ = mock.Mock(return_value=False)
+            mock_socket.recv.side_effect = [b"10", b"1\n"]
+
+            assert send_batch(["a", "b", "c"]) == [True, False, True]
+            mock_socket.sendall.assert_called_once_with(
+                b"\x00BATCH 3\na\nb\nc\n")
+
+            mock_socket.recv.side_effect = [b"01\n"]
+            assert send_batch(["a", "b"], substring=True) == [False, True]
+            mock_socket.sendall.assert_called_with(b"\x00SCAN 2\na\nb\n")
+
+
+def test_send_batch_error_response():
+    """
+    Test send_batch raises when the server answers with an error.
+    """
+    with mock.patch("client.USE_SSL", False):
+        with mock.patch(
+                "client.socket.create_connection"
+        ) as mock_create_conn:
+            mock_socket = mock_create_conn.return_value.__enter__.return_value
+            mock_socket.__enter__ = mock.Mock(return_value=mock_socket)
+            mock_socket.__exit__ = mock.Mock(return_value=False)
+            mock_socket.recv.return_value = b"Error: File not found.\n"
+
+            with pytest.raises(ConnectionError):
+                send_batch(["a"])
+
+
+def test_main_batch_file(tmp_path):
+    """
+    Test the --batch-file option prints one result per query.
+    """
+    batch_file = tmp_path / "queries.txt"
+    batch_file.write_text("a\nb\n", encoding="utf-8")
+    with mock.patch("client.send_batch", return_value=[True, False]), \
+            mock.patch("sys.argv", ["client.py", "--batch-file",
+                                    str(batch_file)]), \
+            mock.patch("builtins.print") as mock_print:
+        main()
+    mock_print.assert_has_calls([
+        mock.call("a: STRING EXISTS"),
+        mock.call("b: STRING NOT FOUND"),
+    ])
+
+
+def start_answering_server(context=None, connections=None, delay=0.0,
+                           queries=None):
+    """
+    Run a TCP server that answers every query line in a thread.
+
+    Queries ending in "missing" are not found and a query sent without a
+    newline gets a single answer before the connection is closed.
+
+    Parameters:
+    - context: Server SSL context, or None for plain connections.
+    - connections: A list the accepted connections are appended to, or
+    None.
+    - delay: Seconds to wait before answering each read.
+    - queries: A list the received query lines are appended to, or None.
+
+    Returns:
+    - The listening socket; close it to stop the server.
+    """
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def answer(query):
+        if query.endswith(b"missing"):
+            return b"STRING NOT FOUND\n"
+        return b"STRING EXISTS\n"
+
+    def serve(conn):
+        try:
+            if context is not None:
+                conn = context.wrap_socket(conn, server_side=True)
+            with conn:
+                buffer = b""
+                while True:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        break
+                    buffer += chunk
+                    if b"\n" not in buffer:
+                        conn.sendall(answer(buffer))
+                        break
+                    *lines, buffer = buffer.split(b"\n")
+                    if queries is not None:
+                        queries.extend(lines)
+                    time.sleep(delay)
+                    conn.sendall(b"".join(answer(line) for line in lines))
+        except OSError:
+            pass
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                break
+            if connections is not None:
+                connections.append(conn)
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return listener
+
+
+@pytest.fixture
+def answering_server():
+    """
+    Fixture yielding the port of a plain answering server.
+    """
+    listener = start_answering_server()
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+@pytest.mark.parametrize("reuse", [True, False])
+def test_run_load(answering_server, reuse):
+    """
+    Test that run_load sends the requested number of queries.
+    """
+    result = run_load(
+        ["a", "b missing"], concurrency=3, requests=25, reuse=reuse,
+        host="127.0.0.1", port=answering_server, use_ssl=False)
+    assert result["requests"] == 25
+    assert result["errors"] == 0
+    assert len(result["latencies"]) == 25
+    assert result["latencies"] == sorted(result["latencies"])
+    assert result["qps"] > 0
+
+
+def test_run_load_paces_to_target_rate(answering_server):
+    """
+    Test that a qps target spreads the queries over time.
+    """
+    result = run_load(
+        ["a"], concurrency=2, requests=10, qps=100,
+        host="127.0.0.1", port=answering_server, use_ssl=False)
+    assert result["requests"] == 10
+    assert result["seconds"] >= 0.08
+
+
+def test_run_load_counts_connection_errors():
+    """
+    Test that failed connections are reported as errors.
+    """
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        port = listener.getsockname()[1]
+    result = run_load(
+        ["a"], concurrency=2, requests=4,
+        host="127.0.0.1", port=port, use_ssl=False)
+    assert result["errors"] == 4
+    assert result["error_kinds"] == {"ConnectionRefusedError": 4}
+    assert "Errors: 4" in format_load_report(result)
+
+
+def test_format_load_report():
+    """
+    Test the throughput, percentiles and histogram of the load report.
+    """
+    result = {
+        "requests": 4, "errors": 1, "error_kinds": {"SERVER BUSY": 1},
+        "seconds": 2.0, "qps": 1.5,
+        "latencies": [0.0002, 0.0008, 0.003],
+    }
+    report = format_load_report(result)
+    assert "Throughput: 1.5 queries/s" in report
+    assert "SERVER BUSY: 1" in report
+    assert "p99 3.000" in report
+    assert "<=   0.25 ms        1" in report
+    assert "<=      5 ms        1" in report
+
+
+def test_main_load_mode(tmp_path):
+    """
+    Test that --load runs the load generator with the given options.
+    """
+    query_file = tmp_path / "queries.txt"
+    query_file.write_text("a\nb\n", encoding="utf-8")
+    result = {"requests": 0, "errors": 0, "error_kinds": {},
+              "seconds": 1.0, "qps": 0.0, "latencies": []}
+    with mock.patch("client.run_load", return_value=result) as load, \
+            mock.patch("sys.argv", [
+                "client.py", "--load", "--query-file", str(query_file),
+                "--concurrency", "4", "--duration", "2", "--qps", "50"]), \
+            mock.patch("builtins.print"):
+        main()
+    load.assert_called_once_with(
+        ["a", "b"], concurrency=4, requests=None, duration=2.0, qps=50.0,
+        reuse=True)
+
+
+def test_client_reuses_pooled_connection(answering_server):
+    """
+    Test that consecutive lookups share one pooled connection.
+    """
+    with Client("127.0.0.1", answering_server, use_ssl=False) as client:
+        assert client.contains("a")
+        assert not client.contains("b missing")
+        assert client.query("c") == "STRING EXISTS"
+        assert client.connections_opened == 1
+        with pytest.raises(ValueError):
+            client.query("a\nb")
+
+
+def test_client_retries_on_stale_connection(answering_server):
+    """
+    Test that a query on a dead pooled connection is retried.
+    """
+    with Client("127.0.0.1", answering_server, use_ssl=False) as client:
+        assert client.contains("a")
+        client._idle[0].close()
+        assert client.contains("a")
+        assert client.connections_opened == 2
+
+
+def test_client_replaces_pool_closed_by_server():
+    """
+    Test that connections the server closed while they were pooled are
+    replaced without using up the retries.
+    """
+    connections = []
+    listener = start_answering_server(connections=connections)
+    try:
+        client = Client("127.0.0.1", listener.getsockname()[1],
+                        use_ssl=False, retries=0)
+        for conn in [client._connect() for _ in range(3)]:
+            client._release(conn)
+        while len(connections) < 3:
+            time.sleep(0.01)
+        for conn in connections:
+            conn.shutdown(socket.SHUT_RDWR)
+
+        assert client.contains("a")
+        assert client.connections_opened == 4
+        assert len(client._idle) == 1
+        client.close()
+    finally:
+        listener.close()
+
+
+def test_client_counts_timeouts_as_attempts():
+    """
+    Test that a slow answer uses up an attempt each time and leaves the
+    other pooled connections open.
+    """
+    queries = []
+    listener = start_answering_server(delay=0.5, queries=queries)
+    try:
+        client = Client("127.0.0.1", listener.getsockname()[1],
+                        use_ssl=False, timeout=0.1, retries=2,
+                        retry_delay=0)
+        for conn in [client._connect() for _ in range(5)]:
+            client._release(conn)
+
+        with pytest.raises(socket.timeout):
+            client.query("a")
+        assert client.connections_opened == 5
+        assert len(client._idle) == 2
+        # Let the server read everything that was sent
+        time.sleep(0.3)
+        assert queries == [b"a"] * 3
+        client.close()
+    finally:
+        listener.close()
+
+
+def test_client_raises_after_retries():
+    """
+    Test that the last error is raised once the retries are used up.
+    """
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        port = listener.getsockname()[1]
+    client = Client("127.0.0.1", port, use_ssl=False, retries=1,
+                    retry_delay=0)
+    with pytest.raises(ConnectionRefusedError):
+        client.contains("a")
+
+
+def test_client_resumes_tls_session():
+    """
+    Test that a new TLS connection resumes the previous session.
+    """
+    server_dir = Path(__file__).resolve().parent.parent
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(
+        server_dir / "server.crt", server_dir / "server.key")
+    listener = start_answering_server(context)
+    try:
+        client = Client("127.0.0.1", listener.getsockname()[1],
+                        use_ssl=True)
+        assert client.contains("a")
+        # Drop the pooled connection so the next lookup reconnects
+        client.close()
+        assert client.contains("a")
+        assert client.connections_opened == 2
+        assert client.sessions_resumed == 1
+        client.close()
+    finally:
+        listener.close()
+
+
+def test_client_batch_frame():
+    """
+    Test the frame sent by Client.batch and the parsing of its flags.
+    """
+    client = Client("127.0.0.1", 1, use_ssl=False)
+    with mock.patch.object(client, "_exchange", return_value="10") as send:
+        assert client.batch(["a", "b"]) == [True, False]
+        send.assert_called_once_with(b"\x00BATCH 2\na\nb\n")
+        assert client.batch(["a", "b"], substring=True) == [True, False]
+        send.assert_called_with(b"\x00SCAN 2\na\nb\n")
+    with mock.patch.object(client, "_exchange",
+                           return_value="Error: File not found."):
+        with pytest.raises(ConnectionError):
+            client.batch(["a"])
+
+
+def test_format_query_modes():
+    """
+    Test that modes are only spelled out when they are needed.
+    """
+    with mock.patch("client.QUERY_MODES_ENABLED", True):
+        assert format_query("now") == "now"
+        assert format_query("now", "PREFIX") == "PREFIX now"
+        assert format_query("PREFIX now") == "EXACT PREFIX now"
+        assert format_query("BATCH 2") == "BATCH 2"
+        assert format_query("SCAN") == "SCAN"
+        with pytest.raises(ValueError):
+            format_query("now", "FUZZY")
+
+
+def test_format_query_without_modes():
+    """
+    Test that queries are sent as they are when the server does not read
+    mode words, and that other modes are refused.
+    """
+    with mock.patch("client.QUERY_MODES_ENABLED", False):
+        assert format_query("PREFIX now") == "PREFIX now"
+        assert format_query("EXACT now") == "EXACT now"
+        with pytest.raises(ValueError):
+            format_query("now", "PREFIX")
+
+
+def test_client_query_mode():
+    """
+    Test the request line sent by Client.contains in each mode.
+    """
+    client = Client("127.0.0.1", 1, use_ssl=False)
+    with mock.patch("client.QUERY_MODES_ENABLED", True), \
+            mock.patch.object(
+                client, "_exchange", return_value="STRING EXISTS") as send:
+        assert client.contains("conn", mode="PREFIX")
+        send.assert_called_once_with(b"PREFIX conn\n")
+        assert client.contains("SUBSTRING x")
+        send.assert_called_with(b"EXACT SUBSTRING x\n")
+
+
 if __name__ == '__main__':
         unittest.main()
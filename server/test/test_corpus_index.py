@@ -0,0 +1,149 @@
+import os
+import pytest
+from unittest import mock
+from corpus_index import CorpusIndex, file_version
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    Fixture to create a small corpus file for testing.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+
+    Returns:
+    - pathlib.Path: The path to the created corpus file.
+    """
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("connecting\n  now \nlater", encoding="utf-8")
+    return corpus
+
+
+def test_index_contains_stripped_lines(corpus):
+    """
+    Test that lookups match whole stripped lines only.
+    """
+    index = CorpusIndex(corpus).refresh()
+    assert "connecting" in index
+    assert "now" in index
+    assert "later" in index
+    assert "connect" not in index
+    assert index.version == file_version(corpus)
+
+
+def test_index_not_rebuilt_when_version_unchanged(corpus):
+    """
+    Test that the file is only read again when its version changes.
+    """
+    index = CorpusIndex(corpus).refresh()
+    with mock.patch.object(
+            CorpusIndex, "_rebuild", autospec=True) as mock_rebuild:
+        index.refresh()
+        mock_rebuild.assert_not_called()
+
+    corpus.write_text("replaced\n", encoding="utf-8")
+    stat = os.stat(corpus)
+    os.utime(corpus, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    index.refresh()
+    assert "replaced" in index
+    assert "connecting" not in index
+
+
+def test_index_without_version_check_keeps_first_build(corpus):
+    """
+    Test that check_version=False serves the index that was built first.
+    """
+    index = CorpusIndex(corpus).refresh(check_version=False)
+    corpus.write_text("replaced\n", encoding="utf-8")
+    index.refresh(check_version=False)
+    assert "connecting" in index
+    assert "replaced" not in index
+
+
+def test_index_reads_only_appended_tail(corpus):
+    """
+    Test that growing the file indexes the new tail without a rebuild.
+    """
+    index = CorpusIndex(corpus).refresh()
+    assert index.tail == "later"
+
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("r\nappended\n")
+    with mock.patch.object(
+            CorpusIndex, "_rebuild", autospec=True) as mock_rebuild:
+        index.refresh()
+        mock_rebuild.assert_not_called()
+
+    assert "laterr" in index
+    assert "later" not in index
+    assert "appended" in index
+    assert index.tail is None
+    assert index.offset == os.path.getsize(corpus)
+
+
+def test_index_rebuilds_after_truncation(corpus):
+    """
+    Test that a truncated file is fully re-indexed.
+    """
+    index = CorpusIndex(corpus).refresh()
+    corpus.write_text("short\n", encoding="utf-8")
+    index.refresh()
+    assert "short" in index
+    assert "connecting" not in index
+
+
+def test_index_rebuilds_after_inode_replacement(corpus, tmp_path):
+    """
+    Test that replacing the file with a new inode forces a rebuild even
+    when the new file is larger.
+    """
+    index = CorpusIndex(corpus).refresh()
+    replacement = tmp_path / "replacement.txt"
+    replacement.write_text(
+        "different\ncontents\nthat are longer\n", encoding="utf-8")
+    os.replace(replacement, corpus)
+    index.refresh()
+    assert "different" in index
+    assert "connecting" not in index
+
+
+def test_index_rebuilds_when_indexed_bytes_rewritten(corpus):
+    """
+    Test that a file rewritten and grown in place is not treated as an
+    append.
+    """
+    index = CorpusIndex(corpus).refresh()
+    with open(corpus, "r+", encoding="utf-8") as file:
+        file.write("CONNECTING\n  now \nlater and more\n")
+    index.refresh()
+    assert "CONNECTING" in index
+    assert "connecting" not in index
+
+
+def test_index_reports_lines_appended_since_version(corpus):
+    """
+    Test that the lines added by appends are reported from any version
+    that did not end with an unterminated line, until a rebuild.
+    """
+    index = CorpusIndex(corpus).refresh()
+    with_tail = index.version
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("r\nappended\n")
+    index.refresh()
+    complete = index.version
+    assert index.appended_since(complete) == (complete, [])
+
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("more\n  now\nlast")
+    index.refresh()
+    version, lines = index.appended_since(complete)
+    assert version == index.version
+    assert sorted(lines) == ["last", "more"]
+    # The unterminated line may have grown since
+    assert index.appended_since(with_tail) is None
+    assert index.appended_since(index.version) is None
+
+    corpus.write_text("rewritten\n", encoding="utf-8")
+    index.refresh()
+    assert index.appended_since(complete) is None
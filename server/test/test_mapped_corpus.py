@@ -0,0 +1,104 @@
+import pytest
+from mapped_corpus import MappedCorpus
+from corpus_index import CorpusIndex
+from search_algorithms.naive_search import naive_search
+
+
+@pytest.mark.parametrize("contents", [
+    "first\nmiddle\nlast",
+    "first\nmiddle\nlast\n",
+    "  first \t\nmid dle\n\nlast  \r\n",
+    "\n\nfirst\r\nmiddle\nlast\n\n",
+    "firstfirst\nfirst middle\nmiddlelast\n",
+    "",
+    "   ",
+    "only",
+])
+def test_mapped_corpus_matches_line_index(tmp_path, contents):
+    """
+    Test that byte-level lookups agree with the stripped-line index on
+    first and last lines, surrounding whitespace and blank lines.
+    """
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_bytes(contents.encode("utf-8"))
+    mapped = MappedCorpus(corpus).refresh()
+    index = CorpusIndex(corpus).refresh()
+
+    queries = ["first", "middle", "last", "mid dle", "firstfirst",
+               "first middle", "only", "irst", "", " first", "last\n"]
+    for query in queries:
+        assert (query in mapped) is (query in index), query
+    assert set(mapped) == set(index)
+    assert len(mapped) >= len(index)
+
+
+@pytest.mark.parametrize("space", [
+    "\xa0", "\x1c", "\x1d", "\x1e", "\x1f", "\x85", "\u2003", "\u3000",
+])
+def test_mapped_corpus_strips_like_str_strip(tmp_path, space):
+    """
+    Test that Unicode whitespace around a line is ignored exactly as
+    str.strip() ignores it in the baseline search.
+    """
+    contents = (f"{space}first\nmiddle{space}\n{space}\n"
+                f"in{space}side\n{space} last \t{space}\n")
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_bytes(contents.encode("utf-8"))
+    mapped = MappedCorpus(corpus).refresh()
+    data = contents.split("\n")[:-1]
+
+    queries = ["first", "middle", "last", "in", "side", f"in{space}side",
+               f"{space}first", ""]
+    for query in queries:
+        assert (query in mapped) is naive_search(data, query), query
+    assert set(mapped) == set(CorpusIndex(corpus).refresh())
+
+
+def test_mapped_corpus_remaps_when_file_grows(tmp_path):
+    """
+    Test that the mapping is refreshed when the file version changes.
+    """
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("first\n", encoding="utf-8")
+    mapped = MappedCorpus(corpus).refresh()
+    assert "second" not in mapped
+
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("second\n")
+    assert "second" in mapped.refresh()
+
+
+def test_mapped_corpus_reports_appended_lines(tmp_path):
+    """
+    Test that the lines written since an earlier version are reported,
+    including a line completed by the append unless only whole lines are
+    wanted, until the file is rewritten.
+    """
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("first\nsec", encoding="utf-8")
+    mapped = MappedCorpus(corpus).refresh()
+    original = mapped.version
+    assert mapped.appended_since(original) == (original, [])
+
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("ond\n third \n")
+    mapped.refresh()
+    appended = mapped.version
+    assert mapped.appended_since(original) == (
+        appended, ["second", "third"])
+    # "sec" was a line of the original version but is not one any more
+    assert mapped.appended_since(original, whole_lines=True) is None
+
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("fourth")
+    mapped.refresh()
+    assert mapped.appended_since(appended) == (mapped.version, ["fourth"])
+    assert mapped.appended_since(appended, whole_lines=True) == (
+        mapped.version, ["fourth"])
+    assert mapped.appended_since(original)[1] == [
+        "second", "third", "fourth"]
+
+    corpus.write_text("rewritten and longer than before\n",
+                      encoding="utf-8")
+    mapped.refresh()
+    assert mapped.appended_since(appended) is None
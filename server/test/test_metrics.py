@@ -0,0 +1,58 @@
+import urllib.request
+import pytest
+from metrics import MetricsRegistry, start_metrics_server
+
+
+def test_counter_and_histogram_rendering():
+    """
+    Test the exposition text of labelled counters and histograms.
+    """
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("kind",))
+    latency = registry.histogram(
+        "latency_seconds", "Latency.", ("phase",), buckets=(0.1, 1.0))
+    requests.inc(kind="query")
+    requests.inc(2, kind="query")
+    latency.observe(0.05, phase="lookup")
+    latency.observe(0.5, phase="lookup")
+    latency.observe(5, phase="lookup")
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{kind="query"} 3' in text
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{phase="lookup",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{phase="lookup",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{phase="lookup",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{phase="lookup"} 3' in text
+    assert latency.value(phase="lookup") == 3
+
+
+def test_metric_labels_are_checked_and_escaped():
+    """
+    Test that missing labels are refused and label values are escaped.
+    """
+    registry = MetricsRegistry()
+    errors = registry.counter("errors_total", "Errors.", ("error",))
+    with pytest.raises(ValueError):
+        errors.inc()
+    errors.inc(error='bad "quote"\n')
+    assert 'errors_total{error="bad \\"quote\\"\\n"} 1' in registry.render()
+
+
+def test_collector_and_metrics_server():
+    """
+    Test that collector values are served over HTTP.
+    """
+    registry = MetricsRegistry()
+    registry.collector(
+        lambda: [("queue_depth", "gauge", "Queue depth.", [({}, 4)])])
+    httpd = start_metrics_server(registry, "127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.status == 200
+            assert "queue_depth 4" in response.read().decode("utf-8")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,146 @@
+import re
+import pytest
+from query_index import (
+    PrefixIndex,
+    TrigramIndex,
+    decode_postings,
+    encode_postings,
+    grams,
+    required_literals
+)
+
+LINES = ["connecting", "now", "", "tab\tseparated", "ünïcödé", "now"]
+
+
+def test_prefix_index():
+    """
+    Test that prefixes are found at the start of a line only.
+    """
+    index = PrefixIndex(LINES)
+
+    for prefix in ["conn", "connecting", "n", "", "tab\t", "ünï"]:
+        assert index.contains(prefix), prefix
+    for missing in ["onn", "connectingx", "separated", "zzz", "now\n"]:
+        assert not index.contains(missing), missing
+    assert not PrefixIndex([]).contains("")
+
+
+def test_trigram_index_candidates():
+    """
+    Test that only lines holding every trigram of a query are candidates.
+    """
+    index = TrigramIndex(["abcd", "bcde", "xbcx", "abc"])
+
+    assert index.candidates(grams("bcd")) == [0, 1]
+    assert index.candidates(grams("abcd")) == [0]
+    assert index.candidates(grams("zzz")) == []
+    assert index.candidates(grams("bc")) is None
+
+
+def test_trigram_index_contains():
+    """
+    Test substring queries of every length, including short ones.
+    """
+    index = TrigramIndex(LINES)
+
+    for query in ["nnect", "ting", "b\tsep", "ïcö", "no", "w", ""]:
+        assert index.contains(query), query
+    for missing in ["connectingx", "nowcon", "zz", "g\nn"]:
+        assert not index.contains(missing), missing
+    assert not TrigramIndex([]).contains("")
+
+
+def test_postings_round_trip():
+    """
+    Test that delta-encoded posting lists decode to the same numbers.
+    """
+    numbers = [0, 1, 2, 127, 128, 300, 16384, 10 ** 9]
+    data = encode_postings(numbers)
+    assert decode_postings(data) == numbers
+    # Gaps below 128 take one byte each
+    assert len(encode_postings(range(100))) == 100
+
+
+@pytest.mark.parametrize("pattern, literals", [
+    ("connecting", ["connecting"]),
+    ("con+ect", ["con", "ect"]),
+    ("conn?ect", ["con", "ect"]),
+    ("co(nn)?ecting", ["co", "ecting"]),
+    (r"x{0,3}ing\.txt$", ["ing.txt"]),
+    (r"[a-z]+ing\d", ["ing"]),
+    ("now|connecting", []),
+    ("(?i)now", []),
+    (r"\x41BC", ["BC"]),
+    (r"now\x2ecom", ["now", "com"]),
+    (r"\u0041BC", ["BC"]),
+    (r"\U00000041BC", ["BC"]),
+    (r"\N{LATIN CAPITAL LETTER A}BC", ["BC"]),
+    (r"\101BC", ["BC"]),
+    (r"\0BC", ["BC"]),
+    (r"\01BC", ["BC"]),
+    (r"(n)o\1w", ["o", "w"]),
+    (r"now\d+ing", ["now", "ing"]),
+])
+def test_required_literals(pattern, literals):
+    """
+    Test the literals extracted from regular expressions.
+    """
+    assert required_literals(pattern) == literals
+
+
+def test_required_literals_escapes_match():
+    """
+    Test that the literals left around numeric and named escapes occur
+    in the lines the expressions match.
+    """
+    index = TrigramIndex(["ABCD", "now.com", "A\x00BC"])
+
+    for pattern in [r"\x41BCD", r"\u0041BC", r"\U00000041BC",
+                    r"\N{LATIN CAPITAL LETTER A}BCD", r"\101BC",
+                    r"A\0BC", r"now\x2ecom"]:
+        assert index.contains_regex(pattern), pattern
+    # Group references are not valid in a pattern
+    with pytest.raises(re.error):
+        required_literals(r"\g<0>BC")
+
+
+def test_trigram_index_contains_regex():
+    """
+    Test regular expressions against the candidates of their literals.
+    """
+    index = TrigramIndex(LINES)
+
+    for pattern in ["^conn.*ing$", "nn?ect", "t.b", "^$", "now|zzz",
+                    "ü.ï", "(?i)NOW"]:
+        assert index.contains_regex(pattern), pattern
+    for missing in ["^ting", "connectingx", "z+zz", "(?i)later"]:
+        assert not index.contains_regex(missing), missing
+    with pytest.raises(re.error):
+        index.contains_regex("(unclosed")
+
+
+def test_prefix_index_extend():
+    """
+    Test that extending a prefix index merges the new lines into a copy.
+    """
+    index = PrefixIndex(["connecting", "now"])
+    extended = index.extend(["later", "now", "aa"])
+
+    assert extended.lines == ["aa", "connecting", "later", "now"]
+    assert extended.contains("lat")
+    assert not index.contains("lat")
+
+
+def test_trigram_index_extend():
+    """
+    Test that an extended trigram index answers like one built from
+    every line.
+    """
+    index = TrigramIndex(["abcd", "bcde"])
+    assert index.extend(["xbcdx", "abc", "xbcdx"]) is index
+
+    built = TrigramIndex(["abcd", "bcde", "xbcdx", "abc"])
+    assert index.lines == built.lines
+    assert index.postings == built.postings
+    assert index.candidates(grams("bcd")) == [0, 1, 2]
+    assert index.contains_regex("^xb.dx$")
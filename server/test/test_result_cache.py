@@ -0,0 +1,46 @@
+import pytest
+from result_cache import ResultCache
+
+
+def test_result_cache_evicts_least_recently_used():
+    """
+    Test that the oldest unused entry is evicted once the cache is full.
+    """
+    cache = ResultCache(2)
+    cache.put("a", True)
+    cache.put("b", False)
+    assert cache.get("a") is True
+    cache.put("c", True)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is True
+    assert cache.get("c") is True
+    assert len(cache) == 2
+
+
+def test_result_cache_stats():
+    """
+    Test the hit and miss counters and the hit ratio.
+    """
+    cache = ResultCache(10)
+    assert cache.stats()["hit_ratio"] == 0.0
+    cache.put("a", False)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.75
+    assert stats["size"] == 1
+    assert stats["max_size"] == 10
+
+
+def test_result_cache_rejects_invalid_size():
+    """
+    Test that a cache must hold at least one entry.
+    """
+    with pytest.raises(ValueError):
+        ResultCache(0)
@@ -0,0 +1,187 @@
+import importlib
+import pytest
+from search_algorithms import ALGORITHMS, load_algorithm
+
+CORPUS = ["connecting\n", "  now \n", "", "tab\tseparated", "ünïcödé"]
+
+
+def load_or_skip(name):
+    """
+    Load an algorithm module, skipping when its dependency is missing.
+    """
+    try:
+        return load_algorithm(name)
+    except ModuleNotFoundError as e:
+        pytest.skip(f"{name} requires {e.name}")
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_prepared_searcher_exact_lines(algorithm):
+    """
+    Test that every prepared searcher matches whole stripped lines only.
+    """
+    searcher = load_or_skip(algorithm).prepare(CORPUS)
+
+    for line in ["connecting", "now", "", "tab\tseparated", "ünïcödé"]:
+        assert searcher.contains(line) is True, line
+    for missing in ["connect", "now\nconnecting", " now", "separated",
+                    "missing"]:
+        assert searcher.contains(missing) is False, missing
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_prepared_searcher_empty_corpus(algorithm):
+    """
+    Test that a searcher prepared from no lines finds nothing.
+    """
+    searcher = load_or_skip(algorithm).prepare([])
+    assert searcher.contains("") is False
+    assert searcher.contains("anything") is False
+
+
+def test_load_algorithm_unknown():
+    """
+    Test that an unknown algorithm name is rejected.
+    """
+    with pytest.raises(ImportError):
+        load_algorithm("quantum_search")
+
+
+def test_binary_search_sidecar_round_trip(tmp_path):
+    """
+    Test that the sorted lines are persisted and reused while the source
+    is unchanged, and rebuilt once it changes.
+    """
+    binary_search = load_algorithm("binary_search")
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("pear\napple\n\npear\n", encoding="utf-8")
+
+    searcher = binary_search.prepare(corpus.read_text().splitlines(), corpus)
+    assert searcher.lines == ["", "apple", "pear"]
+    sidecar = tmp_path / "corpus.txt.sorted"
+    assert sidecar.exists()
+
+    # A valid sidecar is loaded instead of sorting the given lines
+    reloaded = binary_search.prepare(["ignored"], corpus)
+    assert reloaded.lines == ["", "apple", "pear"]
+    assert reloaded.contains("apple") and reloaded.contains("")
+
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("banana\n")
+    rebuilt = binary_search.prepare(corpus.read_text().splitlines(), corpus)
+    assert rebuilt.lines == ["", "apple", "banana", "pear"]
+    assert binary_search.load_sidecar(corpus) == rebuilt.lines
+
+
+def test_multi_pattern_scanner():
+    """
+    Test one pass reporting patterns found as substrings or whole lines.
+    """
+    aho_corasick_search = pytest.importorskip(
+        "search_algorithms.aho_corasick_search")
+    scanner = aho_corasick_search.MultiPatternScanner(
+        ["conn", "connecting", "now", "missing", ""])
+
+    assert scanner.scan(CORPUS) == {"conn", "connecting", "now", ""}
+    assert scanner.scan(CORPUS, whole_line=True) == {
+        "connecting", "now", ""}
+    assert aho_corasick_search.multi_pattern_search(
+        ["abc"], ["b", "x"]) == {"b"}
+
+
+def test_numpy_searcher_batch(monkeypatch):
+    """
+    Test that a batch resolves duplicates, misses and colliding lines.
+    """
+    numpy_search = pytest.importorskip("search_algorithms.numpy_search")
+    searcher = numpy_search.prepare(CORPUS)
+
+    assert searcher.contains_many(
+        ["now", "missing", "", "now", "ünïcödé", "a\nb"]) == [
+        True, False, True, True, True, False]
+    assert searcher.contains_many([]) == []
+
+    # Lines split across fingerprint chunks are still found
+    monkeypatch.setattr(numpy_search, "CHUNK_SIZE", 4)
+    chunked = numpy_search.prepare(CORPUS)
+    assert chunked.fingerprints.tolist() == searcher.fingerprints.tolist()
+
+    # With every fingerprint colliding only the bytes decide a match
+    line_fingerprints = numpy_search.line_fingerprints
+
+    def colliding(buffer):
+        starts, ends, fingerprints = line_fingerprints(buffer)
+        return starts, ends, fingerprints * 0
+
+    monkeypatch.setattr(numpy_search, "line_fingerprints", colliding)
+    colliding_searcher = numpy_search.prepare(CORPUS)
+    assert colliding_searcher.contains_many(
+        ["tab\tseparated", "tab", "", "now "]) == [True, False, True, False]
+
+
+def test_rolling_hash_scanner():
+    """
+    Test one pass per length class finding substrings and whole lines.
+    """
+    from search_algorithms import rabin_karp_search
+
+    # "conn", "connect" and "connx" share a length class and prefix hash
+    patterns = ["conn", "connect", "connx", "connecting", "now", "c",
+                "eparat", "missing", "", "tab\tseparated", "ing\nnow"]
+    scanner = rabin_karp_search.MultiPatternScanner(patterns)
+    substrings = {"conn", "connect", "connecting", "now", "c", "eparat", "",
+                  "tab\tseparated"}
+    assert scanner.scan(CORPUS) == substrings
+    assert scanner.scan(CORPUS, whole_line=True) == {
+        "connecting", "now", "", "tab\tseparated"}
+    assert scanner.scan([]) == set()
+
+    # Lines are scanned in blocks that patterns never span
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(rabin_karp_search, "BLOCK_SIZE", 3)
+        assert scanner.scan(CORPUS) == substrings
+
+    searcher = rabin_karp_search.prepare(CORPUS)
+    assert searcher.contains_many(["now", "connecting\nnow", "no", "now"]) \
+        == [True, False, False, True]
+
+
+@pytest.mark.parametrize(
+    "algorithm", ["kmp_search", "boyer_moore_search", "regex_search"])
+def test_compiled_patterns_are_cached(algorithm):
+    """
+    Test that repeated targets reuse the compiled pattern and that any
+    Unicode character is handled.
+    """
+    module = load_algorithm(algorithm)
+    module.compile_pattern.cache_clear()
+    searcher = module.prepare(["price: 5€", "日本語", "naïve"])
+
+    for _ in range(3):
+        assert searcher.contains("日本語")
+        assert not searcher.contains("日本")
+    assert module.compile_pattern.cache_info().misses == 2
+    assert module.compile_pattern.cache_info().hits == 4
+
+    search = getattr(module, algorithm)
+    assert search(["price: 5€", "naïve\n"], "naïve")
+    assert not search(["price: 5€"], "5€\nnaïve")
+    assert not search([], "")
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_extended_searcher_matches_prepared(algorithm):
+    """
+    Test that a searcher extended with appended lines answers like one
+    prepared from all the lines.
+    """
+    module = load_or_skip(algorithm)
+    searcher = module.prepare(CORPUS[:2])
+    if not hasattr(searcher, "extend"):
+        pytest.skip(f"{algorithm} searchers cannot be extended")
+    extended = searcher.extend(CORPUS[2:])
+
+    for line in ["connecting", "now", "", "tab\tseparated", "ünïcödé"]:
+        assert extended.contains(line) is True, line
+    for missing in ["connect", " now", "separated", "missing"]:
+        assert extended.contains(missing) is False, missing
@@ -1,5 +1,9 @@
 import os
+import asyncio
 import logging
+import socket
+import threading
+import time
 import unittest
 import sys
 from pathlib import Path
@@ -7,11 +11,32 @@ import configparser
 import pytest
 from unittest import mock
 import ssl
+from result_cache import ResultCache
 from server import (
     search_string_in_file,
+    search_batch_in_file,
+    get_corpus_index,
+    bloom_filter_stats,
+    shard_paths,
+    CORPUS_INDEXES,
+    ERRORS,
+    PHASE_SECONDS,
+    REGISTRY,
+    REQUESTS,
+    SEARCH_ALGORITHM,
+    process_query,
+    RequestParser,
+    parse_query_mode,
+    configure_ssl_context,
+    TLS_HANDSHAKES,
+    open_index_file,
     start_server,
     handle_client,
-    accept_connections
+    handle_client_async,
+    start_accept_thread,
+    run_async_server,
+    accept_connections,
+    get_idle_connections
 )
 
 # Adding the server directory to the Python path
@@ -408,8 +433,1011 @@ def test_ssl_handling_with_invalid_cert(tmp_path, caplog):
 
     with caplog.at_level(logging.ERROR):
         start_server(mock_ssl_context=mock_ssl_context)
-        
-    
+
+
+def test_search_string_in_file_reread_picks_up_changes(tmp_path):
+    """
+    Test that reread_on_query serves fresh data once the file changes.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+
+    Asserts:
+    - A line added to the file is found on the next query.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow", encoding="utf-8")
+    assert search_string_in_file("later", test_file, True) == (
+        "STRING NOT FOUND\n")
+
+    test_file.write_text("connecting\nnow\nlater\n", encoding="utf-8")
+    assert search_string_in_file("later", test_file, True) == (
+        "STRING EXISTS\n")
+
+
+def test_handle_client_async(tmp_path):
+    """
+    Test that the asyncio engine serves the same protocol.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+
+    Asserts:
+    - Queries are answered and the connection is closed, both inline and
+    with the lookup offloaded to an executor.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow", encoding="utf-8")
+
+    async def query(search_string):
+        server = await asyncio.start_server(
+            handle_client_async, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(search_string.encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response.decode()
+
+    with mock.patch("server.file_path", str(test_file)):
+        assert asyncio.run(query("connecting")) == "STRING EXISTS\n"
+        with mock.patch("server.ASYNC_OFFLOAD", True):
+            assert asyncio.run(query("missing")) == "STRING NOT FOUND\n"
+
+
+def test_start_accept_thread_asyncio_engine():
+    """
+    Test that the asyncio engine is started on the listening socket.
+    """
+    mock_socket = mock.Mock()
+    with mock.patch("server.ENGINE", "asyncio"), \
+            mock.patch("server.threading.Thread") as mock_thread:
+        start_accept_thread(mock_socket, None)
+    mock_thread.assert_called_once_with(
+        target=run_async_server, args=(mock_socket, None))
+    mock_thread.return_value.start.assert_called_once_with()
+
+
+def test_accept_connections_rejects_when_pool_full():
+    """
+    Test that a connection is answered with SERVER BUSY when the worker
+    queue is full.
+    """
+    client = mock.Mock()
+
+    class MockServerSocket:
+        def __init__(self):
+            self.calls = 0
+
+        def accept(self):
+            self.calls += 1
+            if self.calls > 1:
+                raise Exception("Stop accepting")
+            return client, ("127.0.0.1", 1234)
+
+    mock_pool = mock.Mock()
+    mock_pool.submit.return_value = False
+    with mock.patch("server.get_worker_pool", return_value=mock_pool):
+        with pytest.raises(Exception, match="Stop accepting"):
+            accept_connections(MockServerSocket(), None)
+
+    mock_pool.submit.assert_called_once_with(client, ("127.0.0.1", 1234))
+    client.sendall.assert_called_once_with(b"SERVER BUSY\n")
+    client.close.assert_called_once_with()
+
+
+def test_get_corpus_index_prefers_current_shared_index(tmp_path):
+    """
+    Test that a shared index is used until the file changes.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow", encoding="utf-8")
+    shared = mock.Mock()
+    shared.version = os.stat(test_file).st_ino, 0, 0
+
+    with mock.patch.dict("server.SHARED_INDEXES", {str(test_file): shared}):
+        assert get_corpus_index(test_file, False) is shared
+        # The file no longer matches the shared index's version
+        assert get_corpus_index(test_file, True) is not shared
+        assert "now" in get_corpus_index(test_file, True)
+
+
+def test_open_index_file_writes_and_reuses_index(tmp_path):
+    """
+    Test that the index file is written once and mapped on later starts.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow", encoding="utf-8")
+
+    with mock.patch.dict("server.SHARED_INDEXES", clear=True):
+        index = open_index_file(test_file)
+        assert (tmp_path / "test.txt.idx").exists()
+        assert get_corpus_index(test_file, True) is index
+        assert search_string_in_file("now", test_file, True) == (
+            "STRING EXISTS\n")
+
+    with mock.patch("server.CorpusIndex") as corpus_index, \
+            mock.patch.dict("server.SHARED_INDEXES", clear=True):
+        assert "connecting" in open_index_file(test_file)
+        corpus_index.assert_not_called()
+
+
+@pytest.fixture
+def served_file(tmp_path):
+    """
+    Fixture pointing the server at a small temporary file.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow", encoding="utf-8")
+    with mock.patch("server.file_path", str(test_file)):
+        yield test_file
+
+
+def start_handle_client():
+    """
+    Serve one end of a socket pair with handle_client in a thread.
+
+    Returns:
+    - A tuple of (client socket, handler thread).
+    """
+    server_end, client_end = socket.socketpair()
+    thread = threading.Thread(
+        target=handle_client, args=(server_end, ("127.0.0.1", 1234)))
+    thread.start()
+    return client_end, thread
+
+
+def receive_all(sock):
+    """
+    Read from a socket until the peer closes it.
+    """
+    chunks = []
+    while True:
+        chunk = sock.recv(1024)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def test_handle_client_single_shot(served_file):
+    """
+    Test that a query without a newline gets one answer and is closed.
+    """
+    client, thread = start_handle_client()
+    client.sendall(b"connecting")
+    assert receive_all(client) == b"STRING EXISTS\n"
+    thread.join(5)
+    client.close()
+
+
+def test_handle_client_pipelined_queries(served_file):
+    """
+    Test that newline-terminated queries are answered in order on one
+    connection until the client closes it.
+    """
+    client, thread = start_handle_client()
+    client.sendall(b"connecting\nmissing\r\nn")
+    client.sendall(b"ow\n")
+    client.shutdown(socket.SHUT_WR)
+    assert receive_all(client) == (
+        b"STRING EXISTS\nSTRING NOT FOUND\nSTRING EXISTS\n")
+    thread.join(5)
+    client.close()
+
+
+def test_handle_client_idle_timeout(served_file):
+    """
+    Test that an idle persistent connection is closed by the server,
+    whether its thread waits for it or it is parked with the watcher.
+    """
+    from worker_pool import WorkerPool
+
+    pool = WorkerPool(handle_client, 1, 1)
+    for worker_pool in (None, pool):
+        with mock.patch("server.IDLE_TIMEOUT", 0.1), \
+                mock.patch("server.WORKER_POOL", worker_pool), \
+                mock.patch("server.IDLE_CONNECTIONS", None):
+            client, thread = start_handle_client()
+            client.sendall(b"now\n")
+            assert receive_all(client) == b"STRING EXISTS\n"
+            thread.join(5)
+            assert not thread.is_alive()
+            client.close()
+
+
+def test_idle_connections_do_not_hold_workers(served_file):
+    """
+    Test that persistent connections waiting for a request do not keep
+    the only worker from serving other connections.
+    """
+    from worker_pool import WorkerPool
+
+    pool = WorkerPool(handle_client, 1, 4)
+    with mock.patch("server.WORKER_POOL", pool), \
+            mock.patch("server.IDLE_CONNECTIONS", None):
+        clients = [socket.socketpair() for _ in range(3)]
+        for server_end, client_end in clients:
+            client_end.settimeout(5)
+            assert pool.submit(server_end, ("127.0.0.1", 1234))
+            client_end.sendall(b"now\n")
+            assert client_end.recv(1024) == b"STRING EXISTS\n"
+        # Every connection is still open and answered in turn
+        for _ in range(2):
+            for server_end, client_end in clients:
+                client_end.sendall(b"missing\n")
+                assert client_end.recv(1024) == b"STRING NOT FOUND\n"
+        # The last answer may arrive before its connection is parked
+        deadline = time.monotonic() + 5
+        while get_idle_connections().stats()["parked"] < 3:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        for server_end, client_end in clients:
+            client_end.shutdown(socket.SHUT_WR)
+            assert receive_all(client_end) == b""
+            client_end.close()
+
+
+def test_handle_client_async_pipelined_queries(served_file):
+    """
+    Test that the asyncio engine answers pipelined queries in order.
+    """
+    async def query(payload):
+        server = await asyncio.start_server(
+            handle_client_async, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(payload)
+            writer.write_eof()
+            response = await reader.read()
+            writer.close()
+            return response
+
+    assert asyncio.run(query(b"now\nmissing\nconnecting\n")) == (
+        b"STRING EXISTS\nSTRING NOT FOUND\nSTRING EXISTS\n")
+
+
+def test_handle_client_long_first_line(tmp_path):
+    """
+    Test that a first query longer than the first read, with its newline
+    in a later segment, starts a persistent connection instead of being
+    cut and answered as a single query.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    long_line = "c" * 1500
+    test_file = tmp_path / "test.txt"
+    test_file.write_text(f"{long_line}\nnow\n", encoding="utf-8")
+    with mock.patch("server.file_path", str(test_file)):
+        client, thread = start_handle_client()
+        client.sendall(long_line[:1024].encode())
+        time.sleep(0.1)
+        client.sendall(f"{long_line[1024:]}\nnow\nmissing\n".encode())
+        client.shutdown(socket.SHUT_WR)
+        assert receive_all(client) == (
+            b"STRING EXISTS\nSTRING EXISTS\nSTRING NOT FOUND\n")
+        thread.join(5)
+        client.close()
+
+        async def query(payload):
+            server = await asyncio.start_server(
+                handle_client_async, "127.0.0.1", 0)
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", port)
+                writer.write(payload)
+                writer.write_eof()
+                response = await reader.read()
+                writer.close()
+                return response
+
+        assert asyncio.run(query(f"{long_line}\nnow\n".encode())) == (
+            b"STRING EXISTS\nSTRING EXISTS\n")
+
+
+def test_handle_client_batch_frame(served_file):
+    """
+    Test that a batch frame, even when split across reads, is answered
+    with one flag per query and can be mixed with single queries.
+    """
+    client, thread = start_handle_client()
+    client.sendall(b"\x00BATCH 3\nnow\nmiss")
+    client.sendall(b"ing\nconnecting\nnow\n\x00BATCH 0\n\x00BATCH x\n")
+    client.shutdown(socket.SHUT_WR)
+    assert receive_all(client) == (
+        b"101\nSTRING EXISTS\n\nError: Invalid batch size.\n")
+    thread.join(5)
+    client.close()
+
+
+def test_search_batch_in_file_file_not_found(tmp_path):
+    """
+    Test that a batch against a missing file returns the error message.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    result = search_batch_in_file(["a", "b"], tmp_path / "missing.txt", True)
+    assert result == "Error: File not found.\n"
+
+
+def test_handle_client_scan_frame(served_file):
+    """
+    Test that a SCAN frame reports which queries occur as substrings.
+    """
+    pytest.importorskip("ahocorasick")
+    client, thread = start_handle_client()
+    client.sendall(b"\x00SCAN 3\nnec\nmissing\now\n")
+    client.shutdown(socket.SHUT_WR)
+    assert receive_all(client) == b"101\n"
+    thread.join(5)
+    client.close()
+
+
+def test_search_string_in_file_bloom_filter(tmp_path):
+    """
+    Test that definite misses are answered by the Bloom filter alone.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow", encoding="utf-8")
+
+    for use_mmap in (False, True):
+        with mock.patch("server.BLOOM_FILTER", True), \
+                mock.patch("server.USE_MMAP", use_mmap), \
+                mock.patch.dict("server.CORPUS_INDEXES", clear=True), \
+                mock.patch.dict("server.SEARCHERS", clear=True):
+            assert search_string_in_file("now", test_file, True) == (
+                "STRING EXISTS\n")
+            assert search_string_in_file("later", test_file, True) == (
+                "STRING NOT FOUND\n")
+            stats = bloom_filter_stats()[str(test_file)]
+            assert stats["hits"] + stats["misses"] == 2
+            assert stats["hits"] - stats["false_positives"] == 1
+
+
+def test_search_string_in_sharded_corpus(tmp_path):
+    """
+    Test that a glob of shard files is searched as one corpus and that
+    shards can be added and removed while the server runs.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    (tmp_path / "day1.txt").write_text("connecting\n", encoding="utf-8")
+    (tmp_path / "day2.txt").write_text("now\n", encoding="utf-8")
+    pattern = str(tmp_path / "day*.txt")
+
+    assert search_string_in_file("now", pattern, True) == "STRING EXISTS\n"
+    assert search_batch_in_file(
+        ["connecting", "later", "now"], pattern, True) == "101\n"
+
+    (tmp_path / "day3.txt").write_text("later\n", encoding="utf-8")
+    (tmp_path / "day2.txt").unlink()
+    assert search_batch_in_file(
+        ["connecting", "later", "now"], pattern, True) == "110\n"
+    assert str(tmp_path / "day2.txt") not in CORPUS_INDEXES
+
+
+def test_shard_paths_lists_and_globs(tmp_path):
+    """
+    Test the expansion of comma-separated lists and glob patterns.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    for name in ("b.txt", "a.txt", "c.log"):
+        (tmp_path / name).write_text("x\n", encoding="utf-8")
+    a, b, c = (str(tmp_path / name) for name in ("a.txt", "b.txt", "c.log"))
+
+    assert shard_paths(f"{tmp_path}/*.txt, {c}") == [a, b, c]
+    assert shard_paths(f"{c},{c}") == [c]
+    assert shard_paths("missing.txt") == ["missing.txt"]
+    with pytest.raises(FileNotFoundError):
+        shard_paths(f"{tmp_path}/*.csv")
+
+
+def test_search_string_in_file_result_cache(tmp_path):
+    """
+    Test that cached answers are reused until the file changes.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\n", encoding="utf-8")
+    cache = ResultCache(100)
+
+    with mock.patch("server.RESULT_CACHE", cache):
+        for _ in range(3):
+            assert search_string_in_file("later", test_file, True) == (
+                "STRING NOT FOUND\n")
+        assert cache.stats()["hits"] == 2
+
+        with open(test_file, "a", encoding="utf-8") as file:
+            file.write("later\n")
+        assert search_string_in_file("later", test_file, True) == (
+            "STRING EXISTS\n")
+        assert search_batch_in_file(
+            ["later", "connecting", "now"], test_file, True) == "110\n"
+        assert cache.stats()["hits"] == 3
+
+
+def test_cached_search_checks_each_shard_once(tmp_path):
+    """
+    Test that a query missing the cache expands the shard pattern and
+    checks each shard for changes once, and that the cache keys of one
+    corpus version share a single version tuple.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    import corpus_index
+    import glob
+
+    (tmp_path / "day1.txt").write_text("connecting\n", encoding="utf-8")
+    (tmp_path / "day2.txt").write_text("now\n", encoding="utf-8")
+    pattern = str(tmp_path / "day*.txt")
+    cache = ResultCache(100)
+
+    with mock.patch("server.RESULT_CACHE", cache), \
+            mock.patch.dict("server.CORPUS_INDEXES", clear=True), \
+            mock.patch.object(cache, "put", wraps=cache.put) as put:
+        assert search_string_in_file("now", pattern, True) == (
+            "STRING EXISTS\n")
+        with mock.patch("server.glob.glob", wraps=glob.glob) as expand, \
+                mock.patch("corpus_index.file_version",
+                           wraps=corpus_index.file_version) as stat:
+            assert search_batch_in_file(
+                ["later", "connecting"], pattern, True) == "01\n"
+        assert expand.call_count == 1
+        assert stat.call_count == 2
+
+    versions = {id(call.args[0][3]) for call in put.call_args_list}
+    assert len(versions) == 1
+
+
+def test_process_query_records_metrics(served_file):
+    """
+    Test that answered queries and failed searches are counted.
+    """
+    requests_before = REQUESTS.value(kind="query")
+    lookups_before = PHASE_SECONDS.value(
+        phase="lookup", algorithm=SEARCH_ALGORITHM)
+
+    assert process_query("now", ("127.0.0.1", 1)) == "STRING EXISTS\n"
+    assert REQUESTS.value(kind="query") == requests_before + 1
+    assert PHASE_SECONDS.value(
+        phase="lookup", algorithm=SEARCH_ALGORITHM) == lookups_before + 1
+
+    errors_before = ERRORS.value(error="FileNotFoundError")
+    search_string_in_file("now", str(served_file) + ".missing", True)
+    assert ERRORS.value(error="FileNotFoundError") == errors_before + 1
+    assert "search_request_seconds_bucket" in REGISTRY.render()
+
+
+def test_tls_handshake_runs_off_the_accept_thread(served_file):
+    """
+    Test that a client stalling its TLS handshake does not hold up other
+    clients, and that resumed handshakes are counted.
+    """
+    from client import Client
+
+    server_dir = Path(__file__).resolve().parent.parent
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(
+        server_dir / "server.crt", server_dir / "server.key")
+    configure_ssl_context(context)
+    listener = socket.create_server(("127.0.0.1", 0))
+    threading.Thread(
+        target=accept_connections, args=(listener, context),
+        daemon=True).start()
+
+    full_before = TLS_HANDSHAKES.value(result="full")
+    resumed_before = TLS_HANDSHAKES.value(result="resumed")
+    # Connect without ever starting the handshake
+    stalled = socket.create_connection(listener.getsockname())
+    try:
+        client = Client(*listener.getsockname(), use_ssl=True, timeout=5)
+        assert client.contains("now")
+        client.close()
+        assert client.contains("connecting")
+        client.close()
+    finally:
+        stalled.close()
+
+    assert TLS_HANDSHAKES.value(result="full") == full_before + 1
+    assert TLS_HANDSHAKES.value(result="resumed") == resumed_before + 1
+
+
+def test_handle_client_scan_frame_rabin_karp(served_file):
+    """
+    Test that SCAN frames use the configured algorithm's scanner.
+    """
+    with mock.patch("server.SCAN_ALGORITHM", "rabin_karp_search"):
+        client, thread = start_handle_client()
+        client.sendall(b"\x00SCAN 4\nnec\nmissing\now\n\n")
+        client.shutdown(socket.SHUT_WR)
+        assert receive_all(client) == b"1011\n"
+        thread.join(5)
+    client.close()
+
+
+def test_search_string_in_file_query_modes(tmp_path):
+    """
+    Test prefix and substring queries across shards, before and after a
+    shard changes, with in-memory and memory-mapped indexes.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    (tmp_path / "day1.txt").write_text("connecting\n", encoding="utf-8")
+    (tmp_path / "day2.txt").write_text("now\n", encoding="utf-8")
+    pattern = str(tmp_path / "day*.txt")
+
+    for use_mmap in (False, True):
+        with mock.patch("server.USE_MMAP", use_mmap), \
+                mock.patch.dict("server.CORPUS_INDEXES", clear=True), \
+                mock.patch.dict("server.MODE_INDEXES", clear=True):
+            for mode, query, expected in [
+                    ("PREFIX", "conn", "STRING EXISTS\n"),
+                    ("PREFIX", "nnect", "STRING NOT FOUND\n"),
+                    ("SUBSTRING", "nnect", "STRING EXISTS\n"),
+                    ("SUBSTRING", "no", "STRING EXISTS\n"),
+                    ("SUBSTRING", "gnow", "STRING NOT FOUND\n"),
+                    ("EXACT", "conn", "STRING NOT FOUND\n")]:
+                assert search_string_in_file(
+                    query, pattern, True, mode) == expected, (mode, query)
+
+    (tmp_path / "day2.txt").write_text("now\nlater\n", encoding="utf-8")
+    assert search_string_in_file(
+        "ate", pattern, True, "SUBSTRING") == "STRING EXISTS\n"
+
+
+def test_get_mode_index_extends_appended_lines(tmp_path):
+    """
+    Test that the prefix and trigram indexes take the lines appended to
+    a file instead of being built again, and that a grown last line is
+    no longer matched by its old text.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    from server import get_mode_index
+
+    test_file = tmp_path / "test.txt"
+    for use_mmap in (False, True):
+        test_file.write_text("connecting\nno", encoding="utf-8")
+        with mock.patch("server.USE_MMAP", use_mmap), \
+                mock.patch("server.REGEX_QUERIES", True), \
+                mock.patch.dict("server.CORPUS_INDEXES", clear=True), \
+                mock.patch.dict("server.MODE_INDEXES", clear=True):
+            assert search_string_in_file(
+                "^no$", test_file, True, "REGEX") == "STRING EXISTS\n"
+            with open(test_file, "a", encoding="utf-8") as file:
+                file.write("w\n")
+            assert search_string_in_file(
+                "^no$", test_file, True, "REGEX") == "STRING NOT FOUND\n"
+            assert search_string_in_file(
+                "^now$", test_file, True, "REGEX") == "STRING EXISTS\n"
+
+            trigrams = get_mode_index(test_file, "SUBSTRING", True)
+            get_mode_index(test_file, "PREFIX", True)
+            with open(test_file, "a", encoding="utf-8") as file:
+                file.write("later\nnow\n")
+            assert get_mode_index(test_file, "SUBSTRING", True) is trigrams
+            assert get_mode_index(test_file, "PREFIX", True).lines == [
+                "connecting", "later", "now"]
+            assert search_string_in_file(
+                "ate", test_file, True, "SUBSTRING") == "STRING EXISTS\n"
+            assert search_string_in_file(
+                "la", test_file, True, "PREFIX") == "STRING EXISTS\n"
+
+
+def test_get_mode_index_streams_shared_index(tmp_path):
+    """
+    Test that the mode indexes of a shared index are built from its
+    lines without reading the file into a corpus index.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    from corpus_index import CorpusIndex, file_version
+    from server import create_shared_index, get_mode_index
+
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow\n", encoding="utf-8")
+    shared, memory = create_shared_index(
+        ["connecting", "now"], file_version(test_file), test_file)
+    try:
+        with mock.patch.dict(
+                "server.SHARED_INDEXES", {str(test_file): shared}), \
+                mock.patch.dict("server.MODE_INDEXES", clear=True), \
+                mock.patch.object(
+                    CorpusIndex, "refresh",
+                    side_effect=AssertionError("file read")):
+            assert get_mode_index(test_file, "PREFIX", False).contains(
+                "conn")
+            assert get_mode_index(test_file, "SUBSTRING", False).contains(
+                "ow")
+    finally:
+        shared.release()
+        memory.close()
+        memory.unlink()
+
+
+def test_process_query_modes(served_file):
+    """
+    Test that a mode word selects the query mode and EXACT escapes it,
+    and that mode words are part of the query unless query_modes is set.
+    """
+    assert parse_query_mode("PREFIX con") == ("EXACT", "PREFIX con")
+    assert process_query("SUBSTRING ecti", None) == "STRING NOT FOUND\n"
+
+    with mock.patch("server.QUERY_MODES_ENABLED", True):
+        assert parse_query_mode("PREFIX con") == ("PREFIX", "con")
+        assert parse_query_mode("PREFIX") == ("EXACT", "PREFIX")
+        assert parse_query_mode("prefix con") == ("EXACT", "prefix con")
+        assert parse_query_mode("EXACT PREFIX con") == (
+            "EXACT", "PREFIX con")
+
+        before = REQUESTS.value(kind="substring")
+        assert process_query("SUBSTRING ecti", None) == "STRING EXISTS\n"
+        assert process_query("PREFIX ecti", None) == "STRING NOT FOUND\n"
+        assert process_query("EXACT now", None) == "STRING EXISTS\n"
+        assert REQUESTS.value(kind="substring") == before + 1
+
+
+def test_search_string_in_file_regex_mode(served_file):
+    """
+    Test regular expression queries and invalid expressions.
+    """
+    with mock.patch("server.QUERY_MODES_ENABLED", True), \
+            mock.patch("server.REGEX_QUERIES", True):
+        assert search_string_in_file(
+            "^con+ect.*g$", served_file, True, "REGEX") == (
+            "STRING EXISTS\n")
+        assert search_string_in_file(
+            "^nect", served_file, True, "REGEX") == "STRING NOT FOUND\n"
+        assert search_string_in_file(
+            "(unclosed", served_file, True, "REGEX").startswith(
+            "Error: Invalid regular expression")
+        assert process_query("REGEX ^no.$", None) == "STRING EXISTS\n"
+
+
+def test_search_string_in_file_regex_refused(served_file):
+    """
+    Test that regular expression queries are refused unless enabled,
+    and refused when longer than max_regex_length.
+    """
+    with mock.patch("server.QUERY_MODES_ENABLED", True):
+        assert process_query("REGEX ^no.$", None) == (
+            "Error: Regular expression queries are disabled.\n")
+        with mock.patch("server.REGEX_QUERIES", True), \
+                mock.patch("server.MAX_REGEX_LENGTH", 4):
+            assert process_query("REGEX ^no.", None) == "STRING EXISTS\n"
+            assert process_query("REGEX ^now$", None) == (
+                "Error: Regular expression too long.\n")
+
+
+def query_until_answered(port, query, deadline):
+    """
+    Send a query on a fresh connection, retrying until a worker answers.
+    """
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), 1) as sock:
+                sock.sendall(query)
+                return receive_all(sock)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"),
+    reason="Needs SO_REUSEPORT")
+def test_prefork_server_restarts_workers_and_unlinks_index(served_file):
+    """
+    Test that queries are still answered after a worker is killed, that
+    the worker is replaced, and that the shared index is unlinked when
+    the server is stopped with SIGTERM.
+    """
+    import multiprocessing
+    import signal
+    from multiprocessing import shared_memory
+    from server import (
+        create_shared_index, prefork_worker, start_prefork_server)
+
+    with socket.create_server(("127.0.0.1", 0)) as probe:
+        port = probe.getsockname()[1]
+    fork_context = multiprocessing.get_context("fork")
+    block_names = fork_context.Queue()
+    worker_pids = fork_context.Queue()
+
+    def create_and_report(*args):
+        shared, memory = create_shared_index(*args)
+        block_names.put(memory.name)
+        return shared, memory
+
+    def report_and_serve(*args):
+        worker_pids.put(os.getpid())
+        prefork_worker(*args)
+
+    with mock.patch("server.HOST", "127.0.0.1"), \
+            mock.patch("server.PORT", port), \
+            mock.patch("server.SSL_ENABLED", False), \
+            mock.patch("server.INDEX_FILE", False), \
+            mock.patch("server.USE_MMAP", False), \
+            mock.patch("server.METRICS_PORT", 0), \
+            mock.patch("server.create_shared_index", create_and_report), \
+            mock.patch("server.prefork_worker", report_and_serve):
+        parent = fork_context.Process(
+            target=start_prefork_server, args=(2,))
+        parent.start()
+    try:
+        block_name = block_names.get(timeout=10)
+        killed = worker_pids.get(timeout=10)
+        worker_pids.get(timeout=10)
+        deadline = time.monotonic() + 10
+        assert query_until_answered(port, b"now", deadline) == (
+            b"STRING EXISTS\n")
+
+        os.kill(killed, signal.SIGKILL)
+        for _ in range(4):
+            assert query_until_answered(port, b"connecting", deadline) == (
+                b"STRING EXISTS\n")
+        # The parent forks a replacement for the killed worker
+        assert worker_pids.get(timeout=10) != killed
+    finally:
+        parent.terminate()
+        parent.join(10)
+
+    assert parent.exitcode == 0
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(block_name)
+
+
+def test_handle_client_header_words_are_queries(served_file):
+    """
+    Test that lines starting with the words of frame headers, but not
+    with the NUL marker, are answered as single queries.
+    """
+    client, thread = start_handle_client()
+    client.sendall(b"BATCH 2\nnow\nSCAN 1\n")
+    client.shutdown(socket.SHUT_WR)
+    assert receive_all(client) == (
+        b"STRING NOT FOUND\nSTRING EXISTS\nSTRING NOT FOUND\n")
+    thread.join(5)
+    client.close()
+
+
+def test_request_parser_frame_split_into_single_bytes(served_file):
+    """
+    Test that a frame and a query fed one byte at a time are answered
+    once complete, and that an unterminated last line is answered when
+    the client closes the connection.
+    """
+    parser = RequestParser(("127.0.0.1", 1234))
+    data = b"\x00BATCH 2\nnow\nmissing\nconnecting\nnow"
+    responses = [parser.feed(data[i:i + 1]) for i in range(len(data))]
+    assert [response for response in responses if response] == [
+        "10\n", "STRING EXISTS\n"]
+    assert responses.index("10\n") == data.index(b"missing\n") + 7
+    assert not parser.line_too_long()
+    assert parser.finish() == "STRING EXISTS\n"
+    assert parser.finish() == ""
+
+
+@pytest.mark.parametrize("bloom_filter", [False, True])
+def test_get_searcher_extends_searcher_after_append(tmp_path, bloom_filter):
+    """
+    Test that after an append the searcher only takes the new lines, and
+    that it is prepared without holding the lock of every searcher.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    - bloom_filter (bool): Whether the searcher is behind a Bloom filter.
+    """
+    from search_algorithms import load_algorithm
+    from server import SEARCHERS_LOCK
+
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow\n", encoding="utf-8")
+    binary_search = load_algorithm("binary_search")
+
+    def prepare(lines, source=None):
+        assert not SEARCHERS_LOCK.locked()
+        return binary_search.prepare(lines, source)
+
+    with mock.patch("server.SEARCH_MODULE") as module, \
+            mock.patch("server.BLOOM_FILTER", bloom_filter), \
+            mock.patch("server.USE_MMAP", False), \
+            mock.patch.dict("server.CORPUS_INDEXES", clear=True), \
+            mock.patch.dict("server.SEARCHERS", clear=True):
+        module.prepare.side_effect = prepare
+        assert search_string_in_file("now", test_file, True) == (
+            "STRING EXISTS\n")
+        with open(test_file, "a", encoding="utf-8") as file:
+            file.write("appended\n")
+        assert search_string_in_file("appended", test_file, True) == (
+            "STRING EXISTS\n")
+        assert search_string_in_file("connecting", test_file, True) == (
+            "STRING EXISTS\n")
+        module.prepare.assert_called_once()
+
+        # A rewrite cannot be caught up with and is prepared again
+        test_file.write_text("rewritten\n", encoding="utf-8")
+        assert search_string_in_file("now", test_file, True) == (
+            "STRING NOT FOUND\n")
+        assert module.prepare.call_count == 2
+
+
+def test_bloom_filter_in_front_of_index_file(tmp_path):
+    """
+    Test that a mapped index file gets a Bloom filter too.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow\n", encoding="utf-8")
+
+    with mock.patch("server.BLOOM_FILTER", True), \
+            mock.patch.dict("server.SHARED_INDEXES", clear=True), \
+            mock.patch.dict("server.SEARCHERS", clear=True):
+        open_index_file(test_file)
+        assert search_string_in_file("now", test_file, False) == (
+            "STRING EXISTS\n")
+        assert search_string_in_file("later", test_file, False) == (
+            "STRING NOT FOUND\n")
+        stats = bloom_filter_stats()[str(test_file)]
+        assert stats["hits"] + stats["misses"] == 2
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_bloom_filter_takes_appended_lines(tmp_path, use_mmap):
+    """
+    Test that appended lines are added to the Bloom filter in place
+    once it has grown, rather than building it again for every version.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    - use_mmap (bool): Whether the corpus is memory-mapped.
+    """
+    from server import SEARCHERS
+
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("connecting\nnow\n", encoding="utf-8")
+
+    with mock.patch("server.BLOOM_FILTER", True), \
+            mock.patch("server.USE_MMAP", use_mmap), \
+            mock.patch.dict("server.CORPUS_INDEXES", clear=True), \
+            mock.patch.dict("server.SEARCHERS", clear=True):
+        assert search_string_in_file("now", test_file, True) == (
+            "STRING EXISTS\n")
+        for line in ["appended", "more", "and more"]:
+            with open(test_file, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+            assert search_string_in_file(line, test_file, True) == (
+                "STRING EXISTS\n")
+            if line == "appended":
+                # The filter sized for the first two lines has grown
+                bloom = SEARCHERS[str(test_file)][1].bloom
+                assert bloom.capacity == 6
+        assert SEARCHERS[str(test_file)][1].bloom is bloom
+        assert search_string_in_file("connecting", test_file, True) == (
+            "STRING EXISTS\n")
+
+
+def test_reject_client_closes_tls_without_writing():
+    """
+    Test that a refused TLS connection is closed without running its
+    handshake on the accept thread.
+    """
+    from server import reject_client
+
+    client = mock.Mock(spec=ssl.SSLSocket)
+    reject_client(client, ("127.0.0.1", 1234))
+    client.sendall.assert_not_called()
+    client.do_handshake.assert_not_called()
+    client.close.assert_called_once_with()
+
+
+def test_async_engine_records_tls_handshakes(served_file):
+    """
+    Test that the asyncio engine records the duration of successful TLS
+    handshakes and counts the failed ones.
+    """
+    from server import TLS_HANDSHAKE_SECONDS, serve_async
+
+    server_dir = Path(__file__).resolve().parent.parent
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(
+        server_dir / "server.crt", server_dir / "server.key")
+    client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_context.check_hostname = False
+    client_context.verify_mode = ssl.CERT_NONE
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+
+    async def exercise():
+        server = asyncio.ensure_future(serve_async(listener, context))
+        reader, writer = await asyncio.open_connection(
+            "127.0.0.1", port, ssl=client_context)
+        writer.write(b"now")
+        assert await reader.read() == b"STRING EXISTS\n"
+        writer.close()
+
+        # A client that never starts the handshake
+        _, plain = await asyncio.open_connection("127.0.0.1", port)
+        await asyncio.sleep(0.5)
+        plain.close()
+        server.cancel()
+
+    full_before = TLS_HANDSHAKES.value(result="full")
+    failed_before = TLS_HANDSHAKES.value(result="failed")
+    seconds_before = TLS_HANDSHAKE_SECONDS.value(result="full")
+    with mock.patch("server.HANDSHAKE_TIMEOUT", 0.2):
+        asyncio.run(exercise())
+    listener.close()
+
+    assert TLS_HANDSHAKES.value(result="full") == full_before + 1
+    assert TLS_HANDSHAKE_SECONDS.value(result="full") == seconds_before + 1
+    assert TLS_HANDSHAKES.value(result="failed") == failed_before + 1
+
+
+@pytest.mark.parametrize("query_modes", [True, False])
+def test_format_query_round_trips_reserved_words(tmp_path, query_modes):
+    """
+    Test that exact queries starting with a mode word or a frame header
+    word are answered as exact lines by the server. Mode words are
+    escaped by the client when query_modes is set; frame header words,
+    and mode words without query_modes, are sent as they are.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    - query_modes (bool): The query_modes setting of client and server.
+    """
+    from client import RESERVED_WORDS, format_query
+
+    test_file = tmp_path / "test.txt"
+    words = RESERVED_WORDS + ("BATCH", "SCAN")
+    test_file.write_text(
+        "now\n" + "".join(f"{word} o\n" for word in words),
+        encoding="utf-8")
+    with mock.patch("server.file_path", str(test_file)), \
+            mock.patch("server.QUERY_MODES_ENABLED", query_modes), \
+            mock.patch("server.REGEX_QUERIES", True), \
+            mock.patch("client.QUERY_MODES_ENABLED", query_modes):
+        for word in words:
+            escaped = query_modes and word in RESERVED_WORDS
+            request = format_query(f"{word} o")
+            assert request == (f"EXACT {word} o" if escaped else f"{word} o")
+            assert parse_query_mode(request) == ("EXACT", f"{word} o")
+            assert process_query(request, None) == "STRING EXISTS\n"
+            # Read as a mode, "n" would match the start of "now"
+            assert process_query(
+                format_query(f"{word} n"), None) == "STRING NOT FOUND\n"
+            assert parse_query_mode(format_query(word)) == ("EXACT", word)
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,123 @@
+import os
+import stat
+import sys
+import pytest
+from corpus_index import file_version
+from shared_index import (
+    SharedLineIndex,
+    build_index,
+    create_shared_index,
+    index_path,
+    load_index,
+    save_index
+)
+
+
+def test_shared_index_lookups():
+    """
+    Test exact-match lookups against a built index buffer.
+    """
+    lines = {"connecting", "now", "", "with spaces", "ünïcödé"}
+    index = SharedLineIndex(build_index(lines, (1, 2, 3)), "corpus.txt")
+
+    for line in lines:
+        assert line in index
+    for missing in ["connect", "no", " now", "now\n", "spaces", "x"]:
+        assert missing not in index
+    assert len(index) == len(lines)
+    assert index.version == (1, 2, 3)
+    assert index.path == "corpus.txt"
+
+
+def test_shared_index_empty():
+    """
+    Test that an index without lines finds nothing.
+    """
+    index = SharedLineIndex(build_index([], (1, 0, 3)))
+    assert "" not in index
+    assert "anything" not in index
+
+
+def test_shared_index_rejects_foreign_buffer():
+    """
+    Test that a buffer that is not an index is refused.
+    """
+    with pytest.raises(ValueError):
+        SharedLineIndex(bytearray(64))
+
+
+def test_create_shared_index_in_shared_memory():
+    """
+    Test that the index can be read back from shared memory.
+    """
+    index, memory = create_shared_index(["connecting", "now"], (1, 2, 3))
+    try:
+        assert "now" in index
+        assert "later" not in index
+    finally:
+        index.release()
+        memory.close()
+        memory.unlink()
+
+
+def test_shared_index_rejects_corrupt_header():
+    """
+    Test that a header that fails its checksum is refused.
+    """
+    buffer = build_index(["now"], (1, 2, 3))
+    buffer[20] ^= 0xFF
+    with pytest.raises(ValueError):
+        SharedLineIndex(buffer)
+
+
+def test_save_and_load_index_file(tmp_path):
+    """
+    Test that an index file is mapped back only while it matches the corpus.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("connecting\nnow\n", encoding="utf-8")
+    assert load_index(corpus) is None
+
+    path = save_index(["connecting", "now"], file_version(corpus), corpus)
+    assert path == index_path(corpus) == str(corpus) + ".idx"
+    index = load_index(corpus)
+    assert "now" in index
+    assert "later" not in index
+    assert index.path == str(corpus)
+    index.release()
+
+    with open(corpus, "a", encoding="utf-8") as file:
+        file.write("later\n")
+    assert load_index(corpus) is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Needs POSIX modes")
+def test_save_index_copies_corpus_permissions(tmp_path):
+    """
+    Test that the index file is as readable as the corpus it indexes.
+
+    Parameters:
+    - tmp_path (pathlib.Path): The temporary directory provided by pytest.
+    """
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("connecting\nnow\n", encoding="utf-8")
+    for mode in (0o644, 0o640, 0o755):
+        os.chmod(corpus, mode)
+        path = save_index(["connecting", "now"], file_version(corpus), corpus)
+        assert stat.S_IMODE(os.stat(path).st_mode) == mode & 0o666
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 1 << 20])
+def test_shared_index_iterates_lines(monkeypatch, block_size):
+    """
+    Test that iterating over an index yields each of its lines once,
+    however the line data is split into blocks.
+    """
+    monkeypatch.setattr("shared_index.ITER_BLOCK_SIZE", block_size)
+    lines = {"connecting", "now", "", "with spaces", "ünïcödé"}
+    index = SharedLineIndex(build_index(lines, (1, 2, 3)))
+    assert sorted(index) == sorted(lines)
+    assert list(SharedLineIndex(build_index([], (1, 0, 3)))) == []
@@ -0,0 +1,77 @@
+import threading
+import pytest
+from worker_pool import WorkerPool
+
+
+def test_worker_pool_runs_submitted_connections():
+    """
+    Test that queued connections are handed to the handler.
+    """
+    handled = []
+    done = threading.Event()
+
+    def handler(conn, addr):
+        handled.append((conn, addr))
+        done.set()
+
+    pool = WorkerPool(handler, size=2, max_queue_depth=4)
+    assert pool.submit("conn", ("127.0.0.1", 1234)) is True
+    assert done.wait(5)
+    assert handled == [("conn", ("127.0.0.1", 1234))]
+
+
+def test_worker_pool_rejects_when_queue_full():
+    """
+    Test that submissions beyond the queue depth are rejected and counted.
+    """
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(conn, addr):
+        started.set()
+        release.wait(5)
+
+    pool = WorkerPool(handler, size=1, max_queue_depth=1)
+    assert pool.submit("busy", None) is True
+    assert started.wait(5)
+    assert pool.submit("queued", None) is True
+    assert pool.submit("rejected", None) is False
+
+    stats = pool.stats()
+    assert stats["size"] == 1
+    assert stats["busy"] == 1
+    assert stats["queue_depth"] == 1
+    assert stats["max_queue_depth"] == 1
+    assert stats["rejected"] == 1
+    release.set()
+
+
+def test_worker_pool_survives_handler_errors():
+    """
+    Test that a failing handler does not kill its worker thread.
+    """
+    calls = []
+    done = threading.Event()
+
+    def handler(conn, addr):
+        calls.append(conn)
+        if conn == "bad":
+            raise RuntimeError("Simulated error")
+        done.set()
+
+    pool = WorkerPool(handler, size=1, max_queue_depth=2)
+    pool.submit("bad", None)
+    pool.submit("good", None)
+    assert done.wait(5)
+    assert calls == ["bad", "good"]
+
+
+@pytest.mark.parametrize("max_queue_depth", [0, -1])
+def test_worker_pool_rejects_unbounded_queue(max_queue_depth):
+    """
+    Test that a queue depth that would make the queue unbounded is
+    refused instead of disabling admission control.
+    """
+    with pytest.raises(ValueError):
+        WorkerPool(lambda conn, addr: None, size=1,
+                   max_queue_depth=max_queue_depth)
@@ -0,0 +1,218 @@
+"""
+Fixed-size pool of worker threads fed by a bounded admission queue.
+
+Accepted connections are queued for a fixed number of worker threads
+instead of each getting a thread of its own. When the queue is full the
+connection is refused straight away, so a load spike turns into fast
+rejections rather than an unbounded number of threads.
+
+Persistent connections waiting for their next request do not hold a
+worker: they are parked with IdleConnections, whose single selector
+thread hands each one back once it becomes readable.
+"""
+
+import logging
+import queue
+import selectors
+import socket
+import threading
+import time
+
+
+class WorkerPool:
+    """
+    Run a handler for submitted connections on a fixed set of threads.
+
+    Parameters:
+    - handler: Callable taking (conn, addr) that serves one connection.
+    - size: Number of worker threads.
+    - max_queue_depth: Maximum number of connections waiting for a worker.
+
+    Raises:
+    - ValueError: If size or max_queue_depth is below 1.
+    """
+
+    def __init__(self, handler, size: int, max_queue_depth: int):
+        if size < 1:
+            raise ValueError("Worker pool size must be at least 1")
+        # A Queue with a maxsize below 1 is unbounded, which would turn
+        # admission control off
+        if max_queue_depth < 1:
+            raise ValueError("Worker pool queue depth must be at least 1")
+        self.handler = handler
+        self.size = size
+        self.max_queue_depth = max_queue_depth
+        self.rejected = 0
+        self.completed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_depth)
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        for number in range(size):
+            thread = threading.Thread(
+                target=self._work, name=f"worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, conn, addr, handler=None) -> bool:
+        """
+        Queue a connection for a worker without blocking.
+
+        Parameters:
+        - conn: The connection object.
+        - addr: The address of the client.
+        - handler: Callable taking (conn, addr) to serve the connection
+        with instead of the pool's handler.
+
+        Returns:
+        - True if the connection was queued, False if the queue is full.
+        """
+        try:
+            self._queue.put_nowait((handler or self.handler, conn, addr))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the pool counters.
+
+        Returns:
+        - A dictionary with the pool size, busy workers, current and
+        maximum queue depth, and completed and rejected connections.
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "busy": self._busy,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def _work(self) -> None:
+        while True:
+            handler, conn, addr = self._queue.get()
+            with self._lock:
+                self._busy += 1
+            try:
+                handler(conn, addr)
+            except Exception:
+                # Keep the worker alive whatever the handler raises
+                logging.exception(
+                    "Worker failed to handle connection from %s", addr)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self.completed += 1
+
+
+class IdleConnections:
+    """
+    Wait for the next request of idle connections on a single thread.
+
+    A parked connection is watched by a selector until it becomes
+    readable, then handed to resume; one that stays idle for timeout
+    seconds is closed. Only the watcher thread touches the selector.
+
+    Parameters:
+    - resume: Callable taking (conn, addr, state), called on the watcher
+    thread once a parked connection is readable or closed by the peer.
+    - timeout: Seconds a connection may stay parked.
+    """
+
+    def __init__(self, resume, timeout: float):
+        self.resume = resume
+        self.timeout = timeout
+        self.expired = 0
+        self._selector = selectors.DefaultSelector()
+        # Parked connections and their deadlines, the earliest first
+        self._deadlines: dict = {}
+        self._pending: list = []
+        self._lock = threading.Lock()
+        self._wakeup, self._waker = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._waker.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._thread = threading.Thread(
+            target=self._watch, name="idle-connections", daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._deadlines) + len(self._pending)
+
+    def park(self, conn, addr, state=None) -> None:
+        """
+        Watch a connection until its client sends more.
+
+        Parameters:
+        - conn: The connection object.
+        - addr: The address of the client.
+        - state: Value passed back to resume with the connection.
+        """
+        with self._lock:
+            self._pending.append((conn, addr, state))
+        try:
+            self._waker.send(b"\0")
+        except BlockingIOError:
+            # The watcher has wakeups queued already
+            pass
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the idle connection counters.
+
+        Returns:
+        - A dictionary with the parked and expired connections.
+        """
+        return {"parked": len(self), "expired": self.expired}
+
+    def _watch(self) -> None:
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            # Every connection gets the same timeout, so appending keeps
+            # the deadlines in order
+            deadline = time.monotonic() + self.timeout
+            for conn, addr, state in pending:
+                self._selector.register(
+                    conn, selectors.EVENT_READ, (conn, addr, state))
+                self._deadlines[conn] = deadline
+
+            timeout = None
+            if self._deadlines:
+                timeout = max(
+                    0, next(iter(self._deadlines.values()))
+                    - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wakeup:
+                    try:
+                        while self._wakeup.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                conn, addr, state = key.data
+                self._selector.unregister(conn)
+                del self._deadlines[conn]
+                try:
+                    self.resume(conn, addr, state)
+                except Exception:
+                    logging.exception(
+                        "Failed to resume connection from %s", addr)
+                    conn.close()
+
+            now = time.monotonic()
+            while self._deadlines:
+                conn, deadline = next(iter(self._deadlines.items()))
+                if deadline > now:
+                    break
+                _, addr, _ = self._selector.get_key(conn).data
+                self._selector.unregister(conn)
+                del self._deadlines[conn]
+                self.expired += 1
+                logging.debug("Closing idle connection from %s", addr)
+                conn.close()